@@ -1,9 +1,12 @@
-import cv2
+import os
+import sys
 import mediapipe as mp
-import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
-from sklearn.ensemble import IsolationForest
+
+# Incremental detectors live with the rest of the analysis code in ml/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ml'))
+from online_detectors import DETECTOR_METHODS, create_detector
+from live_pipeline import LivePipeline, arm_angle, draw_arm
 
 # User selects which arm(s) to track
 arm_selection = input("Select arm tracking mode ('left', 'right', 'both'): ").strip().lower()
@@ -13,100 +16,50 @@ anomaly_method = input("Select anomaly detection method ('StdDev' or 'IsoFor'):
 mp_pose = mp.solutions.pose
 pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
 
-# Start capturing webcam video
-cap = cv2.VideoCapture(0)  # 0 for webcam
-
 # Store movement data
 angle_data = {"right": [], "left": []}
 timestamp_data = {"right": [], "left": []}
 anomaly_flags = {"right": [], "left": []}
 
-# Initialize Isolation Forest
-iso_forest = IsolationForest(n_estimators=100, contamination=0.02, random_state=42)
+# Initialize one incremental detector per arm (running stats / windowed refits)
+if anomaly_method in DETECTOR_METHODS:
+    detectors = {arm: create_detector(anomaly_method) for arm in ["right", "left"]}
+else:
+    print(f"Anomaly method '{anomaly_method}' is not supported, choose from {', '.join(DETECTOR_METHODS)}. Running without anomaly detection.")
+    detectors = {}
 
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
+arms = [arm for arm in ["right", "left"] if arm_selection in [arm, "both"]]
 
-    # Convert frame to RGB for MediaPipe processing
-    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = pose.process(image)
 
-    # Convert back to BGR for OpenCV rendering
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+def analyze(landmarks, frame_shape, frame_id):
+    """Inference thread: angles and anomaly flags for the selected arms."""
+    h, w = frame_shape[:2]
+    overlay = []
+    for arm in arms:
+        angle, shoulder_px, elbow_px, wrist_px = arm_angle(landmarks, arm, w, h)
 
-    if results.pose_landmarks:
-        landmarks = results.pose_landmarks.landmark
-        h, w, _ = image.shape
+        # Store angles for anomaly detection
+        angle_data[arm].append(angle)
+        timestamp_data[arm].append(frame_id)  # Capture frame index, skipped frames show as gaps
 
-        # Function to extract coordinates and calculate angle
-        def get_arm_angle(side):
-            shoulder = landmarks[getattr(mp_pose.PoseLandmark, f"{side.upper()}_SHOULDER").value]
-            elbow = landmarks[getattr(mp_pose.PoseLandmark, f"{side.upper()}_ELBOW").value]
-            wrist = landmarks[getattr(mp_pose.PoseLandmark, f"{side.upper()}_WRIST").value]
+        # Determine anomaly using selected method
+        anomaly = detectors[arm].update(angle) if detectors else False
+        anomaly_flags[arm].append(1 if anomaly else 0)
 
-            shoulder_px = (int(shoulder.x * w), int(shoulder.y * h))
-            elbow_px = (int(elbow.x * w), int(elbow.y * h))
-            wrist_px = (int(wrist.x * w), int(wrist.y * h))
+        overlay.append((arm, angle, shoulder_px, elbow_px, wrist_px, anomaly))
+    return overlay
 
-            # Compute the arm angle
-            angle = np.arctan2(wrist.y - elbow.y, wrist.x - elbow.x) * (180 / np.pi)
-            return angle, shoulder_px, elbow_px, wrist_px
 
-        # Get angles based on user selection
-        angles = {}
-        if arm_selection in ["right", "both"]:
-            angles["right"] = get_arm_angle("right")
-        if arm_selection in ["left", "both"]:
-            angles["left"] = get_arm_angle("left")
+def draw(image, overlay):
+    """Render thread: draw the arms analyzed for this frame."""
+    for arm_overlay in overlay:
+        draw_arm(image, *arm_overlay)
 
-        # Store angles for anomaly detection
-        for arm, (angle, shoulder_px, elbow_px, wrist_px) in angles.items():
-            angle_data[arm].append(angle)
-            timestamp_data[arm].append(len(angle_data[arm]))  # Use frame index as timestamp
-
-            # Determine anomaly using selected method
-            anomaly = False
-            if len(angle_data[arm]) > 30:  # Start detecting anomalies after 30 frames
-                X = np.array(angle_data[arm]).reshape(-1, 1)
-
-                if anomaly_method.lower() == "isofor":
-                    iso_forest.fit(X)
-                    anomaly = iso_forest.predict([[angle]])[0] == -1  # -1 means anomaly
-
-                elif anomaly_method.lower() == "stddev":
-                    mean_angle = np.mean(angle_data[arm])
-                    std_angle = np.std(angle_data[arm])
-                    lower_threshold = mean_angle - (2 * std_angle)
-                    upper_threshold = mean_angle + (2 * std_angle)
-                    anomaly = angle < lower_threshold or angle > upper_threshold
-
-            # Store anomaly flag
-            anomaly_flags[arm].append(1 if anomaly else 0)
-
-            # Define color based on anomaly detection
-            color = (0, 255, 0) if not anomaly else (0, 0, 255)  # Green for normal, Red for anomaly
-
-            # Overlay the information on the video
-            cv2.putText(image, f"{arm.capitalize()} Angle: {int(angle)}°", 
-                        (elbow_px[0] - 50, elbow_px[1] - 20), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-            # Draw detected joints and connections
-            cv2.line(image, shoulder_px, elbow_px, (255, 0, 0), 2)
-            cv2.line(image, elbow_px, wrist_px, (255, 0, 0), 2)
-            cv2.circle(image, elbow_px, 5, color, -1)  # Mark anomaly in red
-
-    # Show the real-time feed
-    cv2.imshow('Arm Swing Detection with Anomalies', image)
-
-    # Exit on 'q' key
-    if cv2.waitKey(10) & 0xFF == ord('q'):
-        break
-
-cap.release()
-cv2.destroyAllWindows()
+
+# Capture from the webcam, run pose inference and render on separate threads
+LivePipeline(0, pose, analyze, draw).run()  # 0 for webcam
+for detector in detectors.values():
+    detector.close()
 
 # ✅ Plot the anomaly graph separately after webcam feed ends
 plt.figure(figsize=(10, 5))
@@ -3,20 +3,15 @@
 #TODO check on mediapipe's own analysis code that can do the ML itself.
 
 
-import cv2 as cv 
 import mediapipe as mp
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-from sklearn.ensemble import IsolationForest
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.cluster import KMeans
-from sklearn import tree
+from live_pipeline import LivePipeline, arm_angle, draw_arm
+from online_detectors import DETECTOR_METHODS, create_detector
+from baseline_models import ModelStore
 
 # User selects which arm(s) to track
 arm_selection = input("Select arm tracking mode ('left', 'right', 'both'): ").strip().lower()
-anomaly_method = input("Select anomaly detection method ('StdDev, 'IsoFor', 'KMeans', 'KNN', 'KReg', 'DecTree'): ").strip().lower()
+anomaly_method = input("Select anomaly detection method ('StdDev', 'IsoFor', 'KMeans', 'KNN'): ").strip().lower()
+patient_id = input("Patient ID to score against a stored baseline (blank to learn from this session): ").strip()
 
 # Initialize Mediapipe and drawing utilities
 mp_pose = mp.solutions.pose
@@ -28,144 +23,67 @@ timestamp_data = {"right": [], "left": []}
 anomaly_flags = {"right": [], "left": []}
 
 video_path = "../Videos/DemoBefore.mp4"  # VIDEO SOURCE (CHANGE THIS)
-cap = cv.VideoCapture(video_path)
 
-if not cap.isOpened():
-    print("Error: Could not open video.")
-    exit()
-
-# Initialize Types of ML Algorithms
-iso_forest = IsolationForest(n_estimators=100, contamination=0.02, random_state=42)
-knn = KNeighborsClassifier(n_neighbors=2, weights='distance', metric ='euclidean')
-kreg = KNeighborsRegressor()
-kmeans = KMeans(n_clusters=2, random_state=42)
-DecTree = tree.DecisionTreeClassifier()
+# Initialize one incremental detector per arm so per-frame cost stays flat over the session
+if anomaly_method in DETECTOR_METHODS:
+    detectors = {arm: create_detector(anomaly_method) for arm in ["right", "left"]}
+    # A stored baseline (baseline_models.py fit) replaces the session-fitted detector: no warmup, no refits
+    if patient_id:
+        store = ModelStore()
+        for arm in detectors:
+            baseline = store.load(patient_id, arm, anomaly_method)
+            if baseline is not None:
+                detectors[arm].close()
+                detectors[arm] = baseline
+                print(f"Scoring {arm} arm against baseline {baseline.metadata['id']} "
+                      f"({baseline.metadata['n_samples']} samples from {baseline.metadata['created']})")
+else:
+    print(f"Anomaly method '{anomaly_method}' is not supported, choose from {', '.join(DETECTOR_METHODS)}. Running without anomaly detection.")
+    detectors = {}
+
+arms = [arm for arm in ["right", "left"] if arm_selection in [arm, "both"]]
 
 ##########################################################################################################################################################################
 
-# Process the video
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break  # Exit if no frame is read
-
-    # Convert BGR to RGB
-    image = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
-    image.flags.writeable = False
-    results = pose.process(image)
-
-    image = cv.cvtColor(image, cv.COLOR_RGB2BGR)
-
-    if results.pose_landmarks:
-        landmarks = results.pose_landmarks.landmark
-        h, w, _ = image.shape
-
-        # Function to extract coordinates and calculate angle
-        def get_arm_angle(side):
-            shoulder = landmarks[getattr(mp_pose.PoseLandmark, f"{side.upper()}_SHOULDER").value]
-            elbow = landmarks[getattr(mp_pose.PoseLandmark, f"{side.upper()}_ELBOW").value]
-            wrist = landmarks[getattr(mp_pose.PoseLandmark, f"{side.upper()}_WRIST").value]
-
-            print("Shoulder: ", shoulder)
-            print("Elbow: ", elbow)
-            print("Wrist: ", wrist)    
-
-            shoulder_px = (int(shoulder.x * w), int(shoulder.y * h))
-            elbow_px = (int(elbow.x * w), int(elbow.y * h))
-            wrist_px = (int(wrist.x * w), int(wrist.y * h))
-
-            # Compute the arm angle
-            angle = np.arctan2(wrist.y - elbow.y, wrist.x - elbow.x) * (180 / np.pi)
-            return angle, shoulder_px, elbow_px, wrist_px
-
-        # Get angles based on user selection
-        angles = {}
-        if arm_selection in ["right", "both"]:
-            angles["right"] = get_arm_angle("right")
-        if arm_selection in ["left", "both"]:
-            angles["left"] = get_arm_angle("left")
+def analyze(landmarks, frame_shape, frame_id):
+    """Inference thread: angles and anomaly flags for the selected arms."""
+    h, w = frame_shape[:2]
+    overlay = []
+    for arm in arms:
+        angle, shoulder_px, elbow_px, wrist_px = arm_angle(landmarks, arm, w, h)
 
         # Store angles for anomaly detection
-        for arm, (angle, shoulder_px, elbow_px, wrist_px) in angles.items():
-            angle_data[arm].append(angle)
-            timestamp_data[arm].append(len(angle_data[arm]))  # Use frame index as timestamp
-
-            # Determine anomaly using selected method
-            anomaly = False
-            if len(angle_data[arm]) > 30:  # Start detecting anomalies after 30 frames
-                X = np.array(angle_data[arm]).reshape(-1, 1)
-
-                if anomaly_method.lower() == "isofor":
-                    print("Using Isolation Forest")
-                    iso_forest.fit(X)
-                    anomaly = iso_forest.predict([[angle]])[0] == -1  # -1 means anomaly
-
-                if anomaly_method.lower() == "stddev":
-                    print("Using Standard Deviation")
-                    mean_angle = np.mean(angle_data[arm])
-                    std_angle = np.std(angle_data[arm])
-                    lower_threshold = mean_angle - (2 * std_angle)
-                    upper_threshold = mean_angle + (2 * std_angle)
-                    anomaly = angle < lower_threshold or angle > upper_threshold
-
-                
-                #TODO: Does not recognize anamolies
-                
-                elif anomaly_method.lower() == "KNN":
-                    print("Using KNN")
-                    distances = knn.kneighbors([[angle]]).fit(X, np.zeros(len(X)))
-                    max_distance = np.max(distances) 
-                    threshold = np.percentile(distances, 95) or np.percentile(distances, 15)
-                    anomaly = knn.predict([[angle]])[0] > threshold
-                
-                
-                elif anomaly_method.lower() == "KReg":
-                    print("Using KReg")
-                    kreg.fit(X, X)
-                    anomaly = kreg.predict([[angle]])[0] != angle
-                
-                if anomaly_method.lower() == "KMeans":
-                    print("Using KMeans")
-                    kmeans.fit(X)
-                    cluster = kmeans.predict([angle_data[arm]])[0] == -1
-                    print("Cluster: ", cluster)
-
-                if anomaly_method.lower() == "DecTree":
-                    print("Using Decision Tree")
-                    kmeans.fit(X, y=["True, not True"])
-                    pred = DecTree.predict([angle_data[arm]])
-                    print("Prediction: ", pred)
-                    
-
-        # Store anomaly flag
-        anomaly_flags[arm].append(1 if anomaly else 0)
+        angle_data[arm].append(angle)
+        timestamp_data[arm].append(frame_id)  # Use frame index as timestamp
 
-        # Define color based on anomaly detection
-        color = (0, 255, 0) if not anomaly else (0, 0, 255)  # Green for normal, Red for anomaly
+        # Determine anomaly using selected method
+        anomaly = detectors[arm].update(angle) if detectors else False
+        anomaly_flags[arm].append(1 if anomaly else 0)
 
-        # Overlay the information on the video
-        cv.putText(image, f"{arm.capitalize()} Angle: {int(angle)}°", 
-                (elbow_px[0] - 50, elbow_px[1] - 20), 
-                cv.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        overlay.append((arm, angle, shoulder_px, elbow_px, wrist_px, anomaly))
+    return overlay
 
-        # Draw detected joints and connections
-        cv.line(image, shoulder_px, elbow_px, (255, 0, 0), 2)
-        cv.line(image, elbow_px, wrist_px, (255, 0, 0), 2)
-        cv.circle(image, elbow_px, 5, color, -1)  # Mark anomaly in red
 
-    # Show the real-time feed
-    cv.imshow('Arm Swing Detection with Anomalies', image)
+def draw(image, overlay):
+    """Render thread: draw the arms analyzed for this frame."""
+    for arm_overlay in overlay:
+        draw_arm(image, *arm_overlay)
 
-    # Break on 'q' key press
-    if cv.waitKey(10) & 0xFF == ord('q'):
-        break
 
-cap.release()
-cv.destroyAllWindows()
+# Process the video: decode, pose inference and display run as a pipeline
+try:
+    LivePipeline(video_path, pose, analyze, draw).run()
+except ValueError as e:
+    print(f"Error: {e}")
+    exit()
+for detector in detectors.values():
+    detector.close()
 
 ###############################################################################################################################################################################################
 
 # ✅ Plot the anomaly graph separately after webcam feed ends
+import matplotlib.pyplot as plt  # Only needed once tracking is over
+
 plt.figure(figsize=(10, 5))
 for arm in ["right", "left"]:
     if arm_selection in [arm, "both"]:
@@ -0,0 +1,135 @@
+"""Motion-adaptive inference scheduling for video extraction.
+
+A fixed stride spends pose inference on still stretches (the patient getting
+ready, walking off) and can undersample the fastest part of a swing.
+AdaptiveScheduler picks the next frame to run inference on from the arm speed
+between the last two detections: frames are spaced so the arm moves about
+target_motion (normalized image units) between samples, within [min_step,
+max_step] frames. Frames in between are only grabbed, never decoded.
+
+The irregular samples are then interpolated onto a uniform time grid by
+resample_uniform(), so analyze_improvement sees the same kind of series as with
+fixed-stride sampling.
+"""
+import numpy as np
+
+from pose_landmarks import LANDMARK_INDEX
+
+# Joints whose motion drives the schedule
+SCHEDULE_LANDMARKS = [LANDMARK_INDEX[f'{side}_{joint}'] for side in ('LEFT', 'RIGHT')
+                      for joint in ('SHOULDER', 'ELBOW', 'WRIST')]
+
+# Normalized image units per sample; a brisk swing at 30 FPS gets about the legacy every-3rd-frame density
+TARGET_MOTION = 0.03
+MIN_VISIBILITY = 0.5
+# Longest stretch without a detection that is still interpolated over, in seconds
+MAX_GAP = 0.5
+
+
+class AdaptiveScheduler:
+    """Frames to advance after each inference, from recent landmark speed.
+
+    base_step is the fixed stride the uniform output is resampled to. Sampling
+    never gets sparser than max_step (default 4 * base_step) and never denser than
+    min_step; it densifies immediately when motion picks up but only relaxes by
+    half a step per sample, so a swing starting after a pause is caught early.
+    """
+
+    def __init__(self, fps, base_step, min_step=1, max_step=None, target_motion=TARGET_MOTION):
+        self.fps = fps
+        self.base_step = base_step
+        self.min_step = min_step
+        self.max_step = max_step or 4 * base_step
+        self.target_motion = target_motion
+        self.step = base_step
+        self.previous = None  # (timestamp, (J, 3) joints, (J,) visible) of the last detection
+        self.inferences = 0
+
+    def next_step(self, timestamp, landmarks):
+        """Frames until the next inference, given this frame's landmarks (None if no pose)."""
+        self.inferences += 1
+        if landmarks is None:
+            # Nothing to track: search at the base rate until the person is back
+            self.previous = None
+            self.step = self.base_step
+            return max(1, int(round(self.step)))
+
+        joints = landmarks[SCHEDULE_LANDMARKS, :2].astype(float)
+        visible = landmarks[SCHEDULE_LANDMARKS, 3] >= MIN_VISIBILITY
+        if self.previous is not None and timestamp > self.previous[0]:
+            previous_time, previous_joints, previous_visible = self.previous
+            both = visible & previous_visible
+            if both.any():
+                # Fastest visible joint, in normalized units per frame
+                distance = np.linalg.norm(joints[both] - previous_joints[both], axis=1).max()
+                motion_per_frame = distance / ((timestamp - previous_time) * self.fps)
+                wanted = self.target_motion / motion_per_frame if motion_per_frame > 0 else self.max_step
+                self.step = float(np.clip(min(wanted, self.step + 0.5 * self.base_step), self.min_step,
+                                          self.max_step))
+        self.previous = (timestamp, joints, visible)
+        return max(1, int(round(self.step)))
+
+    @property
+    def max_gap(self):
+        """Longest gap between detections the schedule produces by itself, in seconds.
+
+        Pass this to resample_uniform() so still stretches (sampled every max_step
+        frames) are interpolated and only lost detections leave holes.
+        """
+        # One frame of margin for the rounding of the step
+        return max(MAX_GAP, (np.ceil(self.max_step) + 1) / self.fps)
+
+
+def resample_uniform(timestamps, landmarks, rate, max_gap=MAX_GAP):
+    """Interpolate irregular (T, 33, 4) samples onto a uniform grid at rate samples per second.
+
+    Positions use a cubic spline (continuous acceleration, so jerk stays meaningful)
+    and visibility is linear. Grid points inside gaps longer than max_gap seconds
+    are dropped, like frames without a detection in fixed-stride sampling; for
+    adaptive samples use the scheduler's max_gap, which covers its own sparsest step.
+    """
+    from scipy.interpolate import CubicSpline
+
+    # The spline needs strictly increasing sample times
+    timestamps, unique = np.unique(np.asarray(timestamps, dtype=float), return_index=True)
+    landmarks = landmarks[unique]
+    if len(timestamps) < 2:
+        return timestamps, landmarks
+    grid = np.arange(timestamps[0], timestamps[-1] + 1e-9, 1.0 / rate)
+
+    after = np.clip(np.searchsorted(timestamps, grid, side='right'), 1, len(timestamps) - 1)
+    gap = timestamps[after] - timestamps[after - 1]
+    grid = grid[gap <= max_gap]
+
+    resampled = np.empty((len(grid),) + landmarks.shape[1:], dtype=landmarks.dtype)
+    resampled[..., :3] = CubicSpline(timestamps, landmarks[..., :3], axis=0)(grid)
+    after = np.clip(np.searchsorted(timestamps, grid, side='right'), 1, len(timestamps) - 1)
+    weight = (grid - timestamps[after - 1]) / (timestamps[after] - timestamps[after - 1])
+    visibility = landmarks[..., 3]
+    resampled[..., 3] = visibility[after - 1] + (visibility[after] - visibility[after - 1]) * weight[:, None]
+    return grid, resampled
+
+
+if __name__ == "__main__":
+    # Self-check: a still arm followed by a swing must resample to the full uniform grid
+    fps, base_step = 30.0, 5
+    scheduler = AdaptiveScheduler(fps, base_step)
+    still = np.zeros((33, 4), dtype=np.float32)
+    still[:, :2] = 0.5
+    still[:, 3] = 1.0
+    timestamps, samples = [], []
+    frame = 0
+    while frame < 20 * fps:
+        t = frame / fps
+        landmarks = still.copy()
+        if t >= 10:
+            landmarks[SCHEDULE_LANDMARKS, 0] += 0.15 * np.sin(2 * np.pi * 0.8 * (t - 10))
+        timestamps.append(t)
+        samples.append(landmarks)
+        frame += scheduler.next_step(t, landmarks)
+
+    grid, _ = resample_uniform(timestamps, np.stack(samples), fps / base_step, max_gap=scheduler.max_gap)
+    expected = len(np.arange(timestamps[0], timestamps[-1] + 1e-9, base_step / fps))
+    print(f"{scheduler.inferences} inferences (fixed stride: {int(20 * fps / base_step)}), "
+          f"{len(grid)} of {expected} uniform samples")
+    assert len(grid) == expected, "still stretches must be interpolated, not dropped"
@@ -0,0 +1,198 @@
+"""Long-lived analysis worker.
+
+Loads mediapipe, OpenCV, matplotlib and scipy once and keeps a pool of warm
+Pose instances, so an upload only pays for the frames it actually processes
+instead of interpreter startup, imports and graph construction.
+
+Jobs are newline-delimited JSON objects read from stdin (default) or from a
+local TCP socket (--port). Every job gets exactly one JSON reply line with the
+same id. The outputs written to disk are the same as the standalone scripts;
+analyze_video jobs accept "plot": false to write only the pose data, and "smoothing",
+"adaptive" and "graph_points" like the analyze_video.py options:
+
+    {"id": 1, "op": "analyze_video", "video_path": "before.mp4", "output_path": "before_analysis.png",
+     "workers": 4, "sample_rate": 10}
+    {"id": 2, "op": "render_plot", "pose_path": "before_analysis.pose", "output_path": "before_analysis.png"}
+    {"id": 5, "op": "render_overlay", "video_path": "before.mp4", "pose_path": "before_analysis.pose",
+     "output_path": "before_overlay.mp4"}
+    {"id": 3, "op": "analyze_improvement", "before_path": "before_analysis.pose",
+     "after_path": "after_analysis.pose", "output_path": "improvement_analysis.json"}
+    {"id": 4, "op": "ping"}
+
+    {"id": 1, "ok": true, "elapsed": 4.2, "metrics": "before_analysis.metrics.json"}
+    {"id": 2, "ok": false, "error": "..."}
+
+analyze_video and analyze_improvement replies name the stage-timing sidecar;
+its peak RSS is the worker's lifetime peak.
+
+Model complexity, and the sample_rate and roi_size of jobs that do not set
+them, come from the machine's hardware profile (hardware_profile.py) unless
+given on the command line.
+
+Usage: python analysis_worker.py [--poses N] [--model-complexity C] [--sample-rate R] [--roi-size S]
+                                 [--port PORT] [--quiet] [--no-profile]
+"""
+import argparse
+import contextlib
+import json
+import queue
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Headless backend, the worker never opens windows
+import matplotlib
+matplotlib.use('Agg')
+
+from analyze_video import analyze_video, create_pose
+from graph_series import DEFAULT_POINTS
+from analyze_improvement import analyze_improvement_files
+from hardware_profile import profile_settings
+from overlay_renderer import render_overlay
+from instrumentation import metrics_path, set_debug
+from render_plot import render_pose_plot
+
+
+class AnalysisWorker:
+    """Runs analysis jobs on a fixed pool of warm Pose instances."""
+
+    def __init__(self, num_poses=2, model_complexity=1, sample_rate=None, roi_size=None):
+        self.model_complexity = model_complexity
+        # Defaults for jobs that do not set them
+        self.sample_rate = sample_rate
+        self.roi_size = roi_size
+        # The scripts defer these imports for one-shot runs; a long-lived worker pays them up front
+        import matplotlib.figure
+        import mpl_toolkits.mplot3d
+        import scipy.stats
+        import scipy.interpolate
+        self.poses = queue.Queue()
+        for _ in range(num_poses):
+            self.poses.put(create_pose(model_complexity))
+        self.executor = ThreadPoolExecutor(max_workers=num_poses)
+
+    def run_job(self, job):
+        """Run a single job and return its reply dict (never raises)."""
+        reply = {'id': job.get('id'), 'ok': True}
+        start_time = time.time()
+        try:
+            op = job.get('op')
+            if op == 'ping':
+                pass
+            elif op == 'analyze_video':
+                pose = self.poses.get()
+                try:
+                    analyze_video(job['video_path'], job['output_path'], pose=pose,
+                                  workers=job.get('workers', 1), sample_rate=job.get('sample_rate', self.sample_rate),
+                                  model_complexity=self.model_complexity, side=job.get('side', 'right'),
+                                  roi_size=job.get('roi_size', self.roi_size), plot=job.get('plot', True),
+                                  smoothing=job.get('smoothing'), adaptive=job.get('adaptive', False),
+                                  graph_points=job.get('graph_points', DEFAULT_POINTS))
+                finally:
+                    self.poses.put(pose)
+                reply['metrics'] = metrics_path(job['output_path'])
+            elif op == 'render_plot':
+                render_pose_plot(job['pose_path'], job['output_path'], side=job.get('side', 'right'))
+            elif op == 'render_overlay':
+                render_overlay(job['video_path'], job['pose_path'], job['output_path'])
+            elif op == 'analyze_improvement':
+                analyze_improvement_files(job['before_path'], job['after_path'], job['output_path'],
+                                          side=job.get('side', 'right'))
+                reply['metrics'] = metrics_path(job['output_path'])
+            else:
+                raise ValueError(f"Unknown op: {op}")
+        except (Exception, SystemExit) as e:
+            # analyze_video exits on unreadable videos; that must not take the worker down
+            traceback.print_exc(file=sys.stderr)
+            reply['ok'] = False
+            reply['error'] = str(e) or type(e).__name__
+        reply['elapsed'] = round(time.time() - start_time, 3)
+        return reply
+
+    def serve_lines(self, lines, write_reply):
+        """Dispatch every JSON line to the pool and send each reply as it completes."""
+        reply_lock = threading.Lock()
+
+        def send(reply):
+            with reply_lock:
+                write_reply(json.dumps(reply) + '\n')
+
+        futures = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                send({'id': None, 'ok': False, 'error': f"Invalid JSON: {e}"})
+                continue
+            future = self.executor.submit(self.run_job, job)
+            future.add_done_callback(lambda f: send(f.result()))
+            futures.append(future)
+        for future in futures:
+            future.result()
+
+
+def serve_stdin(worker):
+    # Analysis code logs with print(); keep stdout reserved for replies
+    reply_stream = sys.stdout
+    sys.stdout = sys.stderr
+
+    def write_reply(text):
+        reply_stream.write(text)
+        reply_stream.flush()
+
+    worker.serve_lines(sys.stdin, write_reply)
+
+
+def serve_socket(worker, port):
+    sys.stdout = sys.stderr
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lines = (raw.decode('utf-8') for raw in self.rfile)
+
+            def write_reply(text):
+                self.wfile.write(text.encode('utf-8'))
+                self.wfile.flush()
+
+            worker.serve_lines(lines, write_reply)
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer(('127.0.0.1', port), Handler) as server:
+        print(f"Analysis worker listening on 127.0.0.1:{port}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent pose analysis worker")
+    parser.add_argument('--poses', type=int, default=2, help="number of warm Pose instances (concurrent video jobs)")
+    parser.add_argument('--model-complexity', type=int, default=None, choices=[0, 1, 2],
+                        help="default: hardware profile, else 1")
+    parser.add_argument('--sample-rate', type=float, default=None,
+                        help="frames analyzed per second for jobs without one (default: hardware profile)")
+    parser.add_argument('--roi-size', type=int, default=None,
+                        help="person crop size for jobs without one (default: hardware profile)")
+    parser.add_argument('--no-profile', action='store_true', help="ignore the hardware profile")
+    parser.add_argument('--port', type=int, default=None, help="listen on this local TCP port instead of stdin")
+    parser.add_argument('--quiet', action='store_true', help="skip the debug output (same as POSE_DEBUG=0)")
+    args = parser.parse_args()
+
+    if args.quiet:
+        set_debug(False)
+
+    # stdout carries the replies
+    with contextlib.redirect_stdout(sys.stderr):
+        settings = profile_settings(use_profile=not args.no_profile, model_complexity=args.model_complexity,
+                                    sample_rate=args.sample_rate, roi_size=args.roi_size)
+    worker = AnalysisWorker(num_poses=args.poses, **settings)
+    print(f"Analysis worker ready with {args.poses} warm Pose instances", file=sys.stderr)
+
+    if args.port is not None:
+        serve_socket(worker, args.port)
+    else:
+        serve_stdin(worker)
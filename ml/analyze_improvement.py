@@ -1,160 +1,59 @@
 import numpy as np
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.preprocessing import StandardScaler
 import json
 import os
-from scipy.stats import wilcoxon
+import time
+from instrumentation import StageMetrics, debug, metrics_path, set_debug
+from pose_format import load_pose_data
+from feature_engine import compute_pose_kinematics
+from pose_cache import PoseCache, cache_key
+from resampling_stats import resample_improvement
 
-def calculate_range_of_motion(pose_data):
+# Bump when feature definitions change so stale cache entries are not reused
+FEATURES_VERSION = 3
+
+def calculate_range_of_motion(pose_data, kinematics=None):
     """Calculate the range of motion for upper arm and forearm segments."""
-    ranges = {}
-    
-    # Calculate upper arm movement (shoulder to elbow)
-    shoulder_x = np.array(pose_data['Shoulder_X'])
-    shoulder_y = np.array(pose_data['Shoulder_Y'])
-    shoulder_z = np.array(pose_data['Shoulder_Z'])
-    elbow_x = np.array(pose_data['Elbow_X'])
-    elbow_y = np.array(pose_data['Elbow_Y'])
-    elbow_z = np.array(pose_data['Elbow_Z'])
-    
-    # Calculate upper arm vector (from shoulder to elbow)
-    upper_arm_x = elbow_x - shoulder_x
-    upper_arm_y = elbow_y - shoulder_y
-    upper_arm_z = elbow_z - shoulder_z
-    
-    # Calculate range of motion for upper arm in each direction
-    upper_arm_x_range = np.max(upper_arm_x) - np.min(upper_arm_x)
-    upper_arm_y_range = np.max(upper_arm_y) - np.min(upper_arm_y)
-    upper_arm_z_range = np.max(upper_arm_z) - np.min(upper_arm_z)
-    
-    # Calculate the magnitude of movement in each direction
-    # Use a weighted sum instead of direct magnitude to reduce sensitivity
-    upper_arm_range = (upper_arm_x_range + upper_arm_y_range + upper_arm_z_range) / 3
-    ranges['UpperArm'] = float(upper_arm_range)
-    
-    # Calculate forearm movement (elbow to wrist)
-    wrist_x = np.array(pose_data['Wrist_X'])
-    wrist_y = np.array(pose_data['Wrist_Y'])
-    wrist_z = np.array(pose_data['Wrist_Z'])
-    
-    # Calculate forearm vector (from elbow to wrist)
-    forearm_x = wrist_x - elbow_x
-    forearm_y = wrist_y - elbow_y
-    forearm_z = wrist_z - elbow_z
-    
-    # Calculate range of motion for forearm in each direction
-    forearm_x_range = np.max(forearm_x) - np.min(forearm_x)
-    forearm_y_range = np.max(forearm_y) - np.min(forearm_y)
-    forearm_z_range = np.max(forearm_z) - np.min(forearm_z)
-    
-    # Calculate the magnitude of movement in each direction
+    if kinematics is None:
+        kinematics = compute_pose_kinematics(pose_data)
+
+    # Average of the per-axis ranges of each segment vector
     # Use a weighted sum instead of direct magnitude to reduce sensitivity
-    forearm_range = (forearm_x_range + forearm_y_range + forearm_z_range) / 3
-    ranges['Forearm'] = float(forearm_range)
-    
-    return ranges
+    return {name: float(value) for name, value in zip(kinematics['segments'], kinematics['ranges'])}
 
-def calculate_smoothness(pose_data):
+def calculate_smoothness(pose_data, kinematics=None):
     """Calculate the smoothness of movement using jerk (rate of change of acceleration) for arm segments.
     Higher jerk means less smooth movement, so we invert the calculation."""
-    smoothness = {}
-    
-    # Calculate upper arm smoothness (shoulder to elbow)
-    shoulder_x = np.array(pose_data['Shoulder_X'])
-    shoulder_y = np.array(pose_data['Shoulder_Y'])
-    shoulder_z = np.array(pose_data['Shoulder_Z'])
-    elbow_x = np.array(pose_data['Elbow_X'])
-    elbow_y = np.array(pose_data['Elbow_Y'])
-    elbow_z = np.array(pose_data['Elbow_Z'])
-    time = np.array(pose_data['Timestamp'])
-    
-    # Calculate upper arm vector (from shoulder to elbow)
-    upper_arm_x = elbow_x - shoulder_x
-    upper_arm_y = elbow_y - shoulder_y
-    upper_arm_z = elbow_z - shoulder_z
-    
-    # Calculate acceleration for upper arm
-    acc_x = np.gradient(np.gradient(upper_arm_x, time), time)
-    acc_y = np.gradient(np.gradient(upper_arm_y, time), time)
-    acc_z = np.gradient(np.gradient(upper_arm_z, time), time)
-    
-    # Calculate jerk for upper arm
-    jerk_x = np.gradient(acc_x, time)
-    jerk_y = np.gradient(acc_y, time)
-    jerk_z = np.gradient(acc_z, time)
-    
-    # Calculate total jerk magnitude for upper arm
-    jerk_magnitude = np.sqrt(jerk_x**2 + jerk_y**2 + jerk_z**2)
-    # Higher jerk means less smooth movement, so we use negative jerk
-    smoothness['UpperArm'] = float(-np.mean(jerk_magnitude))
-    
-    # Calculate forearm smoothness (elbow to wrist)
-    wrist_x = np.array(pose_data['Wrist_X'])
-    wrist_y = np.array(pose_data['Wrist_Y'])
-    wrist_z = np.array(pose_data['Wrist_Z'])
-    
-    # Calculate forearm vector (from elbow to wrist)
-    forearm_x = wrist_x - elbow_x
-    forearm_y = wrist_y - elbow_y
-    forearm_z = wrist_z - elbow_z
-    
-    # Calculate acceleration for forearm
-    acc_x = np.gradient(np.gradient(forearm_x, time), time)
-    acc_y = np.gradient(np.gradient(forearm_y, time), time)
-    acc_z = np.gradient(np.gradient(forearm_z, time), time)
-    
-    # Calculate jerk for forearm
-    jerk_x = np.gradient(acc_x, time)
-    jerk_y = np.gradient(acc_y, time)
-    jerk_z = np.gradient(acc_z, time)
-    
-    # Calculate total jerk magnitude for forearm
-    jerk_magnitude = np.sqrt(jerk_x**2 + jerk_y**2 + jerk_z**2)
+    if kinematics is None:
+        kinematics = compute_pose_kinematics(pose_data)
+
     # Higher jerk means less smooth movement, so we use negative jerk
-    smoothness['Forearm'] = float(-np.mean(jerk_magnitude))
-    
-    return smoothness
+    mean_jerk = np.mean(kinematics['jerk_magnitude'], axis=0)
+    return {name: float(-value) for name, value in zip(kinematics['segments'], mean_jerk)}
 
 def extract_features(pose_data):
     """Extract all relevant features for improvement analysis."""
+    # One batched pass computes every segment's vectors and derivatives
+    kinematics = compute_pose_kinematics(pose_data)
+
     # Calculate summary statistics for improvement scores
-    ranges = calculate_range_of_motion(pose_data)
-    smoothness = calculate_smoothness(pose_data)
-    
-    # Extract raw measurements for Wilcoxon test
-    # Upper arm vectors
-    upper_arm_x = np.array(pose_data['Elbow_X']) - np.array(pose_data['Shoulder_X'])
-    upper_arm_y = np.array(pose_data['Elbow_Y']) - np.array(pose_data['Shoulder_Y'])
-    upper_arm_z = np.array(pose_data['Elbow_Z']) - np.array(pose_data['Shoulder_Z'])
+    ranges = calculate_range_of_motion(pose_data, kinematics)
+    smoothness = calculate_smoothness(pose_data, kinematics)
     
-    # Calculate the magnitude of movement at each time point
-    # Use a weighted sum instead of direct magnitude
-    upper_arm_magnitude = (np.abs(upper_arm_x) + np.abs(upper_arm_y) + np.abs(upper_arm_z)) / 3
+    # Raw per-frame measurements for the Wilcoxon test
+    # Magnitude uses a weighted sum of the segment vector components instead of direct magnitude
+    segment_index = {name: i for i, name in enumerate(kinematics['segments'])}
+    upper_arm_magnitude = kinematics['magnitude'][:, segment_index['UpperArm']]
+    forearm_magnitude = kinematics['magnitude'][:, segment_index['Forearm']]
     
-    # Forearm vectors
-    forearm_x = np.array(pose_data['Wrist_X']) - np.array(pose_data['Elbow_X'])
-    forearm_y = np.array(pose_data['Wrist_Y']) - np.array(pose_data['Elbow_Y'])
-    forearm_z = np.array(pose_data['Wrist_Z']) - np.array(pose_data['Elbow_Z'])
+    debug("\nDebug: Movement magnitudes:")
+    debug("Upper arm magnitude range:", np.min(upper_arm_magnitude), "to", np.max(upper_arm_magnitude))
+    debug("Forearm magnitude range:", np.min(forearm_magnitude), "to", np.max(forearm_magnitude))
     
-    # Calculate the magnitude of movement at each time point
-    # Use a weighted sum instead of direct magnitude
-    forearm_magnitude = (np.abs(forearm_x) + np.abs(forearm_y) + np.abs(forearm_z)) / 3
-    
-    # Calculate jerk for smoothness
-    time = np.array(pose_data['Timestamp'])
-    
-    print("\nDebug: Movement magnitudes:")
-    print("Upper arm magnitude range:", np.min(upper_arm_magnitude), "to", np.max(upper_arm_magnitude))
-    print("Forearm magnitude range:", np.min(forearm_magnitude), "to", np.max(forearm_magnitude))
-    
-    # Ensure we have enough data points for gradient calculation
-    if len(time) < 4:  # Need at least 4 points for jerk calculation
+    # Zeros when there are fewer than 4 time points (not enough for jerk)
+    if len(kinematics['magnitude']) < 4:
         print("Warning: Not enough time points for jerk calculation")
-        upper_arm_jerk = np.zeros_like(upper_arm_magnitude)
-        forearm_jerk = np.zeros_like(forearm_magnitude)
-    else:
-        upper_arm_jerk = np.gradient(np.gradient(np.gradient(upper_arm_magnitude, time), time), time)
-        forearm_jerk = np.gradient(np.gradient(np.gradient(forearm_magnitude, time), time), time)
+    upper_arm_jerk = kinematics['magnitude_jerk'][:, segment_index['UpperArm']]
+    forearm_jerk = kinematics['magnitude_jerk'][:, segment_index['Forearm']]
     
     return {
         'summary': {
@@ -165,10 +64,39 @@ def extract_features(pose_data):
             'upper_arm_magnitude': upper_arm_magnitude,
             'forearm_magnitude': forearm_magnitude,
             'upper_arm_jerk': upper_arm_jerk,
-            'forearm_jerk': forearm_jerk
+            'forearm_jerk': forearm_jerk,
+            # Per-frame inputs of the summaries, for resampling confidence intervals
+            'vectors': kinematics['vectors'],
+            'jerk_magnitude': kinematics['jerk_magnitude']
         }
     }
 
+def extract_features_cached(pose_data_path, pose_data, side='right'):
+    """extract_features() for a pose file, reusing stored results for identical files."""
+    pose_cache = PoseCache()
+    key = cache_key(pose_data_path, kind='features', version=FEATURES_VERSION, side=side)
+    cached = pose_cache.get(key, ['features.npz'])
+    if cached:
+        try:
+            with np.load(cached['features.npz']) as stored:
+                return {
+                    'summary': json.loads(str(stored['summary'])),
+                    'raw': {name: stored[name] for name in stored.files if name != 'summary'}
+                }
+        except FileNotFoundError:
+            # Evicted by another process since get(); recompute
+            pass
+
+    features = extract_features(pose_data)
+    tmp_path = os.path.join(pose_cache.root, f'.features-{os.getpid()}-{id(features)}.npz')
+    try:
+        np.savez(tmp_path, summary=json.dumps(features['summary']), **features['raw'])
+        pose_cache.put(key, {'features.npz': tmp_path})
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return features
+
 def calculate_improvement_score(before_value, after_value):
     """Calculate improvement score with proper handling of relative changes."""
     if before_value == 0:
@@ -183,19 +111,34 @@ def calculate_improvement_score(before_value, after_value):
     # <1.0 means degradation
     return 1.0 + relative_change
 
-def analyze_improvement(before_data, after_data):
-    """Analyze improvement between before and after videos."""
-    # Extract features for both videos
-    before_features = extract_features(before_data)
-    after_features = extract_features(after_data)
-    
-    print("\nBefore video data:")
-    print("Number of time points:", len(before_data['Timestamp']))
-    print("Sample of timestamps:", before_data['Timestamp'][:5])
-    
-    print("\nAfter video data:")
-    print("Number of time points:", len(after_data['Timestamp']))
-    print("Sample of timestamps:", after_data['Timestamp'][:5])
+def analyze_improvement(before_data, after_data, before_features=None, after_features=None, metrics=None):
+    """Analyze improvement between before and after videos.
+
+    Precomputed extract_features() results can be passed in to skip that step.
+    Stage timings are added to metrics (a StageMetrics) if given.
+    """
+    if metrics is None:
+        metrics = StageMetrics()
+
+    # scipy.stats takes longer to import than the rest of this module; only load it when tests run
+    with metrics.stage('import_scipy'):
+        from scipy.stats import wilcoxon
+
+    # Extract features for both videos; timed here only when the caller has not already done it
+    if before_features is None or after_features is None:
+        with metrics.stage('features'):
+            if before_features is None:
+                before_features = extract_features(before_data)
+            if after_features is None:
+                after_features = extract_features(after_data)
+    
+    debug("\nBefore video data:")
+    debug("Number of time points:", len(before_data['Timestamp']))
+    debug("Sample of timestamps:", before_data['Timestamp'][:5])
+    
+    debug("\nAfter video data:")
+    debug("Number of time points:", len(after_data['Timestamp']))
+    debug("Sample of timestamps:", after_data['Timestamp'][:5])
     
     # Calculate improvement scores using summary statistics
     improvement_scores = {
@@ -222,7 +165,8 @@ def analyze_improvement(before_data, after_data):
     }
     
     # Perform Wilcoxon tests on the raw data
-    print("\nPerforming Wilcoxon tests...")
+    statistics_start = time.perf_counter()
+    debug("\nPerforming Wilcoxon tests...")
     
     # Ensure arrays are the same length by resampling to the shorter length
     min_length = min(len(before_features['raw']['upper_arm_magnitude']), 
@@ -247,11 +191,11 @@ def analyze_improvement(before_data, after_data):
     
     # Perform Wilcoxon tests
     try:
-        print("\nDebug: Data shapes for Wilcoxon tests:")
-        print("Before upper arm magnitude:", before_upper_arm.shape, "Sample:", before_upper_arm[:5])
-        print("After upper arm magnitude:", after_upper_arm.shape, "Sample:", after_upper_arm[:5])
-        print("Before forearm magnitude:", before_forearm.shape, "Sample:", before_forearm[:5])
-        print("After forearm magnitude:", after_forearm.shape, "Sample:", after_forearm[:5])
+        debug("\nDebug: Data shapes for Wilcoxon tests:")
+        debug("Before upper arm magnitude:", before_upper_arm.shape, "Sample:", before_upper_arm[:5])
+        debug("After upper arm magnitude:", after_upper_arm.shape, "Sample:", after_upper_arm[:5])
+        debug("Before forearm magnitude:", before_forearm.shape, "Sample:", before_forearm[:5])
+        debug("After forearm magnitude:", after_forearm.shape, "Sample:", after_forearm[:5])
         
         # Ensure we have enough data points for the test
         if len(before_upper_arm) < 2 or len(after_upper_arm) < 2:
@@ -262,25 +206,25 @@ def analyze_improvement(before_data, after_data):
         # Calculate differences for debugging
         upper_arm_diff = after_upper_arm - before_upper_arm
         forearm_diff = after_forearm - before_forearm
-        print("\nDebug: Mean differences:")
-        print("Upper arm mean difference:", np.mean(upper_arm_diff))
-        print("Forearm mean difference:", np.mean(forearm_diff))
+        debug("\nDebug: Mean differences:")
+        debug("Upper arm mean difference:", np.mean(upper_arm_diff))
+        debug("Forearm mean difference:", np.mean(forearm_diff))
         
         # Perform Wilcoxon tests with two-sided alternative
         # This will detect any significant difference, not just improvement
         upper_arm_test = wilcoxon(before_upper_arm, after_upper_arm, zero_method='wilcox')
         forearm_test = wilcoxon(before_forearm, after_forearm, zero_method='wilcox')
         
-        print("\nDebug: Wilcoxon test results:")
-        print("Upper arm test:", upper_arm_test)
-        print("Forearm test:", forearm_test)
+        debug("\nDebug: Wilcoxon test results:")
+        debug("Upper arm test:", upper_arm_test)
+        debug("Forearm test:", forearm_test)
         
         # Add smoothness tests
-        print("\nDebug: Smoothness data shapes:")
-        print("Before upper arm jerk:", before_features['raw']['upper_arm_jerk'].shape)
-        print("After upper arm jerk:", after_features['raw']['upper_arm_jerk'].shape)
-        print("Before forearm jerk:", before_features['raw']['forearm_jerk'].shape)
-        print("After forearm jerk:", after_features['raw']['forearm_jerk'].shape)
+        debug("\nDebug: Smoothness data shapes:")
+        debug("Before upper arm jerk:", before_features['raw']['upper_arm_jerk'].shape)
+        debug("After upper arm jerk:", after_features['raw']['upper_arm_jerk'].shape)
+        debug("Before forearm jerk:", before_features['raw']['forearm_jerk'].shape)
+        debug("After forearm jerk:", after_features['raw']['forearm_jerk'].shape)
         
         # Ensure arrays are the same length for smoothness tests
         min_length = min(len(before_features['raw']['upper_arm_jerk']), 
@@ -302,17 +246,17 @@ def analyze_improvement(before_data, after_data):
         before_fore_jerk = before_fore_jerk[mask]
         after_fore_jerk = after_fore_jerk[mask]
         
-        print("\nDebug: Cleaned jerk data shapes:")
-        print("Upper arm jerk:", before_upper_jerk.shape, after_upper_jerk.shape)
-        print("Forearm jerk:", before_fore_jerk.shape, after_fore_jerk.shape)
+        debug("\nDebug: Cleaned jerk data shapes:")
+        debug("Upper arm jerk:", before_upper_jerk.shape, after_upper_jerk.shape)
+        debug("Forearm jerk:", before_fore_jerk.shape, after_fore_jerk.shape)
         
         # For smoothness, we want to test if after < before (less jerk means more smooth)
         upper_arm_smoothness_test = wilcoxon(before_upper_jerk, after_upper_jerk, zero_method='wilcox', alternative='greater')
         forearm_smoothness_test = wilcoxon(before_fore_jerk, after_fore_jerk, zero_method='wilcox', alternative='greater')
         
-        print("\nDebug: Smoothness test results:")
-        print("Upper arm smoothness test:", upper_arm_smoothness_test)
-        print("Forearm smoothness test:", forearm_smoothness_test)
+        debug("\nDebug: Smoothness test results:")
+        debug("Upper arm smoothness test:", upper_arm_smoothness_test)
+        debug("Forearm smoothness test:", forearm_smoothness_test)
         
         wilcoxon_results = {
             'range_of_motion': {
@@ -372,6 +316,14 @@ def analyze_improvement(before_data, after_data):
             }
         }
 
+    metrics.add('statistics', time.perf_counter() - statistics_start)
+
+    # Bootstrap intervals and permutation p-values for the scores themselves
+    with metrics.stage('resampling'):
+        confidence = resample_improvement(before_features, after_features)
+    debug("\nDebug: Resampling results:")
+    debug("Overall score:", confidence['overall'])
+
     # Determine overall improvement status
     overall_score = (improvement_scores['range_of_motion']['score'] + improvement_scores['smoothness']['score']) / 2
     improved = overall_score > 1.0
@@ -401,6 +353,7 @@ def analyze_improvement(before_data, after_data):
             }
         },
         'statistics': wilcoxon_results,
+        'confidence': confidence,
         'before_summary': before_features['summary'], #per video summary
         'after_summary': after_features['summary']
     }
@@ -431,25 +384,56 @@ def save_analysis_results(improvement_status, output_path):
     with open(output_path, 'w') as f:
         json.dump(improvement_status, f, indent=2)
 
-if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) != 4:
-        print("Usage: python analyze_improvement.py <before_data.json> <after_data.json> <output_path.json>")
-        sys.exit(1)
-    
-    before_data_path = sys.argv[1]
-    after_data_path = sys.argv[2]
-    output_path = sys.argv[3]
-    
+def analyze_improvement_files(before_data_path, after_data_path, output_path, cache=True, side='right',
+                              metrics=True):
+    """Load before/after pose files (.pose or legacy JSON), analyze improvement and save the results.
+
+    side picks the arm analyzed from all-landmark .pose files. With cache=True,
+    features of a pose file seen before are loaded from the pose cache. With
+    metrics=True, stage timings and peak RSS go to a <output>.metrics.json sidecar.
+    """
+    timings = StageMetrics('analyze_improvement')
+    timings.info.update(before=os.path.basename(before_data_path), after=os.path.basename(after_data_path),
+                        side=side)
+
     # Load pose data
-    with open(before_data_path, 'r') as f:
-        before_data = json.load(f)
-    with open(after_data_path, 'r') as f:
-        after_data = json.load(f)
+    with timings.stage('load'):
+        before_data = load_pose_data(before_data_path, side)
+        after_data = load_pose_data(after_data_path, side)
+    timings.count('before_samples', len(before_data['Timestamp']))
+    timings.count('after_samples', len(after_data['Timestamp']))
+
+    before_features = after_features = None
+    if cache:
+        with timings.stage('features'):
+            before_features = extract_features_cached(before_data_path, before_data, side)
+            after_features = extract_features_cached(after_data_path, after_data, side)
     
     # Analyze improvement
-    improvement_status = analyze_improvement(before_data, after_data)
+    improvement_status = analyze_improvement(before_data, after_data, before_features, after_features,
+                                             metrics=timings)
 
     # Save results
-    save_analysis_results(improvement_status, output_path) 
\ No newline at end of file
+    with timings.stage('serialize_json'):
+        save_analysis_results(improvement_status, output_path)
+    if metrics:
+        timings.write(metrics_path(output_path))
+    return improvement_status
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare before/after pose data for improvement")
+    parser.add_argument('before_data_path', help="before_data.json or .pose")
+    parser.add_argument('after_data_path', help="after_data.json or .pose")
+    parser.add_argument('output_path', help="output_path.json")
+    parser.add_argument('--side', default='right', choices=['right', 'left'], help="arm to analyze in .pose files")
+    parser.add_argument('--no-cache', action='store_true', help="always recompute features")
+    parser.add_argument('--quiet', action='store_true', help="skip the debug output (same as POSE_DEBUG=0)")
+    args = parser.parse_args()
+
+    if args.quiet:
+        set_debug(False)
+    
+    analyze_improvement_files(args.before_data_path, args.after_data_path, args.output_path,
+                              cache=not args.no_cache, side=args.side)
\ No newline at end of file
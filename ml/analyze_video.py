@@ -1,30 +1,400 @@
 import cv2
-import mediapipe as mp
-import matplotlib.pyplot as plt
 import numpy as np
 import sys
 import os
 import json
 import time
+from contextlib import nullcontext
 
-def analyze_video(video_path, output_path):
-    # Initialize Mediapipe and drawing utilities
-    mp_pose = mp.solutions.pose
-    mp_drawing = mp.solutions.drawing_utils
-
-    # Initialize lists for storing data
-    pose_data = {
-        'Timestamp': [],
-        'Shoulder_X': [],
-        'Shoulder_Y': [],
-        'Shoulder_Z': [],
-        'Elbow_X': [],
-        'Elbow_Y': [],
-        'Elbow_Z': [],
-        'Wrist_X': [],
-        'Wrist_Y': [],
-        'Wrist_Z': []
-    }
+from adaptive_sampling import AdaptiveScheduler, resample_uniform
+from pose_cache import PoseCache, cache_key, copy_cached
+from graph_series import DEFAULT_POINTS, write_graph_series
+from instrumentation import StageMetrics, metrics_path
+from pose_filter import SMOOTHING_METHODS, smooth_landmarks
+from pose_format import write_pose_file
+from pose_landmarks import POSE_LANDMARKS, arm_view, landmark_columns, landmarks_to_array
+from pose_roi import PersonROI
+from render_plot import render_pose_plot
+
+# Bump when extraction output changes so stale cache entries are not reused
+CACHE_VERSION = 6
+
+def create_pose(model_complexity=1, static_image_mode=False):
+    """Build a Mediapipe Pose estimator with the settings used for video analysis.
+
+    static_image_mode=True detects on every frame instead of tracking, for an
+    instance that is shared between unrelated streams.
+    """
+    # Mediapipe is slow to import and not needed for cache hits
+    import mediapipe as mp
+    return mp.solutions.pose.Pose(
+        static_image_mode=static_image_mode,
+        model_complexity=model_complexity,  # Use lighter model
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5,
+        enable_segmentation=False  # Disable segmentation for speed
+    )
+
+def sampled_frame_index(k, frame_step):
+    """Index of the k-th sampled frame: the first frame at or after k * frame_step."""
+    # Small epsilon so integer steps are not pushed to the next frame by float error
+    return int(np.ceil(k * frame_step - 1e-9))
+
+def first_sample_after(frame_index, frame_step):
+    """Smallest k whose sampled frame index is after frame_index."""
+    k = int(frame_index // frame_step)
+    while sampled_frame_index(k, frame_step) <= frame_index:
+        k += 1
+    while k > 0 and sampled_frame_index(k - 1, frame_step) > frame_index:
+        k -= 1
+    return k
+
+def choose_frame_step(fps, duration, sample_rate=None):
+    """Frames between samples, from a target rate in samples per second.
+
+    Without a sample rate the legacy rule applies: every 3rd frame, or every 5th
+    for videos longer than 30 seconds.
+    """
+    if sample_rate is None:
+        return 5 if duration > 30 else 3
+    if sample_rate <= 0:
+        raise ValueError("sample_rate must be positive")
+    # Never sample faster than the video itself
+    return max(1.0, fps / sample_rate)
+
+def frame_timing(cap, probe=5):
+    """(first_ms, frame_ms): timestamp of the first frame and the frame duration, from the first frames.
+
+    The capture must be at its first frame and is rewound to it afterwards.
+    frame_ms is None for videos with fewer than two frames.
+    """
+    times = []
+    for _ in range(probe):
+        if not cap.grab():
+            break
+        times.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    if len(times) < 2:
+        return (times[0] if times else 0.0), None
+    frame_ms = float(np.median(np.diff(times)))
+    return times[0], (frame_ms if frame_ms > 0 else None)
+
+def seek_before(cap, target, index_of):
+    """Seek so the last grabbed frame is the closest one found before target; returns its index.
+
+    A CAP_PROP_POS_FRAMES seek converts the frame number with the container's
+    average FPS and can land a frame or more off (phone videos drop frames), so
+    the landing frame is identified by its timestamp (index_of) and the seek is
+    retried further back until it lands before target. Returns None at the end
+    of the video.
+    """
+    back = 1
+    while True:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, max(0, target - back))
+        if not cap.grab():
+            return None
+        index = index_of()
+        if index < target or target - back <= 0:
+            return index
+        back += index - target + 2
+
+def iter_frames(cap, pose, frame_step, start_frame=0, end_frame=None, frame_count=None, seek_gap=None, roi=None,
+                scheduler=None, metrics=None):
+    """Run pose estimation on the sampled frames in [start_frame, end_frame), one at a time.
+
+    Frame k is the first frame at or after index ceil(k * frame_step), each frame
+    sampled at most once. Indices come from frame timestamps (timestamp / frame
+    duration), not from counting frames or from where OpenCV says a seek landed, so
+    a dropped frame leaves a hole in the indices and splitting a video into
+    segments (each owning the frames in [start_frame, end_frame)), or seeking,
+    samples exactly the same frames as a single pass. The capture must be at its
+    first frame.
+    Frames in between are only grabbed (demuxed, never converted to BGR); gaps longer
+    than seek_gap frames are jumped over with a seek so whole GOPs can be skipped.
+    With a PersonROI, inference runs on a downsized crop around the person and the
+    landmarks are mapped back to full-frame coordinates.
+    With an AdaptiveScheduler the fixed stride is replaced by the scheduler's
+    motion-dependent step after every inference.
+    Stage times and frame counters are added to metrics (a StageMetrics) if given.
+    Yields (timestamp, landmarks) for every detected pose, with every landmark as a
+    float32 (33, 4) array of x, y, z and visibility. Nothing is kept between samples.
+    """
+    if metrics is None:
+        metrics = StageMetrics()
+    first_ms, frame_ms = frame_timing(cap)
+
+    # Index of the next frame grab() returns
+    frame_idx = 0
+
+    def grabbed_index():
+        if frame_ms is None:
+            return frame_idx
+        return int(round((cap.get(cv2.CAP_PROP_POS_MSEC) - first_ms) / frame_ms))
+
+    k = 0
+    if start_frame > 0:
+        landed = seek_before(cap, start_frame, grabbed_index)
+        if landed is None:
+            return
+        frame_idx = landed + 1
+        # Continue as a single pass would from the landing frame
+        k = first_sample_after(landed, frame_step)
+    next_frame = start_frame
+    last_logged = frame_idx // 100
+    start_time = time.time()
+
+    while cap.isOpened():
+        target = sampled_frame_index(k, frame_step) if scheduler is None else next_frame
+        if end_frame is not None and target >= end_frame:
+            break
+
+        # Advance to the next sampled frame without decoding the ones in between
+        stage_start = time.perf_counter()
+        if seek_gap is not None and target - frame_idx > seek_gap:
+            landed = seek_before(cap, target, grabbed_index)
+            if landed is None:
+                break
+            metrics.count('frames_seeked_over', max(0, landed + 1 - frame_idx))
+            frame_idx = landed + 1
+        # Grab up to the first frame at or after the target and decode only that one
+        grabbed = 0
+        while True:
+            ok = cap.grab()
+            if not ok:
+                break
+            index = grabbed_index()
+            frame_idx = index + 1
+            if index >= target:
+                if index >= start_frame:
+                    break
+                # Sampled by the previous segment, which owns the frames before start_frame
+                k = first_sample_after(index, frame_step)
+                target = sampled_frame_index(k, frame_step)
+            grabbed += 1
+        metrics.count('frames_grabbed', grabbed)
+        if not ok or (end_frame is not None and index >= end_frame):
+            # Past the end, or a frame owned by the next segment
+            break
+
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        # After dropped frames several targets land on this frame; it is sampled once
+        k = first_sample_after(index, frame_step)
+        decoded = time.perf_counter()
+        metrics.add('decode', decoded - stage_start)
+
+        # Crop to the tracked person before paying for color conversion and inference
+        if roi is not None:
+            region, box = roi.crop(frame)
+        else:
+            region = frame
+
+        # Convert BGR to RGB
+        image = cv2.cvtColor(region, cv2.COLOR_BGR2RGB)
+        image.flags.writeable = False
+        converted = time.perf_counter()
+        metrics.add('color_convert', converted - decoded)
+
+        # Perform pose estimation
+        results = pose.process(image)
+        metrics.add('inference', time.perf_counter() - converted)
+        metrics.count('frames_inferred')
+
+        # Log progress every 100 frames
+        if frame_count and frame_idx // 100 != last_logged:
+            last_logged = frame_idx // 100
+            elapsed = time.time() - start_time
+            print(f"Processed {frame_idx}/{frame_count} frames ({frame_idx/frame_count*100:.1f}%) in {elapsed:.1f}s")
+
+        # Extract landmarks if detected
+        timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000  # Convert to seconds
+        frame_landmarks = None
+        if results.pose_landmarks:
+            frame_landmarks = landmarks_to_array(results.pose_landmarks.landmark)
+            if roi is not None:
+                frame_landmarks = roi.to_frame(frame_landmarks, box, frame.shape)
+                roi.update(frame_landmarks, frame.shape)
+        elif roi is not None:
+            roi.lost()
+
+        if scheduler is not None:
+            next_frame = index + scheduler.next_step(timestamp, frame_landmarks)
+        if frame_landmarks is not None:
+            metrics.count('poses_detected')
+            yield timestamp, frame_landmarks
+
+def extract_frames(cap, pose, frame_step, start_frame=0, end_frame=None, frame_count=None, seek_gap=None,
+                   roi=None, scheduler=None, metrics=None):
+    """Collect iter_frames() into (timestamps, landmarks) lists."""
+    timestamps = []
+    landmarks = []
+    for timestamp, frame_landmarks in iter_frames(cap, pose, frame_step, start_frame, end_frame, frame_count,
+                                                  seek_gap, roi, scheduler, metrics):
+        timestamps.append(timestamp)
+        landmarks.append(frame_landmarks)
+    return timestamps, landmarks
+
+def iter_pose_samples(video_path, pose=None, sample_rate=None, model_complexity=1, roi_size=None):
+    """Stream (timestamp, landmarks) pose samples from a video as they come off the decoder.
+
+    Uses the same sampling as analyze_video(), but holds only the current frame, so
+    consumers can chain onto it with bounded memory however long the video is:
+
+        samples = iter_pose_samples('session.mp4', sample_rate=10)
+        with PoseStreamWriter('session.pose', landmark_column_names(), landmark_set='all') as writer:
+            for timestamp, landmarks in samples:
+                writer.append(landmark_row(timestamp, landmarks))
+                detector.update(landmarks[LANDMARK_INDEX['RIGHT_WRIST'], 1])
+
+    A warm Pose instance is reset and reused; otherwise one is built for the stream.
+    The capture (and a Pose built here) is released when the generator is exhausted
+    or closed, so breaking out of the loop early is fine.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration = frame_count / fps if fps > 0 else 0
+    frame_step = choose_frame_step(fps, duration, sample_rate)
+    seek_gap = int(2 * fps) if fps > 0 else None
+
+    if pose is not None:
+        pose.reset()
+        pose_context = nullcontext(pose)
+    else:
+        pose_context = create_pose(model_complexity)
+
+    try:
+        with pose_context as pose:
+            roi = PersonROI(roi_size) if roi_size else None
+            yield from iter_frames(cap, pose, frame_step, frame_count=frame_count, seek_gap=seek_gap, roi=roi)
+    finally:
+        cap.release()
+
+def _extract_segment(args):
+    """Process-pool entry point: extract one frame range with its own capture and Pose."""
+    video_path, frame_step, start_frame, end_frame, seek_gap, model_complexity, roi_size = args
+    cap = cv2.VideoCapture(video_path)
+    roi = PersonROI(roi_size) if roi_size else None
+    metrics = StageMetrics()
+    try:
+        with create_pose(model_complexity) as pose:
+            timestamps, landmarks = extract_frames(cap, pose, frame_step, start_frame, end_frame, seek_gap=seek_gap,
+                                                   roi=roi, metrics=metrics)
+        return timestamps, landmarks, metrics.to_dict()
+    finally:
+        cap.release()
+
+def segment_bounds(frame_count, workers):
+    """[(start_frame, end_frame)] of the contiguous segments for workers processes."""
+    segment_length = -(-frame_count // workers)
+    # The last segment runs to the end: with dropped frames, timestamp indices go past frame_count
+    return [(start, start + segment_length if start + segment_length < frame_count else None)
+            for start in range(0, frame_count, segment_length)]
+
+def extract_frames_parallel(video_path, frame_step, frame_count, workers, seek_gap=None, model_complexity=1,
+                            roi_size=None, metrics=None):
+    """Split the video into contiguous frame ranges and extract them in separate processes.
+
+    Sampling uses absolute, timestamp-based frame indices, so the union of segments
+    analyzes the same frames as a sequential pass (check_sampling.py verifies this
+    on a real video). Results are merged back into timestamp order.
+    Stage times of all segments are summed into metrics, so they add up to more
+    than the wall time.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    bounds = segment_bounds(frame_count, workers)
+    segments = [(video_path, frame_step, start, end, seek_gap, model_complexity, roi_size) for start, end in bounds]
+    print(f"Processing {len(segments)} segments of up to {bounds[0][1] or frame_count} frames on {workers} workers")
+
+    timestamps = []
+    landmarks = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for segment_timestamps, segment_landmarks, segment_metrics in executor.map(_extract_segment, segments):
+            timestamps.extend(segment_timestamps)
+            landmarks.extend(segment_landmarks)
+            if metrics is not None:
+                metrics.merge(segment_metrics)
+
+    order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+    return [timestamps[i] for i in order], [landmarks[i] for i in order]
+
+def analyze_video(video_path, output_path, pose=None, workers=1, sample_rate=None, model_complexity=1, cache=True,
+                  side='right', roi_size=None, plot=True, smoothing=None, adaptive=False, metrics=True,
+                  graph_points=DEFAULT_POINTS):
+    """Extract pose data from a video and save it as JSON, .pose and an analysis plot.
+
+    One pass keeps all 33 landmarks with visibility in the .pose file; the JSON and
+    the plot are the 'Shoulder_X' ... 'Wrist_Z' view of the chosen arm (side).
+
+    A warm Pose instance can be passed in to skip building the Mediapipe graph;
+    its tracking state is reset so nothing carries over from the previous video.
+    With workers > 1 the video is split into frame ranges processed in parallel,
+    each with its own Pose instance (the warm instance is then unused).
+    sample_rate is the target number of analyzed frames per second of video; when
+    omitted the legacy every-3rd/every-5th frame rule is used. A warm Pose must have
+    been built with the same model_complexity.
+    With cache=True, a video already analyzed with the same parameters is served
+    from the pose cache instead of being processed again.
+    roi_size enables person cropping: inference runs on a crop around the person
+    downsized to at most roi_size pixels on its longest side.
+    With plot=False only the pose data is written; render_plot.py can draw the
+    plot from the .pose file later if anyone asks for it.
+    smoothing ('kalman' or 'one_euro') filters the landmark series before it is
+    saved, which keeps jerk-based metrics stable with the light model and sparse
+    sampling.
+    With adaptive=True inference follows the arm's motion (dense during the swing,
+    sparse while still) and the samples are interpolated back onto the uniform
+    frame_step grid, so the outputs look like fixed-stride sampling. Adaptive
+    scheduling is sequential, so it ignores workers.
+    A <output>.graph.json with graph_points-point position/velocity/acceleration
+    series for the results page is written too, unless graph_points is 0/None.
+    With metrics=True, per-stage timings, frame counters and peak RSS are written
+    to a <output>.metrics.json sidecar (see instrumentation.py).
+    """
+    json_path = output_path.replace('.png', '.json')
+    pose_path = output_path.replace('.png', '.pose')
+    graph_path = output_path.replace('.png', '.graph.json')
+    outputs = {'pose.json': json_path, 'pose.pose': pose_path}
+    timings = StageMetrics('analyze_video')
+    timings.info.update(video=os.path.basename(video_path), workers=workers, sample_rate=sample_rate,
+                        model_complexity=model_complexity, roi_size=roi_size, smoothing=smoothing,
+                        adaptive=adaptive, cache_hit=False)
+
+    # Serve repeated uploads of the same video from the cache
+    if cache:
+        pose_cache = PoseCache()
+        key = cache_key(
+            video_path,
+            version=CACHE_VERSION,
+            model_complexity=model_complexity,
+            sample_rate=sample_rate,
+            landmark_set='all',
+            side=side,
+            roi_size=roi_size,
+            smoothing=smoothing,
+            adaptive=adaptive
+        )
+        with timings.stage('cache_lookup'):
+            cached = pose_cache.get(key, outputs)
+            if cached and not copy_cached(cached, outputs):
+                cached = None
+        if cached:
+            print(f"Loaded cached analysis for {video_path}")
+            timings.info['cache_hit'] = True
+            if plot:
+                with timings.stage('plot'):
+                    render_pose_plot(pose_path, output_path, side=side)
+            if graph_points:
+                with timings.stage('graph_series'):
+                    write_graph_series(pose_path, graph_path, side=side, n_points=graph_points)
+            if metrics:
+                timings.write(metrics_path(output_path))
+            return
 
     cap = cv2.VideoCapture(video_path)
 
@@ -39,76 +409,66 @@ def analyze_video(video_path, output_path):
     
     print(f"Video properties: {fps} FPS, {frame_count} frames, {duration:.2f} seconds")
     
-    # Adjust frame skip based on video duration
-    if duration > 30:  # For videos longer than 30 seconds
-        frame_skip = 5
-    else:
-        frame_skip = 3
+    frame_step = choose_frame_step(fps, duration, sample_rate)
+    # Seeking lands on a keyframe and decodes forward, so it only pays off for gaps of a couple of seconds
+    seek_gap = int(2 * fps) if fps > 0 else None
     
-    print(f"Using frame skip of {frame_skip}")
-    
-    # Process the video
-    with mp_pose.Pose(
-        model_complexity=1,  # Use lighter model
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5,
-        enable_segmentation=False  # Disable segmentation for speed
-    ) as pose:
-        frame_idx = 0
-        processed_frames = 0
-        start_time = time.time()
-        
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # Skip frames
-            if frame_idx % frame_skip != 0:
-                frame_idx += 1
-                continue
-
-            # Convert BGR to RGB
-            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
-
-            # Perform pose estimation
-            results = pose.process(image)
-
-            # Extract landmarks if detected
-            if results.pose_landmarks:
-                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000  # Convert to seconds
-                landmarks = results.pose_landmarks.landmark
-
-                # Append data to the dictionary
-                pose_data['Timestamp'].append(timestamp)
-                pose_data['Shoulder_X'].append(landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER].x)
-                pose_data['Shoulder_Y'].append(landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER].y)
-                pose_data['Shoulder_Z'].append(landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER].z)
-                pose_data['Elbow_X'].append(landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW].x)
-                pose_data['Elbow_Y'].append(landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW].y)
-                pose_data['Elbow_Z'].append(landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW].z)
-                pose_data['Wrist_X'].append(landmarks[mp_pose.PoseLandmark.RIGHT_WRIST].x)
-                pose_data['Wrist_Y'].append(landmarks[mp_pose.PoseLandmark.RIGHT_WRIST].y)
-                pose_data['Wrist_Z'].append(landmarks[mp_pose.PoseLandmark.RIGHT_WRIST].z)
-                processed_frames += 1
-            
-            frame_idx += 1
-            
-            # Log progress every 100 frames
-            if frame_idx % 100 == 0:
-                elapsed = time.time() - start_time
-                print(f"Processed {frame_idx}/{frame_count} frames ({frame_idx/frame_count*100:.1f}%) in {elapsed:.1f}s")
-
-    cap.release()
+    print(f"Using frame step of {frame_step:g} ({fps / frame_step:.2f} samples/s)")
+    timings.info.update(fps=fps, frame_count=frame_count, frame_step=frame_step)
+
+    start_time = time.time()
+
+    if adaptive and workers > 1:
+        print("Adaptive sampling depends on the previous sample, processing sequentially")
+        workers = 1
+    scheduler = AdaptiveScheduler(fps, frame_step) if adaptive else None
+
+    if workers > 1 and frame_count > 0:
+        cap.release()
+        timestamps, landmarks = extract_frames_parallel(video_path, frame_step, frame_count, workers,
+                                                        seek_gap=seek_gap, model_complexity=model_complexity,
+                                                        roi_size=roi_size, metrics=timings)
+    else:
+        # Reuse the caller's warm Pose instance, otherwise build one for this video
+        if pose is not None:
+            pose.reset()
+            pose_context = nullcontext(pose)
+        else:
+            with timings.stage('pose_setup'):
+                pose_context = create_pose(model_complexity)
+
+        # Process the video
+        with pose_context as pose:
+            roi = PersonROI(roi_size) if roi_size else None
+            timestamps, landmarks = extract_frames(cap, pose, frame_step, frame_count=frame_count, seek_gap=seek_gap,
+                                                   roi=roi, scheduler=scheduler, metrics=timings)
+        cap.release()
+
     total_time = time.time() - start_time
-    print(f"Video processing completed in {total_time:.1f}s. Processed {processed_frames} frames.")
+    print(f"Video processing completed in {total_time:.1f}s. Processed {len(timestamps)} frames.")
 
+    # All landmarks as one compact array; the arm columns below are views into it
+    landmarks = np.stack(landmarks) if landmarks else np.zeros((0, len(POSE_LANDMARKS), 4), dtype=np.float32)
+    if scheduler is not None:
+        uniform_samples = int(frame_count / frame_step) if frame_count > 0 else len(timestamps)
+        print(f"Adaptive sampling ran inference on {scheduler.inferences} frames "
+              f"(fixed stride: {uniform_samples})")
+        with timings.stage('resample'):
+            timestamps, landmarks = resample_uniform(timestamps, landmarks, fps / frame_step,
+                                                     max_gap=scheduler.max_gap)
+    # Fail before writing anything, so batch resume does not mistake the video for done
+    if len(timestamps) < 2:
+        raise ValueError("Insufficient data points for processing after cleaning.")
+    if smoothing:
+        with timings.stage('smoothing'):
+            landmarks = smooth_landmarks(timestamps, landmarks, smoothing)
+    pose_data = arm_view(timestamps, landmarks, side)
+
+    serialize_start = time.perf_counter()
     # Convert pose data to numpy arrays
     pose_data = {key: np.array(value).tolist() for key, value in pose_data.items()}
 
     # Save pose data as JSON with proper type conversion
-    json_path = output_path.replace('.png', '.json')
     with open(json_path, 'w') as f:
         # Convert all numpy types to Python native types
         def convert_numpy_types(obj):
@@ -129,99 +489,74 @@ def analyze_video(video_path, output_path):
         # Convert all values to native Python types
         pose_data = convert_numpy_types(pose_data)
         json.dump(pose_data, f)
+    timings.add('serialize_json', time.perf_counter() - serialize_start)
 
-    # Convert pose data back to numpy arrays for plotting
-    pose_data = {key: np.array(value) for key, value in pose_data.items()}
-
-    # Extract time and validate
-    timestamps = pose_data['Timestamp']
-    if len(timestamps) < 2:
-        raise ValueError("Insufficient data points for processing after cleaning.")
-
-    # Function to compute velocity and acceleration
-    def compute_derivatives(position, timestamps):
-        if len(position) < 2 or len(timestamps) < 2:
-            raise ValueError("Insufficient data points for derivative computation.")
-        velocity = np.gradient(position, timestamps)
-        acceleration = np.gradient(velocity, timestamps)
-        return velocity, acceleration
-
-    # Calculate derivatives only for essential coordinates (Y-axis for vertical movement)
-    derivatives = {}
-    for joint in ['Shoulder', 'Elbow', 'Wrist']:
-        pos = pose_data[f'{joint}_Y']
-        v, a = compute_derivatives(pos, timestamps)
-        derivatives[f'{joint}_Y_Velocity'] = v
-        derivatives[f'{joint}_Y_Acceleration'] = a
-
-    # Create a simplified analysis plot with only essential data
-    fig = plt.figure(figsize=(8, 8))  # Reduced from 10x10
-
-    # Plot vertical positions
-    plt.subplot(2, 2, 1)
-    plt.plot(timestamps[::2], pose_data['Shoulder_Y'][::2], label='Shoulder', linewidth=1)
-    plt.plot(timestamps[::2], pose_data['Elbow_Y'][::2], label='Elbow', linewidth=1)
-    plt.plot(timestamps[::2], pose_data['Wrist_Y'][::2], label='Wrist', linewidth=1)
-    plt.title('Vertical Position')
-    plt.xlabel('Time (s)')
-    plt.ylabel('Position')
-    plt.legend()
-    plt.grid(True, alpha=0.3)  # Reduced grid opacity
-
-    # Plot vertical velocities
-    plt.subplot(2, 2, 2)
-    plt.plot(timestamps[::2], derivatives['Shoulder_Y_Velocity'][::2], label='Shoulder', linewidth=1)
-    plt.plot(timestamps[::2], derivatives['Elbow_Y_Velocity'][::2], label='Elbow', linewidth=1)
-    plt.plot(timestamps[::2], derivatives['Wrist_Y_Velocity'][::2], label='Wrist', linewidth=1)
-    plt.title('Vertical Velocity')
-    plt.xlabel('Time (s)')
-    plt.ylabel('Velocity')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-
-    # Plot vertical accelerations
-    plt.subplot(2, 2, 3)
-    plt.plot(timestamps[::2], derivatives['Shoulder_Y_Acceleration'][::2], label='Shoulder', linewidth=1)
-    plt.plot(timestamps[::2], derivatives['Elbow_Y_Acceleration'][::2], label='Elbow', linewidth=1)
-    plt.plot(timestamps[::2], derivatives['Wrist_Y_Acceleration'][::2], label='Wrist', linewidth=1)
-    plt.title('Vertical Acceleration')
-    plt.xlabel('Time (s)')
-    plt.ylabel('Acceleration')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-
-    # Plot 3D trajectory with reduced points
-    ax = fig.add_subplot(2, 2, 4, projection='3d')
-    ax.plot(pose_data['Shoulder_X'][::4], pose_data['Shoulder_Y'][::4], pose_data['Shoulder_Z'][::4], 
-            label='Shoulder', linewidth=1)
-    ax.plot(pose_data['Elbow_X'][::4], pose_data['Elbow_Y'][::4], pose_data['Elbow_Z'][::4], 
-            label='Elbow', linewidth=1)
-    ax.plot(pose_data['Wrist_X'][::4], pose_data['Wrist_Y'][::4], pose_data['Wrist_Z'][::4], 
-            label='Wrist', linewidth=1)
-    ax.set_title('3D Trajectory')
-    ax.set_xlabel('X')
-    ax.set_ylabel('Y')
-    ax.set_zlabel('Z')
-    ax.legend()
-
-    # Save the plot with reduced DPI and simplified style
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=80, bbox_inches='tight')  # Reduced DPI from 100 to 80
-    plt.close()
+    # Save every landmark in the compact binary format read by analyze_improvement.py
+    serialize_start = time.perf_counter()
+    write_pose_file(
+        pose_path, landmark_columns(timestamps, landmarks),
+        fps=fps,
+        landmark_set='all',
+        landmarks=POSE_LANDMARKS,
+        sampling={'frame_step': frame_step, 'sample_rate': sample_rate, 'adaptive': adaptive,
+                  'inferences': scheduler.inferences if scheduler is not None else None},
+        smoothing=smoothing
+    )
+    timings.add('write_pose', time.perf_counter() - serialize_start)
+    timings.count('samples_written', len(timestamps))
 
     # Verify the output files exist
-    if not os.path.exists(output_path):
-        print(f"Error: Analysis results not found at {output_path}")
-        return
     if not os.path.exists(json_path):
         print(f"Error: Pose data not found at {json_path}")
         return
 
+    if cache:
+        pose_cache.put(key, outputs)
+
+    if plot:
+        with timings.stage('plot'):
+            render_pose_plot(pose_path, output_path, side=side, cache=cache)
+    if graph_points:
+        with timings.stage('graph_series'):
+            write_graph_series(pose_path, graph_path, side=side, n_points=graph_points)
+
+    if metrics:
+        timings.write(metrics_path(output_path))
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python analyze_video.py <video_path> <output_path>")
-        sys.exit(1)
-    
-    video_path = sys.argv[1]
-    output_path = sys.argv[2]
-    analyze_video(video_path, output_path) 
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract arm pose data from a video")
+    parser.add_argument('video_path')
+    parser.add_argument('output_path')
+    parser.add_argument('--workers', type=int, default=1, help="number of processes for chunked extraction")
+    parser.add_argument('--sample-rate', type=float, default=None,
+                        help="frames analyzed per second of video (default: hardware profile, else every 3rd "
+                             "frame, every 5th over 30s)")
+    parser.add_argument('--model-complexity', type=int, default=None, choices=[0, 1, 2],
+                        help="default: hardware profile, else 1")
+    parser.add_argument('--side', default='right', choices=['right', 'left'], help="arm written to the JSON and plot")
+    parser.add_argument('--roi-size', type=int, default=None,
+                        help="crop to the person and downsize to this many pixels before inference (e.g. 512; "
+                             "default: hardware profile)")
+    parser.add_argument('--smoothing', default=None, choices=SMOOTHING_METHODS,
+                        help="filter landmark jitter before saving (kalman for recorded videos)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="run inference more often during fast motion and less while still")
+    parser.add_argument('--graph-points', type=int, default=DEFAULT_POINTS,
+                        help="points per series in the .graph.json for the results page (0 to skip it)")
+    parser.add_argument('--no-cache', action='store_true', help="always process the video, ignoring the pose cache")
+    parser.add_argument('--data-only', action='store_true',
+                        help="write only the pose JSON and .pose files, skip the analysis plot")
+    parser.add_argument('--no-profile', action='store_true',
+                        help="ignore the hardware profile from hardware_profile.py calibrate")
+    args = parser.parse_args()
+
+    from hardware_profile import profile_settings
+    settings = profile_settings(use_profile=not args.no_profile, model_complexity=args.model_complexity,
+                                sample_rate=args.sample_rate, roi_size=args.roi_size)
+
+    analyze_video(args.video_path, args.output_path, workers=args.workers, sample_rate=settings['sample_rate'],
+                  model_complexity=settings['model_complexity'], cache=not args.no_cache, side=args.side,
+                  roi_size=settings['roi_size'], plot=not args.data_only, smoothing=args.smoothing,
+                  adaptive=args.adaptive, graph_points=args.graph_points)
\ No newline at end of file
@@ -0,0 +1,306 @@
+"""Per-patient baseline anomaly models, fitted once and stored for later sessions.
+
+The online detectors (online_detectors.py) learn "normal" from the session they
+are scoring, so every session warms up for 30 frames and keeps refitting. A
+baseline model is fitted once on a patient's before recording instead, and
+later live or offline sessions only score frames against it: one cheap predict
+per frame, no warmup, no refits, and anomalies mean "unlike this patient's
+baseline", which is the comparison clinicians care about.
+
+Models are stored under tmp/baseline_models in the project (SWING_MODEL_DIR to
+move it), one .npz file of state arrays per patient/arm/method, with an
+index.json holding every model's metadata (patient, arm, method, feature
+definition, baseline source and parameters), so finding a model never opens the
+model files. Every model (stddev, knn, kmeans, and isofor as an exact lookup
+table) is a few NumPy arrays, so loading and predicting need neither sklearn nor
+a refit, and model files are read with allow_pickle=False: nothing in the store
+can run code.
+
+Usage:
+    python baseline_models.py fit <before.pose> --patient ID [--side right] [--method isofor]
+    python baseline_models.py score <session.pose> --patient ID [--side right] [--method isofor]
+    python baseline_models.py list [--patient ID]
+"""
+import io
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from online_detectors import DETECTOR_METHODS
+from pose_format import load_pose_data
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tmp', 'baseline_models')
+
+# What the models are fitted on; stored with every model and checked on load
+FEATURE = {
+    'name': 'forearm_angle',
+    'units': 'degrees',
+    'definition': 'atan2(wrist.y - elbow.y, wrist.x - elbow.x) in normalized image coordinates',
+    'version': 1,
+}
+
+DEFAULT_PARAMS = {
+    'stddev': {'n_std': 2.0},
+    'isofor': {'contamination': 0.02},
+    'knn': {'n_neighbors': 2, 'percentile': 95},
+    'kmeans': {'n_clusters': 2, 'percentile': 95},
+}
+
+
+def forearm_angles(pose_data):
+    """Forearm angle per sample from an arm pose dict, as computed live by live_pipeline.arm_angle()."""
+    dy = np.asarray(pose_data['Wrist_Y'], dtype=float) - np.asarray(pose_data['Elbow_Y'], dtype=float)
+    dx = np.asarray(pose_data['Wrist_X'], dtype=float) - np.asarray(pose_data['Elbow_X'], dtype=float)
+    angles = np.arctan2(dy, dx) * (180 / np.pi)
+    return angles[np.isfinite(angles)]
+
+
+class BaselineModel:
+    """A detector frozen on baseline angles; predict() flags anomalous angles.
+
+    Also has the update()/close() interface of the online detectors, so it can
+    replace one in the live loop unchanged.
+    """
+
+    def __init__(self, method, params, state, metadata=None):
+        self.method = method
+        self.params = params
+        self.state = state
+        self.metadata = metadata or {}
+
+    def predict(self, values):
+        """Boolean anomaly flag for each angle in values."""
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        if self.method == 'stddev':
+            return np.abs(values - self.state['mean']) > self.params['n_std'] * self.state['std']
+        if self.method == 'isofor':
+            # sklearn compares float32 inputs against the split thresholds
+            values = values.astype(np.float32).astype(float)
+            return self.state['flags'][np.searchsorted(self.state['thresholds'], values)]
+        if self.method == 'knn':
+            kth = kth_distances(self.state['sorted'], values, self.params['n_neighbors'])
+            return kth > self.state['threshold']
+        if self.method == 'kmeans':
+            distances = np.min(np.abs(values[:, None] - self.state['centroids'][None, :]), axis=1)
+            return distances > self.state['threshold']
+        raise ValueError(f"Unknown anomaly detection method: {self.method}")
+
+    def update(self, value):
+        return bool(self.predict(value)[0])
+
+    def close(self):
+        pass
+
+
+def kth_distances(baseline, values, k):
+    """Distance from each value to its k-th nearest angle in the sorted baseline.
+
+    The k nearest neighbours are among the k baseline angles on either side of
+    the value's insertion point, so this is a searchsorted plus a (n, 2k) gather.
+    """
+    position = np.searchsorted(baseline, values)
+    window = position[:, None] + np.arange(-k, k)[None, :]
+    valid = (window >= 0) & (window < len(baseline))
+    distances = np.where(valid, np.abs(baseline[np.clip(window, 0, len(baseline) - 1)] - values[:, None]), np.inf)
+    return np.partition(distances, k - 1, axis=1)[:, k - 1]
+
+
+def isolation_forest_table(model):
+    """Exact lookup table of a one-feature IsolationForest's predictions.
+
+    On a single feature every tree only compares the angle against its split
+    thresholds, so between two consecutive thresholds (of all trees) the forest's
+    answer is constant. Evaluating the forest once per interval turns each later
+    prediction into a searchsorted, without sklearn or its per-call overhead.
+    Returns {'thresholds': sorted (n,), 'flags': (n + 1,) bool}; interval i is
+    (thresholds[i - 1], thresholds[i]], matching sklearn's "x <= threshold goes left".
+    """
+    thresholds = np.unique(np.concatenate([tree.tree_.threshold[tree.tree_.feature >= 0]
+                                           for tree in model.estimators_]))
+    # One float32 input inside each interval, since that is what sklearn evaluates
+    representatives = thresholds.astype(np.float32)
+    too_high = representatives.astype(float) > thresholds
+    representatives[too_high] = np.nextafter(representatives[too_high], np.float32(-np.inf))
+    last = np.nextafter(np.float32(thresholds[-1]) if len(thresholds) else np.float32(0), np.float32(np.inf))
+    representatives = np.append(representatives, last)
+    flags = model.predict(representatives.reshape(-1, 1)) == -1  # -1 means anomaly
+    return {'thresholds': thresholds, 'flags': flags}
+
+
+def fit_baseline(angles, method='isofor', **params):
+    """Fit a BaselineModel of one of DETECTOR_METHODS on baseline angles."""
+    method = method.lower()
+    if method not in DEFAULT_PARAMS:
+        raise ValueError(f"Unknown anomaly detection method: {method}. Choose from {', '.join(DETECTOR_METHODS)}")
+    params = dict(DEFAULT_PARAMS[method], **params)
+    angles = np.asarray(angles, dtype=float)
+    if len(angles) < 10:
+        raise ValueError(f"Need at least 10 baseline samples to fit a model, got {len(angles)}")
+
+    if method == 'stddev':
+        state = {'mean': float(np.mean(angles)), 'std': float(np.std(angles))}
+    elif method == 'isofor':
+        from sklearn.ensemble import IsolationForest
+        model = IsolationForest(n_estimators=100, contamination=params['contamination'], random_state=42)
+        model.fit(angles.reshape(-1, 1))
+        state = isolation_forest_table(model)
+    elif method == 'knn':
+        # Threshold from the baseline's own k-NN distances; k + 1 because each angle finds itself first
+        baseline = np.sort(angles)
+        distances = kth_distances(baseline, baseline, params['n_neighbors'] + 1)
+        state = {'sorted': baseline, 'threshold': float(np.percentile(distances, params['percentile']))}
+    else:
+        from sklearn.cluster import KMeans
+        model = KMeans(n_clusters=params['n_clusters'], random_state=42, n_init=10).fit(angles.reshape(-1, 1))
+        centroids = model.cluster_centers_.ravel()
+        distances = np.min(np.abs(angles[:, None] - centroids[None, :]), axis=1)
+        state = {'centroids': centroids, 'threshold': float(np.percentile(distances, params['percentile']))}
+
+    metadata = {'n_samples': int(len(angles)), 'angle_mean': float(np.mean(angles)),
+                'angle_std': float(np.std(angles))}
+    return BaselineModel(method, params, state, metadata)
+
+
+class ModelStore:
+    """Directory of BaselineModel state arrays (.npz) plus an index.json of their metadata."""
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or os.environ.get('SWING_MODEL_DIR', DEFAULT_MODEL_DIR))
+        os.makedirs(self.root, exist_ok=True)
+        self.index_path = os.path.join(self.root, 'index.json')
+
+    @staticmethod
+    def model_id(patient, side, method):
+        safe_patient = ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(patient))
+        return f"{safe_patient}-{side}-{method.lower()}"
+
+    def _write_atomic(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=self.root)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def index(self):
+        """{model_id: metadata} of every stored model."""
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def save(self, model, patient, side, source=None):
+        """Store a model for (patient, side, its method), replacing an earlier one."""
+        model_id = self.model_id(patient, side, model.method)
+        file_name = model_id + '.npz'
+        model.metadata.update({
+            'id': model_id,
+            'patient': str(patient),
+            'side': side,
+            'method': model.method,
+            'params': model.params,
+            'feature': FEATURE,
+            'source': source,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'file': file_name,
+        })
+        # Arrays only; method, params and metadata live in the index
+        buffer = io.BytesIO()
+        np.savez(buffer, **{name: np.asarray(value) for name, value in model.state.items()})
+        self._write_atomic(os.path.join(self.root, file_name), buffer.getvalue())
+        index = self.index()
+        previous = index.get(model_id, {}).get('file')
+        index[model_id] = model.metadata
+        self._write_atomic(self.index_path, json.dumps(index, indent=2).encode('utf-8'))
+        if previous and previous != file_name and os.path.exists(os.path.join(self.root, previous)):
+            # Replaced a model stored in the old format
+            os.remove(os.path.join(self.root, previous))
+        return model_id
+
+    def find(self, patient=None, side=None, method=None):
+        """Metadata of the stored models matching every given field."""
+        wanted = {'patient': None if patient is None else str(patient), 'side': side,
+                  'method': None if method is None else method.lower()}
+        return [entry for entry in self.index().values()
+                if all(value is None or entry.get(field) == value for field, value in wanted.items())]
+
+    def load(self, patient, side, method):
+        """The stored model for (patient, side, method), or None if there is none."""
+        entry = self.index().get(self.model_id(patient, side, method))
+        if entry is None:
+            return None
+        if entry.get('feature', {}).get('version') != FEATURE['version']:
+            raise ValueError(f"Model {entry['id']} was fitted on feature version {entry['feature'].get('version')}, "
+                             f"refit it from the baseline recording")
+        if not entry['file'].endswith('.npz'):
+            raise ValueError(f"Model {entry['id']} is in an old format, refit it from the baseline recording")
+        with np.load(os.path.join(self.root, entry['file']), allow_pickle=False) as stored:
+            # Scalars (mean, std, thresholds) were saved as 0-d arrays
+            state = {name: float(stored[name]) if stored[name].ndim == 0 else stored[name] for name in stored.files}
+        return BaselineModel(entry['method'], entry['params'], state, entry)
+
+
+def fit_baseline_file(pose_path, patient, side='right', method='isofor', store=None, **params):
+    """Fit a baseline model on a before recording (.pose or analyze_video JSON) and store it."""
+    from pose_cache import hash_file
+
+    angles = forearm_angles(load_pose_data(pose_path, side))
+    model = fit_baseline(angles, method, **params)
+    store = store or ModelStore()
+    source = {'path': os.path.basename(pose_path), 'sha256': hash_file(pose_path)}
+    model_id = store.save(model, patient, side, source)
+    print(f"Stored {method} baseline {model_id} fitted on {len(angles)} samples of {pose_path}")
+    return model
+
+
+def score_file(pose_path, patient, side='right', method='isofor', store=None):
+    """Score every sample of a recording against the patient's stored baseline model."""
+    model = (store or ModelStore()).load(patient, side, method)
+    if model is None:
+        raise ValueError(f"No {method} baseline stored for patient {patient} ({side} arm)")
+    angles = forearm_angles(load_pose_data(pose_path, side))
+    flags = model.predict(angles)
+    return {
+        'model': model.metadata.get('id'),
+        'n_samples': int(len(angles)),
+        'anomalies': int(np.count_nonzero(flags)),
+        'anomaly_fraction': float(np.mean(flags)) if len(flags) else 0.0,
+        'flags': flags.astype(int).tolist(),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fit, list and apply per-patient baseline anomaly models")
+    commands = parser.add_subparsers(dest='command', required=True)
+    fit_command = commands.add_parser('fit', help="fit a model on a baseline recording")
+    score_command = commands.add_parser('score', help="score a recording against a stored model")
+    score_command.add_argument('--output', help="also write the per-sample flags as JSON")
+    for command in (fit_command, score_command):
+        command.add_argument('pose_path', help=".pose file or pose JSON from analyze_video.py")
+        command.add_argument('--patient', required=True)
+        command.add_argument('--side', default='right', choices=['right', 'left'])
+        command.add_argument('--method', default='isofor', choices=DETECTOR_METHODS)
+    list_command = commands.add_parser('list', help="show stored models")
+    list_command.add_argument('--patient')
+    args = parser.parse_args()
+
+    if args.command == 'fit':
+        fit_baseline_file(args.pose_path, args.patient, args.side, args.method)
+    elif args.command == 'score':
+        result = score_file(args.pose_path, args.patient, args.side, args.method)
+        print(f"{result['anomalies']} of {result['n_samples']} samples anomalous "
+              f"({result['anomaly_fraction'] * 100:.1f}%) against {result['model']}")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(result, f)
+    else:
+        for entry in ModelStore().find(patient=args.patient):
+            print(f"{entry['id']:40s} {entry['n_samples']:6d} samples  {entry['created']}  "
+                  f"{(entry.get('source') or {}).get('path', '')}")
@@ -0,0 +1,276 @@
+"""Batch analysis of before/after video pairs from a manifest.
+
+The manifest is a CSV file with a header row and the columns
+
+    id,before,after[,side]
+
+where before/after are video paths (relative to the manifest) and side is
+'right' (default) or 'left'. Every distinct video is extracted once, even when it
+is the baseline for many pairs, and each pair's improvement job starts as soon as
+both of its videos are done. Jobs run on a process pool with a warm Pose per
+process; --jobs bounds the concurrency.
+
+Outputs go to <output_dir>/videos/ (pose JSON and .pose per video, plus the
+analysis plot with --plots and the annotated video with --overlays) and
+<output_dir>/pairs/<id>/improvement_analysis.json. Work whose outputs already
+exist is skipped, so an interrupted run resumes where it stopped (--force redoes
+everything). Per-job logs are written to <output_dir>/logs/ and a summary table
+to <output_dir>/summary.csv. The per-run .metrics.json stage timings are
+aggregated into <output_dir>/metrics_summary.json. Sample rate, model
+complexity and ROI size default to the machine's hardware profile
+(hardware_profile.py calibrate).
+
+Usage: python batch_analyze.py <manifest.csv> <output_dir> [--jobs N] [--force] [--plots] [--overlays]
+"""
+import argparse
+import contextlib
+import csv
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+SUMMARY_FIELDS = [
+    'id', 'status', 'overall_score', 'overall_ci_low', 'overall_ci_high', 'improved', 'improved_probability',
+    'range_of_motion_score', 'smoothness_score',
+    'range_of_motion_p_value', 'smoothness_p_value', 'seconds', 'error'
+]
+
+# Warm Pose for the current pool process, built by _init_process
+_pose = None
+_options = {}
+
+
+def _init_process(options):
+    global _pose, _options
+    from analyze_video import create_pose
+    _options = options
+    _pose = create_pose(options['model_complexity'])
+
+
+def _run_logged(log_path, func, *args, **kwargs):
+    """Run func with its prints and debug output sent to log_path; returns (ok, seconds, error)."""
+    start_time = time.time()
+    # debug() writes to stderr; keep it in the job's log instead of interleaving it on the terminal
+    with open(log_path, 'w') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            func(*args, **kwargs)
+            return True, time.time() - start_time, ''
+        except (Exception, SystemExit) as e:
+            # analyze_video exits on unreadable videos; report it instead of killing the pool process
+            traceback.print_exc(file=log)
+            return False, time.time() - start_time, str(e) or type(e).__name__
+
+
+def _extract(video_path, output_path):
+    from analyze_video import analyze_video
+    analyze_video(video_path, output_path, pose=_pose, sample_rate=_options['sample_rate'],
+                  model_complexity=_options['model_complexity'], roi_size=_options['roi_size'], plot=_options['plots'],
+                  smoothing=_options['smoothing'], adaptive=_options['adaptive'])
+    if _options['overlays']:
+        from overlay_renderer import render_overlay
+        render_overlay(video_path, output_path.replace('.png', '.pose'),
+                       output_path.replace('_analysis.png', '_overlay.mp4'))
+
+
+def extract_job(video_path, output_path, log_path):
+    return _run_logged(log_path, _extract, video_path, output_path)
+
+
+def improvement_job(before_pose, after_pose, output_path, side, log_path):
+    from analyze_improvement import analyze_improvement_files
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    return _run_logged(log_path, analyze_improvement_files, before_pose, after_pose, output_path, side=side)
+
+
+def read_manifest(manifest_path):
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    pairs = []
+    with open(manifest_path, newline='') as f:
+        for row in csv.DictReader(f):
+            pairs.append({
+                'id': row['id'].strip(),
+                'before': os.path.join(base_dir, row['before'].strip()),
+                'after': os.path.join(base_dir, row['after'].strip()),
+                'side': (row.get('side') or 'right').strip().lower(),
+            })
+    return pairs
+
+
+def video_output_name(video_path):
+    """Stable, collision-free output name for a video path."""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    digest = hashlib.sha1(os.path.abspath(video_path).encode('utf-8')).hexdigest()[:8]
+    return f'{stem}-{digest}'
+
+
+def summarize(pair, status, seconds, error, improvement_path):
+    row = {'id': pair['id'], 'status': status, 'seconds': round(seconds, 2), 'error': error}
+    if status in ('done', 'skipped') and os.path.exists(improvement_path):
+        with open(improvement_path) as f:
+            result = json.load(f)
+        statistics = result.get('statistics', {})
+        confidence = result.get('confidence', {}).get('overall', {})
+        row.update({
+            'overall_score': result.get('overall_score'),
+            'overall_ci_low': confidence.get('ci_low'),
+            'overall_ci_high': confidence.get('ci_high'),
+            'improved_probability': confidence.get('improved_probability'),
+            'improved': result.get('improved'),
+            'range_of_motion_score': result.get('details', {}).get('range_of_motion', {}).get('score'),
+            'smoothness_score': result.get('details', {}).get('smoothness', {}).get('score'),
+            'range_of_motion_p_value': statistics.get('range_of_motion', {}).get('upper_arm', {}).get('p_value'),
+            'smoothness_p_value': statistics.get('smoothness', {}).get('upper_arm', {}).get('p_value'),
+        })
+    return row
+
+
+def run_batch(manifest_path, output_dir, jobs=2, force=False, sample_rate=None, model_complexity=1, plots=False,
+              overlays=False, smoothing=None, adaptive=False, roi_size=None):
+    pairs = read_manifest(manifest_path)
+    video_dir = os.path.join(output_dir, 'videos')
+    pair_dir = os.path.join(output_dir, 'pairs')
+    log_dir = os.path.join(output_dir, 'logs')
+    for directory in (video_dir, pair_dir, log_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    def improvement_path(pair):
+        return os.path.join(pair_dir, pair['id'], 'improvement_analysis.json')
+
+    def pose_path(video_path):
+        return os.path.join(video_dir, video_output_name(video_path) + '_analysis.pose')
+
+    summary = {}
+    pending_pairs = []
+    for pair in pairs:
+        if not force and os.path.exists(improvement_path(pair)):
+            summary[pair['id']] = summarize(pair, 'skipped', 0.0, '', improvement_path(pair))
+        else:
+            pending_pairs.append(pair)
+
+    # Each distinct video is extracted once, however many pairs use it
+    videos = []
+    for pair in pending_pairs:
+        for video_path in (pair['before'], pair['after']):
+            if video_path not in videos and (force or not os.path.exists(pose_path(video_path))):
+                videos.append(video_path)
+
+    print(f"{len(pairs)} pairs: {len(pairs) - len(pending_pairs)} already done, "
+          f"{len(videos)} videos to extract, {len(pending_pairs)} improvement jobs, {jobs} processes")
+
+    options = {'sample_rate': sample_rate, 'model_complexity': model_complexity, 'roi_size': roi_size, 'plots': plots,
+               'overlays': overlays, 'smoothing': smoothing, 'adaptive': adaptive}
+    failed_videos = {}
+    elapsed = {pair['id']: 0.0 for pair in pending_pairs}
+    start_time = time.time()
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_process, initargs=(options,)) as executor:
+        running = {}
+        for video_path in videos:
+            name = video_output_name(video_path)
+            future = executor.submit(extract_job, video_path, os.path.join(video_dir, name + '_analysis.png'),
+                                     os.path.join(log_dir, name + '.log'))
+            running[future] = ('video', video_path)
+
+        waiting = list(pending_pairs)
+        remaining_videos = set(videos)
+
+        def submit_ready_pairs():
+            for pair in list(waiting):
+                needed = {pair['before'], pair['after']}
+                if needed & remaining_videos:
+                    continue
+                waiting.remove(pair)
+                failed = [video for video in needed if video in failed_videos]
+                if failed:
+                    summary[pair['id']] = summarize(pair, 'failed', elapsed[pair['id']],
+                                                    f"extraction failed: {failed_videos[failed[0]]}", '')
+                    continue
+                future = executor.submit(improvement_job, pose_path(pair['before']), pose_path(pair['after']),
+                                         improvement_path(pair), pair['side'],
+                                         os.path.join(log_dir, f"pair-{pair['id']}.log"))
+                running[future] = ('pair', pair)
+
+        submit_ready_pairs()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, item = running.pop(future)
+                ok, seconds, error = future.result()
+                if kind == 'video':
+                    remaining_videos.discard(item)
+                    if not ok:
+                        failed_videos[item] = error
+                    for pair in pending_pairs:
+                        if item in (pair['before'], pair['after']):
+                            elapsed[pair['id']] += seconds
+                    print(f"[{time.time() - start_time:7.1f}s] extracted {os.path.basename(item)}"
+                          + ("" if ok else f" FAILED: {error}"))
+                else:
+                    elapsed[item['id']] += seconds
+                    summary[item['id']] = summarize(item, 'done' if ok else 'failed', elapsed[item['id']], error,
+                                                    improvement_path(item))
+                    print(f"[{time.time() - start_time:7.1f}s] pair {item['id']}" + ("" if ok else f" FAILED: {error}"))
+            submit_ready_pairs()
+
+    rows = [summary[pair['id']] for pair in pairs if pair['id'] in summary]
+    summary_path = os.path.join(output_dir, 'summary.csv')
+    with open(summary_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"\n{'id':20s} {'status':8s} {'score':>8s} {'improved':>9s}")
+    for row in rows:
+        score = row.get('overall_score')
+        print(f"{row['id']:20s} {row['status']:8s} {score if score is None else round(score, 3)!s:>8s} "
+              f"{row.get('improved')!s:>9s}")
+    print(f"Summary written to {summary_path}")
+
+    # Stage timings of every video and pair in the output directory, including earlier runs
+    from instrumentation import aggregate_metrics
+    sidecars = []
+    for directory in [video_dir] + [os.path.join(pair_dir, pair['id']) for pair in pairs]:
+        if os.path.isdir(directory):
+            sidecars.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                            if name.endswith('.metrics.json'))
+    metrics_summary_path = os.path.join(output_dir, 'metrics_summary.json')
+    with open(metrics_summary_path, 'w') as f:
+        json.dump(aggregate_metrics(sidecars), f, indent=2)
+    print(f"Stage timings of {len(sidecars)} runs written to {metrics_summary_path}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a manifest of before/after video pairs")
+    parser.add_argument('manifest', help="CSV with columns id,before,after[,side]")
+    parser.add_argument('output_dir')
+    parser.add_argument('--jobs', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="number of worker processes")
+    parser.add_argument('--force', action='store_true', help="redo pairs and videos that already have outputs")
+    parser.add_argument('--sample-rate', type=float, default=None,
+                        help="frames analyzed per second of video (default: hardware profile)")
+    parser.add_argument('--model-complexity', type=int, default=None, choices=[0, 1, 2],
+                        help="default: hardware profile, else 1")
+    parser.add_argument('--roi-size', type=int, default=None,
+                        help="crop to the person and downsize to this many pixels (default: hardware profile)")
+    parser.add_argument('--no-profile', action='store_true', help="ignore the hardware profile")
+    parser.add_argument('--smoothing', default=None, choices=['kalman', 'one_euro'],
+                        help="filter landmark jitter before saving")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="sample densely during fast motion and sparsely while still")
+    parser.add_argument('--plots', action='store_true',
+                        help="also render the analysis plot per video (render_plot.py can do it later)")
+    parser.add_argument('--overlays', action='store_true', help="also write each video with its pose drawn on it")
+    args = parser.parse_args()
+
+    from hardware_profile import profile_settings
+    settings = profile_settings(use_profile=not args.no_profile, model_complexity=args.model_complexity,
+                                sample_rate=args.sample_rate, roi_size=args.roi_size)
+
+    run_batch(args.manifest, args.output_dir, jobs=args.jobs, force=args.force,
+              sample_rate=settings['sample_rate'], model_complexity=settings['model_complexity'],
+              roi_size=settings['roi_size'], plots=args.plots, overlays=args.overlays, smoothing=args.smoothing,
+              adaptive=args.adaptive)
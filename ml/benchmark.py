@@ -0,0 +1,195 @@
+"""Offline benchmark suite for the pose pipeline.
+
+Generates synthetic arm-swing pose trajectories and a short synthetic video
+locally, then measures:
+
+- extraction throughput of analyze_video() in frames per second
+- time per stage of the improvement step (feature extraction, statistics)
+- peak memory (Python allocations per stage, peak RSS of the whole run)
+
+Each run is saved as JSON under tmp/benchmarks/ (or --output-dir) tagged with the
+current git commit, and compared against the previous saved run so regressions
+show up before they reach a clinic.
+
+Usage: python benchmark.py [--duration SECONDS] [--repeats N] [--skip-video] [--compare RESULT.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from instrumentation import peak_rss_mb
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tmp', 'benchmarks')
+
+
+def synthetic_pose_data(duration=20.0, fps=10.0, amplitude=0.15, frequency=0.8, noise=0.003, seed=0):
+    """Right arm pose series of a pendulum-like arm swing, in analyze_video JSON layout."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * fps)) / fps
+    swing = amplitude * np.sin(2 * np.pi * frequency * t)
+
+    shoulder = np.stack([np.full_like(t, 0.45), np.full_like(t, 0.35), np.full_like(t, -0.1)], axis=1)
+    elbow = shoulder + np.stack([0.05 + 0.5 * swing, 0.15 - 0.2 * np.abs(swing), 0.5 * swing], axis=1)
+    wrist = elbow + np.stack([0.04 + swing, 0.13 - 0.3 * np.abs(swing), swing], axis=1)
+
+    pose_data = {'Timestamp': t}
+    for joint, position in [('Shoulder', shoulder), ('Elbow', elbow), ('Wrist', wrist)]:
+        position = position + rng.normal(0, noise, position.shape)
+        for i, axis in enumerate('XYZ'):
+            pose_data[f'{joint}_{axis}'] = position[:, i]
+    return {key: value.tolist() for key, value in pose_data.items()}
+
+
+def synthetic_video(path, duration=5.0, fps=30, width=640, height=480, frequency=0.8):
+    """Write a stick figure swinging its right arm, for extraction throughput runs."""
+    import cv2
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    cx, top = width // 2, height // 6
+    scale = height / 480
+    for i in range(int(duration * fps)):
+        angle = 0.9 * np.sin(2 * np.pi * frequency * i / fps)
+        frame[:] = (200, 200, 200)
+        shoulder = (cx - int(40 * scale), top + int(80 * scale))
+        elbow = (shoulder[0] - int(70 * scale * np.cos(angle)), shoulder[1] + int(70 * scale * (1 + np.sin(angle)) / 2 + 30 * scale))
+        wrist = (elbow[0] - int(60 * scale * np.cos(angle)), elbow[1] + int(60 * scale * np.sin(angle) + 20 * scale))
+        cv2.circle(frame, (cx, top + int(30 * scale)), int(28 * scale), (90, 120, 170), -1)
+        cv2.rectangle(frame, (cx - int(40 * scale), top + int(65 * scale)), (cx + int(40 * scale), top + int(220 * scale)), (60, 60, 140), -1)
+        cv2.line(frame, (cx + int(40 * scale), top + int(80 * scale)), (cx + int(60 * scale), top + int(200 * scale)), (90, 120, 170), int(14 * scale))
+        cv2.line(frame, shoulder, elbow, (90, 120, 170), int(14 * scale))
+        cv2.line(frame, elbow, wrist, (90, 120, 170), int(12 * scale))
+        for dx in (-20, 20):
+            cv2.line(frame, (cx + int(dx * scale), top + int(220 * scale)), (cx + int(dx * 1.5 * scale), height - 10), (50, 50, 50), int(16 * scale))
+        writer.write(frame)
+    writer.release()
+    return int(duration * fps)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def time_stage(func, repeats):
+    """Best wall time over repeats, plus peak traced Python memory of one extra run."""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start_time)
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {'seconds': min(timings), 'mean_seconds': float(np.mean(timings)), 'peak_mb': peak / (1024 * 1024)}
+
+
+def bench_improvement(duration, repeats):
+    from analyze_improvement import analyze_improvement, extract_features
+
+    before = synthetic_pose_data(duration=duration, amplitude=0.12, seed=1)
+    after = synthetic_pose_data(duration=duration, amplitude=0.16, seed=2)
+    with contextlib.redirect_stdout(io.StringIO()):
+        before_features = extract_features(before)
+        after_features = extract_features(after)
+
+    return {
+        'samples': len(before['Timestamp']),
+        'features': time_stage(lambda: (extract_features(before), extract_features(after)), repeats),
+        # Features are precomputed, so this is dominated by the Wilcoxon tests
+        'statistics': time_stage(lambda: analyze_improvement(before, after, before_features, after_features), repeats),
+    }
+
+
+def bench_extraction(duration):
+    from analyze_video import analyze_video
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = os.path.join(tmp_dir, 'synthetic.mp4')
+        frames = synthetic_video(video_path, duration=duration)
+        output_path = os.path.join(tmp_dir, 'synthetic_analysis.png')
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyze_video(video_path, output_path, cache=False)
+        elapsed = time.perf_counter() - start_time
+    return {'frames': frames, 'seconds': elapsed, 'frames_per_second': frames / elapsed}
+
+
+def flatten(results, prefix=''):
+    """Numeric leaves as {'a.b.c': value} for comparisons."""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current, previous):
+    print(f"\nCompared with {previous.get('commit')} ({previous.get('timestamp')}):")
+    old = flatten(previous['results'])
+    for name, value in flatten(current['results']).items():
+        if name in old and old[name]:
+            change = (value - old[name]) / abs(old[name]) * 100
+            print(f"  {name:45s} {old[name]:12.4f} -> {value:12.4f} ({change:+.1f}%)")
+
+
+def latest_result(output_dir):
+    if not os.path.isdir(output_dir):
+        return None
+    files = sorted(f for f in os.listdir(output_dir) if f.endswith('.json'))
+    return os.path.join(output_dir, files[-1]) if files else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pose pipeline on synthetic data")
+    parser.add_argument('--duration', type=float, default=60.0, help="seconds of synthetic pose data for the improvement stages")
+    parser.add_argument('--video-duration', type=float, default=5.0, help="seconds of synthetic video for extraction")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--skip-video', action='store_true', help="skip the extraction benchmark (no mediapipe needed)")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--compare', default=None, help="result file to compare against (default: latest saved run)")
+    args = parser.parse_args()
+
+    previous_path = args.compare or latest_result(args.output_dir)
+
+    results = {'improvement': bench_improvement(args.duration, args.repeats)}
+    if not args.skip_video:
+        results['extraction'] = bench_extraction(args.video_duration)
+    results['peak_rss_mb'] = peak_rss_mb()
+
+    run = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'params': vars(args),
+        'results': results,
+    }
+
+    print(json.dumps(results, indent=2))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    result_path = os.path.join(args.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{run['commit']}.json")
+    with open(result_path, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"Saved benchmark results to {result_path}")
+
+    if previous_path:
+        with open(previous_path) as f:
+            compare(run, json.load(f))
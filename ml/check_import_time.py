@@ -0,0 +1,95 @@
+"""Import and startup time budget check for the ml entry points.
+
+The web route spawns a fresh Python process per upload, so everything an entry
+point imports at module level is paid on every request. For each script this runs
+'python <script> --help' in a fresh interpreter (imports plus argument parsing,
+no work) several times and compares the best wall time against its budget. It
+also checks that heavy optional dependencies stay out of the startup path, and
+lists the slowest imports (from python -X importtime) when a script is over.
+
+Exits non-zero when any entry point is over budget or imports a deferred module,
+so it can run in CI next to the benchmark.
+
+Usage: python check_import_time.py [--repeats N] [--scale FACTOR] [--only SCRIPT ...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# script: (budget in seconds, top-level modules that must not be imported at startup)
+ENTRY_POINTS = {
+    'analyze_video.py': (1.5, ['mediapipe', 'matplotlib', 'scipy', 'sklearn', 'pandas']),
+    'analyze_improvement.py': (1.0, ['scipy', 'sklearn', 'matplotlib', 'cv2', 'mediapipe', 'pandas']),
+    'render_plot.py': (1.0, ['matplotlib', 'scipy', 'sklearn', 'cv2', 'mediapipe']),
+    'batch_analyze.py': (0.5, ['numpy', 'cv2', 'mediapipe', 'matplotlib', 'scipy', 'sklearn']),
+    'benchmark.py': (1.0, ['cv2', 'mediapipe', 'matplotlib', 'scipy', 'sklearn']),
+    'hardware_profile.py': (0.5, ['numpy', 'cv2', 'mediapipe', 'matplotlib', 'scipy', 'sklearn']),
+    # Loads everything on purpose, but only once per server
+    'analysis_worker.py': (6.0, ['sklearn', 'pandas']),
+}
+
+
+def startup_seconds(script, repeats):
+    """Best wall time of 'python <script> --help' over repeats."""
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, script, '--help'], cwd=ML_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def import_profile(script):
+    """{module: cumulative import seconds} for one startup, from python -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', script, '--help'], cwd=ML_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        profile[name.strip()] = int(cumulative) / 1e6
+    return profile
+
+
+def check(script, budget, deferred, repeats):
+    seconds = startup_seconds(script, repeats)
+    profile = import_profile(script)
+    loaded = sorted(module for module in deferred if module in profile)
+    ok = seconds <= budget and not loaded
+
+    print(f"{'ok  ' if ok else 'FAIL'} {script:25s} {seconds:6.2f}s (budget {budget:.2f}s)")
+    if loaded:
+        print(f"     imports deferred modules at startup: {', '.join(loaded)}")
+    if seconds > budget:
+        # Top-level packages only, nested ones are already counted in their parent
+        top = sorted(((t, name) for name, t in profile.items() if '.' not in name.strip()), reverse=True)[:8]
+        for t, name in top:
+            print(f"     {t:6.2f}s {name}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check import/startup time of the ml entry points against budgets")
+    parser.add_argument('--repeats', type=int, default=3, help="startups per script, the best one counts")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiply every budget (slow CI machines)")
+    parser.add_argument('--only', nargs='+', default=None, help="scripts to check (default: all)")
+    args = parser.parse_args()
+
+    failed = []
+    for script, (budget, deferred) in ENTRY_POINTS.items():
+        if args.only and script not in args.only:
+            continue
+        if not check(script, budget * args.scale, deferred, args.repeats):
+            failed.append(script)
+
+    if failed:
+        print(f"\n{len(failed)} entry point(s) over budget: {', '.join(failed)}")
+        sys.exit(1)
+    print("\nAll entry points within budget")
@@ -0,0 +1,106 @@
+"""Check that chunked and seeking extraction sample the same frames as a sequential pass.
+
+analyze_video can split a video into segments that each start with a seek
+(--workers) and jump long gaps with seeks (low sample rates). OpenCV seeks can
+land a frame off, so this runs the extraction loop on a real video in three
+ways and compares every sample's timestamp and frame content:
+
+- sequential, grabbing every frame in between
+- split into the segments extract_frames_parallel() uses (--workers of them)
+- sequential at a low sample rate with seeks over the gaps
+
+A stand-in for Pose turns each frame into "landmarks" (mean brightness of 33
+horizontal bands), so the check needs no mediapipe and any shifted frame shows
+up as different landmarks. Exits non-zero on any mismatch, so it can run in CI.
+
+Usage: python check_sampling.py [--video Videos/IMG_2700.mov] [--workers 3] [--sample-rate 10] [--seek-rate 0.5]
+"""
+import argparse
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from analyze_video import choose_frame_step, extract_frames, segment_bounds
+
+DEFAULT_VIDEO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Videos', 'IMG_2700.mov')
+
+
+class FrameProbe:
+    """Pose stand-in whose landmarks are a fingerprint of the frame."""
+
+    class Landmark:
+        def __init__(self, value):
+            self.x = self.y = self.z = value
+            self.visibility = 1.0
+
+    def process(self, image):
+        bands = np.array_split(image.mean(axis=(1, 2)), 33)
+        landmarks = [self.Landmark(float(band.mean()) / 255) for band in bands]
+
+        class Results:
+            pose_landmarks = type('PoseLandmarks', (), {'landmark': landmarks})
+        return Results()
+
+
+def sample(video_path, frame_step, start_frame=0, end_frame=None, seek_gap=None):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        timestamps, landmarks = extract_frames(cap, FrameProbe(), frame_step, start_frame, end_frame,
+                                               seek_gap=seek_gap)
+    finally:
+        cap.release()
+    return np.array(timestamps), np.array(landmarks)
+
+
+def compare(name, reference, result):
+    (expected_times, expected_landmarks), (times, landmarks) = reference, result
+    if len(times) != len(expected_times):
+        print(f"FAIL {name}: {len(times)} samples, sequential pass has {len(expected_times)}")
+        return False
+    shifted = np.flatnonzero((np.abs(times - expected_times) > 1e-6)
+                             | np.any(landmarks != expected_landmarks, axis=(1, 2)))
+    if len(shifted):
+        first = shifted[0]
+        print(f"FAIL {name}: {len(shifted)} of {len(times)} samples differ, first is sample {first} "
+              f"at {times[first]:.4f}s instead of {expected_times[first]:.4f}s")
+        return False
+    print(f"ok   {name}: {len(times)} samples identical")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sequential, chunked and seeking frame sampling")
+    parser.add_argument('--video', default=DEFAULT_VIDEO)
+    parser.add_argument('--workers', type=int, default=3, help="segments for the chunked pass")
+    parser.add_argument('--sample-rate', type=float, default=10.0, help="samples per second for the chunked pass")
+    parser.add_argument('--seek-rate', type=float, default=0.5,
+                        help="samples per second for the seeking pass (low, so gaps are seeked over)")
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        print(f"Could not open video: {args.video}")
+        sys.exit(1)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    print(f"{os.path.basename(args.video)}: {fps:.3f} FPS, {frame_count} frames")
+
+    ok = True
+    frame_step = choose_frame_step(fps, frame_count / fps, args.sample_rate)
+    sequential = sample(args.video, frame_step)
+    times, landmarks = [], []
+    for start, end in segment_bounds(frame_count, args.workers):
+        segment_times, segment_landmarks = sample(args.video, frame_step, start, end, seek_gap=int(2 * fps))
+        times.extend(segment_times)
+        landmarks.extend(segment_landmarks)
+    ok &= compare(f"{args.workers} segments at {args.sample_rate:g}/s", sequential,
+                  (np.array(times), np.array(landmarks)))
+
+    frame_step = choose_frame_step(fps, frame_count / fps, args.seek_rate)
+    ok &= compare(f"seeking at {args.seek_rate:g}/s", sample(args.video, frame_step),
+                  sample(args.video, frame_step, seek_gap=int(2 * fps)))
+
+    sys.exit(0 if ok else 1)
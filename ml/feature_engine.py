@@ -0,0 +1,86 @@
+"""Single-pass kinematic feature engine.
+
+Works on one (T, joints, 3) position array instead of per-axis lists, so every
+segment and axis is differentiated in the same batched np.gradient calls. Adding
+a segment to SEGMENTS costs one more column, not another pass over the data.
+"""
+import numpy as np
+
+JOINTS = ('Shoulder', 'Elbow', 'Wrist')
+
+# Segment name -> (from joint, to joint); the segment vector points from the first to the second
+SEGMENTS = {
+    'UpperArm': ('Shoulder', 'Elbow'),
+    'Forearm': ('Elbow', 'Wrist'),
+}
+
+
+def pose_array(pose_data, joints=JOINTS):
+    """Stack '<Joint>_X/Y/Z' columns into a float64 (T, joints, 3) array plus timestamps."""
+    positions = np.stack([
+        np.stack([np.asarray(pose_data[f'{joint}_{axis}'], dtype=float) for axis in 'XYZ'], axis=-1)
+        for joint in joints
+    ], axis=1)
+    timestamps = np.asarray(pose_data['Timestamp'], dtype=float)
+    return positions, timestamps
+
+
+def _mean_over_axes(values):
+    # Explicit x + y + z keeps results bit-identical to the per-axis formulas
+    return (values[..., 0] + values[..., 1] + values[..., 2]) / 3
+
+
+def compute_kinematics(positions, timestamps, joints=JOINTS, segments=SEGMENTS):
+    """Compute all segment features in one batched pass.
+
+    Returns a dict of arrays with segments along the last named axis:
+        vectors          (T, S, 3)  segment vectors
+        axis_ranges      (S, 3)     max - min of each axis
+        ranges           (S,)       mean of the axis ranges
+        magnitude        (T, S)     mean absolute component per frame
+        velocity         (T, S, 3)
+        acceleration     (T, S, 3)
+        jerk             (T, S, 3)
+        jerk_magnitude   (T, S)     Euclidean norm of jerk
+        magnitude_jerk   (T, S)     third derivative of magnitude (zeros if T < 4)
+    and 'segments', the segment names in column order.
+    """
+    names = list(segments)
+    joint_index = {joint: i for i, joint in enumerate(joints)}
+    start = [joint_index[segments[name][0]] for name in names]
+    end = [joint_index[segments[name][1]] for name in names]
+
+    vectors = positions[:, end, :] - positions[:, start, :]
+    axis_ranges = np.max(vectors, axis=0) - np.min(vectors, axis=0)
+    magnitude = _mean_over_axes(np.abs(vectors))
+
+    velocity = np.gradient(vectors, timestamps, axis=0)
+    acceleration = np.gradient(velocity, timestamps, axis=0)
+    jerk = np.gradient(acceleration, timestamps, axis=0)
+    jerk_magnitude = np.sqrt(jerk[..., 0]**2 + jerk[..., 1]**2 + jerk[..., 2]**2)
+
+    # Need at least 4 points for a meaningful third derivative of the magnitude
+    if len(timestamps) < 4:
+        magnitude_jerk = np.zeros_like(magnitude)
+    else:
+        magnitude_jerk = np.gradient(np.gradient(np.gradient(magnitude, timestamps, axis=0), timestamps, axis=0),
+                                     timestamps, axis=0)
+
+    return {
+        'segments': names,
+        'vectors': vectors,
+        'axis_ranges': axis_ranges,
+        'ranges': _mean_over_axes(axis_ranges),
+        'magnitude': magnitude,
+        'velocity': velocity,
+        'acceleration': acceleration,
+        'jerk': jerk,
+        'jerk_magnitude': jerk_magnitude,
+        'magnitude_jerk': magnitude_jerk,
+    }
+
+
+def compute_pose_kinematics(pose_data, segments=SEGMENTS):
+    """compute_kinematics() straight from an analyze_video pose dict."""
+    positions, timestamps = pose_array(pose_data)
+    return compute_kinematics(positions, timestamps, segments=segments)
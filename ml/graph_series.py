@@ -0,0 +1,104 @@
+"""Display-ready, downsampled graph series for the results page.
+
+The web app used to store the whole pose JSON of a video in
+VideoAnalysis.graph_data. The page only draws a few hundred points per line, so
+this writes just that: for every arm joint, the vertical position, velocity and
+acceleration (the panels of the analysis plot), each reduced to n_points with
+Largest-Triangle-Three-Buckets, which keeps peaks and turning points a plain
+stride would skip. Derivatives are taken on the full-resolution series before
+downsampling. Values are rounded to what a chart can show, so an analysis is a
+few tens of kilobytes of JSON instead of megabytes.
+
+Usage: python graph_series.py <pose_file> <output.graph.json> [--side right|left] [--points 200]
+"""
+import json
+
+import numpy as np
+
+from pose_format import load_pose_data
+
+DEFAULT_POINTS = 200
+GRAPH_VERSION = 1
+JOINTS = ['Shoulder', 'Elbow', 'Wrist']
+
+
+def lttb(x, y, n_out):
+    """Indices of the n_out points of (x, y) kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every bucket in between keeps the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # n_out - 2 buckets over the points between the fixed ends
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def _rounded(values, digits):
+    return [float(f'{value:.{digits}g}') for value in values]
+
+
+def graph_series(pose_data, n_points=DEFAULT_POINTS):
+    """{joint: {position|velocity|acceleration: {'t': [...], 'y': [...]}}} of vertical motion."""
+    timestamps = np.asarray(pose_data['Timestamp'], dtype=float)
+    joints = {}
+    for joint in JOINTS:
+        position = np.nan_to_num(np.asarray(pose_data[f'{joint}_Y'], dtype=float))
+        if len(timestamps) >= 2:
+            velocity = np.gradient(position, timestamps)
+            acceleration = np.gradient(velocity, timestamps)
+        else:
+            velocity = acceleration = np.zeros_like(position)
+        joints[joint] = {}
+        for kind, values in (('position', position), ('velocity', velocity), ('acceleration', acceleration)):
+            keep = lttb(timestamps, values, n_points)
+            joints[joint][kind] = {
+                't': [round(float(t), 3) for t in timestamps[keep]],
+                'y': _rounded(values[keep], 5),
+            }
+    return joints
+
+
+def write_graph_series(pose_path, output_path, side='right', n_points=DEFAULT_POINTS):
+    """Write the downsampled series of a .pose (or legacy JSON) file as compact JSON."""
+    pose_data = load_pose_data(pose_path, side)
+    graph = {
+        'version': GRAPH_VERSION,
+        'side': side,
+        'points': n_points,
+        'samples': len(pose_data['Timestamp']),
+        'joints': graph_series(pose_data, n_points),
+    }
+    with open(output_path, 'w') as f:
+        json.dump(graph, f, separators=(',', ':'))
+    return output_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write downsampled position/velocity/acceleration series")
+    parser.add_argument('pose_path', help=".pose file or pose JSON from analyze_video.py")
+    parser.add_argument('output_path', help="JSON to write")
+    parser.add_argument('--side', default='right', choices=['right', 'left'], help="arm to use from .pose files")
+    parser.add_argument('--points', type=int, default=DEFAULT_POINTS, help="points kept per series")
+    args = parser.parse_args()
+
+    write_graph_series(args.pose_path, args.output_path, side=args.side, n_points=args.points)
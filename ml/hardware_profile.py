@@ -0,0 +1,299 @@
+"""Per-machine calibration of model complexity, input resolution and sampling.
+
+Deployments range from old clinic laptops to servers, and the analysis defaults
+(model_complexity=1, full-resolution frames, every 3rd/5th frame) are too slow
+on the former and leave headroom on the latter. calibrate() runs a short
+offline benchmark on this machine: for each model complexity / ROI size in
+LEVELS it times pose setup and the per-frame cost of decoding, converting and
+inferring, plus the cost of skipping (grabbing) a frame. From those it
+estimates the processing time per minute of video for every level and picks
+the best level that meets the target.
+
+LEVELS runs from the most accurate settings to the cheapest. roi_size is the
+resolution knob: inference runs on a crop around the person downsized to that
+many pixels (see pose_roi.py), None keeps full frames. sample_rate is analyzed
+frames per second of video.
+
+The profile is saved to tmp/hardware_profile.json in the project
+(SWING_PROFILE to move it) together with the machine it was measured on.
+analyze_video.py, batch_analyze.py and analysis_worker.py use it for every
+setting not given on the command line; a profile from another machine is
+ignored. The estimate covers extraction, not plotting or the improvement
+step, which do not depend on these settings.
+
+Calibrating on a real recording from the clinic camera (--video) is more
+representative than the synthetic stick figure, which Mediapipe may not track.
+
+Usage:
+    python hardware_profile.py calibrate [--target 30] [--video sample.mp4] [--duration 5]
+    python hardware_profile.py show
+"""
+import json
+import os
+import platform
+import tempfile
+import time
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tmp',
+                                    'hardware_profile.json')
+PROFILE_VERSION = 1
+
+# Seconds of processing allowed per minute of video
+DEFAULT_TARGET = 30.0
+
+# Best first; the repo defaults sit around (1, None, 10)
+LEVELS = [
+    {'model_complexity': 2, 'roi_size': None, 'sample_rate': 15},
+    {'model_complexity': 2, 'roi_size': None, 'sample_rate': 10},
+    {'model_complexity': 1, 'roi_size': None, 'sample_rate': 15},
+    {'model_complexity': 1, 'roi_size': None, 'sample_rate': 10},
+    {'model_complexity': 1, 'roi_size': 720, 'sample_rate': 10},
+    {'model_complexity': 1, 'roi_size': 512, 'sample_rate': 10},
+    {'model_complexity': 1, 'roi_size': 512, 'sample_rate': 6},
+    {'model_complexity': 0, 'roi_size': 512, 'sample_rate': 10},
+    {'model_complexity': 0, 'roi_size': 384, 'sample_rate': 6},
+    {'model_complexity': 0, 'roi_size': 384, 'sample_rate': 4},
+]
+
+# What analyze_video() does without a profile
+DEFAULT_SETTINGS = {'model_complexity': 1, 'roi_size': None, 'sample_rate': None}
+
+
+def machine():
+    """What a profile's timings depend on; a profile measured elsewhere is not reused."""
+    try:
+        from importlib.metadata import version
+        mediapipe_version = version('mediapipe')
+    except Exception:
+        mediapipe_version = None
+    return {
+        'system': platform.system(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+        'mediapipe': mediapipe_version,
+    }
+
+
+def profile_path(path=None):
+    return os.path.abspath(path or os.environ.get('SWING_PROFILE', DEFAULT_PROFILE_PATH))
+
+
+def measure_grab(video_path):
+    """Seconds per frame to skip a frame (grab without decoding to BGR)."""
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        frames = 0
+        start_time = time.perf_counter()
+        while cap.grab():
+            frames += 1
+        return (time.perf_counter() - start_time) / max(frames, 1)
+    finally:
+        cap.release()
+
+
+def measure_level(video_path, model_complexity, roi_size):
+    """Pose setup seconds and seconds per analyzed frame for one complexity / ROI size."""
+    import contextlib
+    import io
+
+    import cv2
+
+    from analyze_video import create_pose, extract_frames
+    from instrumentation import StageMetrics
+    from pose_roi import PersonROI
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        start_time = time.perf_counter()
+        pose_context = create_pose(model_complexity)
+        setup = time.perf_counter() - start_time
+        with pose_context as pose:
+            # The first call initializes the graph; do not count it per frame
+            ret, frame = cap.read()
+            if not ret:
+                raise ValueError(f"Could not read a frame from {video_path}")
+            pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            pose.reset()
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+            metrics = StageMetrics()
+            roi = PersonROI(roi_size) if roi_size else None
+            with contextlib.redirect_stdout(io.StringIO()):
+                extract_frames(cap, pose, 1, roi=roi, metrics=metrics)
+    finally:
+        cap.release()
+
+    frames = metrics.counters.get('frames_inferred', 0)
+    if not frames:
+        raise ValueError(f"No frames analyzed in {video_path}")
+    seconds = sum(metrics.stages[name][0] for name in ('decode', 'color_convert', 'inference')
+                  if name in metrics.stages)
+    return {'model_complexity': model_complexity, 'roi_size': roi_size, 'setup_seconds': setup,
+            'frame_seconds': seconds / frames, 'frames': frames,
+            'detected': metrics.counters.get('poses_detected', 0)}
+
+
+def estimate_seconds_per_minute(level, measurement, grab_seconds, fps):
+    """Extraction seconds for one minute of fps video at a level's settings."""
+    samples = 60 * min(level['sample_rate'], fps)
+    skipped = 60 * fps - samples
+    return measurement['setup_seconds'] + samples * measurement['frame_seconds'] + skipped * grab_seconds
+
+
+def choose_level(estimates, target):
+    """Index of the first (best) level within target, or of the cheapest one if none is."""
+    for i, estimate in enumerate(estimates):
+        if estimate <= target:
+            return i
+    return min(range(len(estimates)), key=estimates.__getitem__)
+
+
+def calibrate(video_path=None, target=DEFAULT_TARGET, duration=5.0, width=1280, height=720, path=None):
+    """Benchmark this machine, pick the best settings within target and save the profile."""
+    import cv2
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if video_path is None:
+            from benchmark import synthetic_video
+            source = 'synthetic'
+            video_path = os.path.join(tmp_dir, 'calibration.mp4')
+            synthetic_video(video_path, duration=duration, width=width, height=height)
+        else:
+            # Only the first duration seconds are needed
+            source = os.path.basename(video_path)
+            cap = cv2.VideoCapture(video_path)
+            if not cap.isOpened():
+                raise ValueError(f"Could not open video: {video_path}")
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            clip_path = os.path.join(tmp_dir, 'calibration.mp4')
+            writer = cv2.VideoWriter(clip_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+            for _ in range(int(duration * fps)):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                writer.write(frame)
+            writer.release()
+            cap.release()
+            video_path = clip_path
+
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        resolution = [int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))]
+        cap.release()
+        print(f"Calibrating on {source} ({resolution[0]}x{resolution[1]}, {fps:g} FPS), "
+              f"target {target:g}s per minute of video")
+
+        grab_seconds = measure_grab(video_path)
+        measurements = {}
+        for level in LEVELS:
+            key = (level['model_complexity'], level['roi_size'])
+            if key not in measurements:
+                measurements[key] = measure_level(video_path, *key)
+                print(f"  model_complexity={key[0]} roi_size={key[1]}: "
+                      f"{measurements[key]['frame_seconds'] * 1000:.1f} ms/frame, "
+                      f"setup {measurements[key]['setup_seconds']:.2f}s")
+
+    estimates = [estimate_seconds_per_minute(level, measurements[(level['model_complexity'], level['roi_size'])],
+                                             grab_seconds, fps)
+                 for level in LEVELS]
+    chosen = choose_level(estimates, target)
+    for i, (level, estimate) in enumerate(zip(LEVELS, estimates)):
+        print(f"  {'*' if i == chosen else ' '} {level}: {estimate:.1f}s per minute")
+    if estimates[chosen] > target:
+        print(f"Warning: no settings meet {target:g}s per minute on this machine, using the cheapest")
+
+    profile = {
+        'version': PROFILE_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': machine(),
+        'target_seconds_per_minute': target,
+        'calibration': {'source': source, 'resolution': resolution, 'fps': fps,
+                        'grab_seconds': grab_seconds, 'measurements': list(measurements.values())},
+        'estimated_seconds_per_minute': estimates[chosen],
+        'settings': LEVELS[chosen],
+    }
+    save_profile(profile, path)
+    return profile
+
+
+def save_profile(profile, path=None):
+    path = profile_path(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so a run starting meanwhile never reads half a profile
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(profile, f, indent=2)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    print(f"Saved hardware profile to {path}")
+    return path
+
+
+def load_profile(path=None):
+    """The saved profile for this machine, or None if there is none (or it is stale)."""
+    path = profile_path(path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable hardware profile {path}: {e}")
+        return None
+    if profile.get('version') != PROFILE_VERSION:
+        print(f"Ignoring hardware profile {path} from an older version, run hardware_profile.py calibrate")
+        return None
+    if profile.get('machine') != machine():
+        print(f"Ignoring hardware profile {path} measured on another machine, run hardware_profile.py calibrate")
+        return None
+    return profile
+
+
+def profile_settings(path=None, use_profile=True, **explicit):
+    """Analysis settings: explicit values (not None) over the saved profile over the defaults.
+
+    profile_settings(model_complexity=args.model_complexity, sample_rate=args.sample_rate,
+    roi_size=args.roi_size) -> {'model_complexity': ..., 'sample_rate': ..., 'roi_size': ...}
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    profile = load_profile(path) if use_profile else None
+    if profile is not None:
+        settings.update(profile['settings'])
+    settings.update({name: value for name, value in explicit.items() if value is not None})
+    return settings
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calibrate analysis settings for this machine")
+    parser.add_argument('--profile', default=None, help="profile file (default: tmp/hardware_profile.json)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    calibrate_command = commands.add_parser('calibrate', help="benchmark this machine and save the best settings")
+    calibrate_command.add_argument('--target', type=float, default=DEFAULT_TARGET,
+                                   help="seconds of processing allowed per minute of video")
+    calibrate_command.add_argument('--video', default=None,
+                                   help="benchmark on this recording instead of a synthetic video")
+    calibrate_command.add_argument('--duration', type=float, default=5.0, help="seconds of video to benchmark on")
+    calibrate_command.add_argument('--width', type=int, default=1280, help="synthetic video width")
+    calibrate_command.add_argument('--height', type=int, default=720, help="synthetic video height")
+    commands.add_parser('show', help="print the settings later runs will use")
+    args = parser.parse_args()
+
+    if args.command == 'calibrate':
+        calibrate(args.video, target=args.target, duration=args.duration, width=args.width, height=args.height,
+                  path=args.profile)
+    else:
+        profile = load_profile(args.profile)
+        if profile is None:
+            print(f"No hardware profile for this machine, using defaults: {DEFAULT_SETTINGS}")
+        else:
+            print(f"Calibrated {profile['created']} for {profile['target_seconds_per_minute']:g}s per minute "
+                  f"(estimated {profile['estimated_seconds_per_minute']:.1f}s): {profile['settings']}")
@@ -0,0 +1,157 @@
+"""Per-stage timing and resource metrics for the analysis scripts.
+
+Every analyze_video / analyze_improvement run records where its time went
+(decode, color conversion, inference, features, statistics, serialization,
+plotting), frame counters and the process's peak RSS, and writes them as a JSON
+sidecar next to its outputs (<output>.metrics.json). The sidecars of a batch can
+be aggregated with aggregate_metrics() or from the command line:
+
+    python instrumentation.py results/videos/*.metrics.json [--output summary.json]
+
+The legacy "Debug:" prints go through debug(), which is on by default and can be
+turned off with POSE_DEBUG=0 in the environment or set_debug(False); they are
+written to stderr so stdout stays clean for callers that parse it.
+"""
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+DEBUG = os.environ.get('POSE_DEBUG', '1') != '0'
+
+
+def set_debug(enabled):
+    global DEBUG
+    DEBUG = enabled
+
+
+def debug(*args):
+    """print() for diagnostic output, silenced when debugging is off."""
+    if DEBUG:
+        print(*args, file=sys.stderr)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (and of finished child processes), in MB."""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(max(own, children), 1)
+
+
+class StageMetrics:
+    """Accumulates seconds and call counts per named stage, plus plain counters."""
+
+    def __init__(self, kind=None):
+        self.kind = kind
+        self.stages = {}
+        self.counters = {}
+        self.info = {}
+        self.start_time = time.perf_counter()
+
+    def add(self, stage, seconds, calls=1):
+        entry = self.stages.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += calls
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        """Add the stages and counters of another StageMetrics (or its to_dict())."""
+        if isinstance(other, StageMetrics):
+            other = other.to_dict()
+        for name, entry in other.get('stages', {}).items():
+            self.add(name, entry['seconds'], entry['calls'])
+        for name, value in other.get('counters', {}).items():
+            self.count(name, value)
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'total_seconds': round(time.perf_counter() - self.start_time, 4),
+            'stages': {name: {'seconds': round(seconds, 4), 'calls': calls}
+                       for name, (seconds, calls) in self.stages.items()},
+            'counters': dict(self.counters),
+            'peak_rss_mb': peak_rss_mb(),
+            'info': self.info,
+        }
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+def metrics_path(output_path):
+    """Sidecar path for an output file: before_analysis.png -> before_analysis.metrics.json."""
+    return os.path.splitext(output_path)[0] + '.metrics.json'
+
+
+def aggregate_metrics(metrics):
+    """Combine metrics dicts (or sidecar paths) into per-stage totals and means per kind."""
+    kinds = {}
+    for item in metrics:
+        if isinstance(item, str):
+            with open(item) as f:
+                item = json.load(f)
+        kind = kinds.setdefault(item.get('kind') or 'unknown', {
+            'runs': 0, 'total_seconds': 0.0, 'stages': {}, 'counters': {}, 'peak_rss_mb': None
+        })
+        kind['runs'] += 1
+        kind['total_seconds'] += item.get('total_seconds', 0.0)
+        for name, entry in item.get('stages', {}).items():
+            stage = kind['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0})
+            stage['seconds'] += entry['seconds']
+            stage['calls'] += entry['calls']
+        for name, value in item.get('counters', {}).items():
+            kind['counters'][name] = kind['counters'].get(name, 0) + value
+        if item.get('peak_rss_mb') is not None:
+            kind['peak_rss_mb'] = max(kind['peak_rss_mb'] or 0.0, item['peak_rss_mb'])
+
+    for kind in kinds.values():
+        for stage in kind['stages'].values():
+            stage['mean_seconds'] = stage['seconds'] / kind['runs']
+            stage['share'] = stage['seconds'] / kind['total_seconds'] if kind['total_seconds'] > 0 else 0.0
+    return kinds
+
+
+def print_summary(kinds):
+    for name, kind in kinds.items():
+        print(f"{name}: {kind['runs']} runs, {kind['total_seconds']:.1f}s total, "
+              f"peak RSS {kind['peak_rss_mb']} MB")
+        for stage, entry in sorted(kind['stages'].items(), key=lambda item: -item[1]['seconds']):
+            print(f"  {stage:<20} {entry['seconds']:8.2f}s  {entry['share'] * 100:5.1f}%  "
+                  f"{entry['mean_seconds']:.3f}s/run")
+        for counter, value in kind['counters'].items():
+            print(f"  {counter:<20} {value}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aggregate .metrics.json sidecars")
+    parser.add_argument('paths', nargs='+', help=".metrics.json files written by the analysis scripts")
+    parser.add_argument('--output', help="also write the aggregate as JSON")
+    args = parser.parse_args()
+
+    kinds = aggregate_metrics(args.paths)
+    print_summary(kinds)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(kinds, f, indent=2)
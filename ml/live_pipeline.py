@@ -0,0 +1,223 @@
+"""Pipelined live pose feedback: capture, inference and render on separate threads.
+
+The webcam scripts used to read a frame, run pose.process, check for anomalies,
+draw and imshow one after another, so one slow step stalled the whole loop and
+frames piled up in the camera buffer. Here each stage runs on its own thread and
+hands over through single-slot queues that keep only the newest item:
+
+    capture --(latest frame)--> inference + analysis --(latest result)--> render
+
+A stage that falls behind skips stale frames instead of queueing them, so the
+overlay on screen is always for the newest frame inference could take. Render
+stays on the calling thread because some platforms only allow GUI calls there.
+End-to-end latency (capture to display) and display FPS are drawn on the video
+and summarized when the session ends.
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from pose_landmarks import LANDMARK_INDEX
+
+
+class LatestQueue:
+    """Single-slot queue: put() replaces an item nobody has taken yet."""
+
+    def __init__(self):
+        self.slot = queue.Queue(maxsize=1)
+        self.dropped = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self.slot.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.slot.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=0.1):
+        """Newest item, or None if nothing arrived within timeout."""
+        try:
+            return self.slot.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def arm_angle(landmarks, side, width, height):
+    """Forearm angle in degrees plus shoulder/elbow/wrist pixel positions for one arm."""
+    shoulder, elbow, wrist = (landmarks[LANDMARK_INDEX[f'{side.upper()}_{joint}']]
+                              for joint in ('SHOULDER', 'ELBOW', 'WRIST'))
+
+    shoulder_px = (int(shoulder.x * width), int(shoulder.y * height))
+    elbow_px = (int(elbow.x * width), int(elbow.y * height))
+    wrist_px = (int(wrist.x * width), int(wrist.y * height))
+
+    # Compute the arm angle
+    angle = np.arctan2(wrist.y - elbow.y, wrist.x - elbow.x) * (180 / np.pi)
+    return angle, shoulder_px, elbow_px, wrist_px
+
+
+def draw_arm(image, side, angle, shoulder_px, elbow_px, wrist_px, anomaly):
+    """Overlay one arm: segments, elbow marker and angle label (red when anomalous)."""
+    color = (0, 255, 0) if not anomaly else (0, 0, 255)  # Green for normal, Red for anomaly
+
+    cv2.putText(image, f"{side.capitalize()} Angle: {int(angle)}°",
+                (elbow_px[0] - 50, elbow_px[1] - 20),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+    cv2.line(image, shoulder_px, elbow_px, (255, 0, 0), 2)
+    cv2.line(image, elbow_px, wrist_px, (255, 0, 0), 2)
+    cv2.circle(image, elbow_px, 5, color, -1)  # Mark anomaly in red
+
+
+class LivePipeline:
+    """Run capture, pose inference and rendering as a three-stage pipeline.
+
+    analyze(landmarks, frame_shape, frame_id) runs on the inference thread right
+    after pose.process for frames with a detected pose, and returns whatever
+    draw(image, overlay) needs; draw runs on the render thread. Keep analyze
+    cheap: it is on the critical path of every frame.
+
+    File sources are paced to their frame rate so they behave like a camera
+    (set realtime=False to read them as fast as inference allows).
+    """
+
+    def __init__(self, source, pose, analyze, draw, window_name='Arm Swing Detection with Anomalies',
+                 realtime=None):
+        self.source = source
+        self.pose = pose
+        self.analyze = analyze
+        self.draw = draw
+        self.window_name = window_name
+        self.realtime = not isinstance(source, int) if realtime is None else realtime
+
+        self.frames = LatestQueue()
+        self.results = LatestQueue()
+        self.stop_event = threading.Event()
+        self.capture_done = threading.Event()
+        self.inference_done = threading.Event()
+
+        self.captured = 0
+        self.inferred = 0
+        self.displayed = 0
+        self.latencies = deque(maxlen=1000)  # Seconds from capture to display, recent frames
+        self.display_times = deque(maxlen=30)
+
+    def _capture(self, cap):
+        fps = cap.get(cv2.CAP_PROP_FPS) if self.realtime else 0
+        interval = 1 / fps if fps and fps > 0 else 0
+        next_time = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.frames.put((self.captured, time.perf_counter(), frame))
+                self.captured += 1
+                if interval:
+                    next_time += interval
+                    time.sleep(max(0, next_time - time.perf_counter()))
+        finally:
+            self.capture_done.set()
+
+    def _inference(self):
+        try:
+            while not self.stop_event.is_set():
+                item = self.frames.get()
+                if item is None:
+                    if self.capture_done.is_set():
+                        break
+                    continue
+                frame_id, captured_at, frame = item
+
+                # Convert BGR to RGB; drawing happens on the original BGR frame
+                image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                image.flags.writeable = False
+                results = self.pose.process(image)
+
+                overlay = None
+                if results.pose_landmarks:
+                    overlay = self.analyze(results.pose_landmarks.landmark, frame.shape, frame_id)
+                self.inferred += 1
+                self.results.put((frame_id, captured_at, frame, overlay))
+        finally:
+            self.inference_done.set()
+
+    def _draw_stats(self, image):
+        now = time.perf_counter()
+        self.display_times.append(now)
+        fps = 0.0
+        if len(self.display_times) > 1:
+            fps = (len(self.display_times) - 1) / (self.display_times[-1] - self.display_times[0])
+        latency_ms = self.latencies[-1] * 1000 if self.latencies else 0.0
+        cv2.putText(image, f"{fps:.1f} FPS  {latency_ms:.0f} ms", (10, 25),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+    def run(self):
+        """Run until the source ends or 'q' is pressed; returns the session stats."""
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video source: {self.source}")
+
+        threads = [
+            threading.Thread(target=self._capture, args=(cap,), daemon=True),
+            threading.Thread(target=self._inference, daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        start_time = time.perf_counter()
+
+        try:
+            while True:
+                item = self.results.get()
+                if item is None:
+                    if self.inference_done.is_set():
+                        break
+                    continue
+                frame_id, captured_at, image, overlay = item
+                if overlay is not None:
+                    self.draw(image, overlay)
+                self.latencies.append(time.perf_counter() - captured_at)
+                self._draw_stats(image)
+                self.displayed += 1
+
+                cv2.imshow(self.window_name, image)
+                # waitKey(1): the display only needs to pump events, the stages set the pace
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        finally:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+            cap.release()
+            cv2.destroyAllWindows()
+
+        stats = self.stats(time.perf_counter() - start_time)
+        print(f"Live session: {stats['captured']} frames captured, {stats['inferred']} inferred, "
+              f"{stats['displayed']} displayed in {stats['seconds']:.1f}s ({stats['fps']:.1f} FPS)")
+        print(f"Latency capture->display: mean {stats['latency_ms_mean']:.0f} ms, "
+              f"p95 {stats['latency_ms_p95']:.0f} ms; stale frames dropped: {stats['dropped_frames']} before "
+              f"inference, {stats['dropped_results']} before render")
+        return stats
+
+    def stats(self, seconds):
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            'captured': self.captured,
+            'inferred': self.inferred,
+            'displayed': self.displayed,
+            'dropped_frames': self.frames.dropped,
+            'dropped_results': self.results.dropped,
+            'seconds': seconds,
+            'fps': self.displayed / seconds if seconds > 0 else 0.0,
+            'latency_ms_mean': float(np.mean(latencies)),
+            'latency_ms_p95': float(np.percentile(latencies, 95)),
+        }
@@ -0,0 +1,342 @@
+"""Monitor several video streams at once on a bounded pool of Pose estimators.
+
+Every source (webcam index, video file, or a file looped to stand in for a
+camera) gets its own capture thread and single-slot frame queue, like
+live_pipeline.LivePipeline. A fixed pool of inference threads, each owning one
+Pose, takes frames round-robin across the streams, so a busy stream cannot
+starve the others, and each stream has at most one frame in flight, so its
+frames are analyzed in order and its state is only touched by one thread at a
+time. Streams that fall behind drop stale frames instead of queueing them.
+
+With at least as many Pose instances as streams each stream keeps its own
+tracking instance; with fewer, instances are shared and run in static image
+mode (detection on every frame), since tracking state cannot move between
+unrelated streams.
+
+Per stream, the forearm angle of the chosen arm is scored by its own anomaly
+detector and written to <output_dir>/<stream>.csv. A stream mapped to a patient
+(--stream SOURCE=PATIENT) is scored against that patient's stored baseline
+(baseline_models.py); streams without a patient, or whose patient has no stored
+model, fit an online detector on their own session.
+
+Usage: python multi_stream.py <source> [<source> ...] [--pool N] [--loop] [--method stddev]
+                              [--side right] [--stream SOURCE=PATIENT ...] [--output-dir DIR]
+                              [--no-display] [--duration S]
+"""
+import csv
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from live_pipeline import LatestQueue, arm_angle, draw_arm
+
+
+def default_pool_size(n_streams):
+    """One Pose per stream, but no more than half the cores (Mediapipe uses several threads per graph)."""
+    return max(1, min(n_streams, (os.cpu_count() or 2) // 2))
+
+
+def stream_name(source):
+    if isinstance(source, int):
+        return f'camera{source}'
+    return os.path.splitext(os.path.basename(source))[0]
+
+
+class Stream:
+    """One source: its capture, frame queue, latest result and counters."""
+
+    def __init__(self, name, source, loop=False, realtime=None):
+        self.name = name
+        self.source = source
+        self.loop = loop
+        self.realtime = not isinstance(source, int) if realtime is None else realtime
+        self.frames = LatestQueue()
+        self.results = LatestQueue()
+        self.capture_done = threading.Event()
+        self.busy = False  # A frame of this stream is being inferred
+        self.state = {}  # Per-stream analysis state (detectors, output writers, ...)
+
+        self.captured = 0
+        self.inferred = 0
+        self.displayed = 0
+        self.latencies = deque(maxlen=1000)  # Seconds from capture to end of inference
+
+    def finished(self):
+        return self.capture_done.is_set() and not self.busy and self.frames.slot.empty()
+
+    def stats(self, seconds):
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            'captured': self.captured,
+            'inferred': self.inferred,
+            'displayed': self.displayed,
+            'dropped_frames': self.frames.dropped,
+            'inference_fps': self.inferred / seconds if seconds > 0 else 0.0,
+            'latency_ms_mean': float(np.mean(latencies)),
+            'latency_ms_p95': float(np.percentile(latencies, 95)),
+        }
+
+
+class MultiStreamPipeline:
+    """Capture threads per stream, a shared pool of inference threads, render on the calling thread.
+
+    analyze(stream, landmarks, frame_shape, frame_id) runs on an inference thread
+    for frames with a detected pose and returns what draw(image, overlay) needs;
+    stream.state is the place for per-stream state. make_pose(static_image_mode)
+    builds one Pose instance.
+    """
+
+    def __init__(self, sources, analyze, draw, make_pose, pool_size=None, loop=False, display=True,
+                 realtime=None, duration=None):
+        names = [stream_name(source) for source in sources]
+        # Keep names unique so windows and outputs do not collide
+        self.streams = [Stream(name if names.count(name) == 1 else f'{name}-{i}', source, loop, realtime)
+                        for i, (name, source) in enumerate(zip(names, sources))]
+        self.analyze = analyze
+        self.draw = draw
+        self.make_pose = make_pose
+        self.pool_size = pool_size or default_pool_size(len(self.streams))
+        self.display = display
+        self.duration = duration
+
+        self.stop_event = threading.Event()
+        self.ready = threading.Condition()
+        self.cursor = 0
+
+    def _capture(self, stream, cap):
+        fps = cap.get(cv2.CAP_PROP_FPS) if stream.realtime else 0
+        interval = 1 / fps if fps and fps > 0 else 0
+        next_time = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    if stream.loop and stream.captured > 0:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    break
+                stream.frames.put((stream.captured, time.perf_counter(), frame))
+                stream.captured += 1
+                with self.ready:
+                    self.ready.notify()
+                if interval:
+                    next_time += interval
+                    time.sleep(max(0, next_time - time.perf_counter()))
+        finally:
+            stream.capture_done.set()
+            with self.ready:
+                self.ready.notify_all()
+
+    def _next_frame(self, streams):
+        """Round-robin over streams: the next one with a waiting frame and nothing in flight."""
+        with self.ready:
+            while not self.stop_event.is_set():
+                n = len(self.streams)
+                for offset in range(n):
+                    index = (self.cursor + offset) % n
+                    stream = self.streams[index]
+                    if stream.busy or stream not in streams:
+                        continue
+                    item = stream.frames.get(timeout=0)
+                    if item is None:
+                        continue
+                    stream.busy = True
+                    self.cursor = (index + 1) % n
+                    return stream, item
+                if all(stream.finished() for stream in streams):
+                    return None
+                self.ready.wait(0.1)
+        return None
+
+    def _inference(self, streams, static_image_mode):
+        with self.make_pose(static_image_mode) as pose:
+            while True:
+                job = self._next_frame(streams)
+                if job is None:
+                    break
+                stream, (frame_id, captured_at, frame) = job
+                try:
+                    # Convert BGR to RGB; drawing happens on the original BGR frame
+                    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    image.flags.writeable = False
+                    results = pose.process(image)
+
+                    overlay = None
+                    if results.pose_landmarks:
+                        overlay = self.analyze(stream, results.pose_landmarks.landmark, frame.shape, frame_id)
+                    stream.inferred += 1
+                    stream.latencies.append(time.perf_counter() - captured_at)
+                    stream.results.put((frame_id, frame, overlay))
+                finally:
+                    with self.ready:
+                        stream.busy = False
+                        self.ready.notify_all()
+
+    def run(self):
+        """Run until every source ends, the duration passes or 'q' is pressed; returns per-stream stats."""
+        captures = []
+        for stream in self.streams:
+            cap = cv2.VideoCapture(stream.source)
+            if not cap.isOpened():
+                for opened in captures:
+                    opened.release()
+                raise ValueError(f"Could not open video source: {stream.source}")
+            captures.append(cap)
+
+        # Dedicated tracking Pose per stream when the pool allows it, shared static ones otherwise
+        shared = self.pool_size < len(self.streams)
+        if shared:
+            assignments = [self.streams] * self.pool_size
+        else:
+            assignments = [[stream] for stream in self.streams]
+        print(f"{len(self.streams)} streams on {len(assignments)} Pose instances"
+              + (" (shared, static image mode)" if shared else " (one tracking instance per stream)"))
+
+        threads = [threading.Thread(target=self._capture, args=(stream, cap), daemon=True)
+                   for stream, cap in zip(self.streams, captures)]
+        workers = [threading.Thread(target=self._inference, args=(streams, shared), daemon=True)
+                   for streams in assignments]
+        for thread in threads + workers:
+            thread.start()
+        start_time = time.perf_counter()
+
+        try:
+            while any(worker.is_alive() for worker in workers):
+                if self.duration and time.perf_counter() - start_time > self.duration:
+                    break
+                shown = False
+                for stream in self.streams:
+                    item = stream.results.get(timeout=0)
+                    if item is None:
+                        continue
+                    frame_id, image, overlay = item
+                    stream.displayed += 1
+                    if not self.display:
+                        continue
+                    if overlay is not None:
+                        self.draw(image, overlay)
+                    cv2.imshow(stream.name, image)
+                    shown = True
+                if self.display:
+                    # waitKey(1): the display only needs to pump events, the streams set the pace
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+                if not shown:
+                    time.sleep(0.005)
+        finally:
+            self.stop_event.set()
+            with self.ready:
+                self.ready.notify_all()
+            for thread in threads + workers:
+                thread.join()
+            for cap in captures:
+                cap.release()
+            if self.display:
+                cv2.destroyAllWindows()
+
+        seconds = time.perf_counter() - start_time
+        stats = {stream.name: stream.stats(seconds) for stream in self.streams}
+        for name, stream_stats in stats.items():
+            print(f"{name}: {stream_stats['captured']} captured, {stream_stats['inferred']} inferred "
+                  f"({stream_stats['inference_fps']:.1f} FPS), {stream_stats['dropped_frames']} stale frames dropped, "
+                  f"latency mean {stream_stats['latency_ms_mean']:.0f} ms, p95 {stream_stats['latency_ms_p95']:.0f} ms")
+        return stats
+
+
+def parse_source(source):
+    """Webcam index for digit strings, otherwise the video path."""
+    return int(source) if source.isdigit() else source
+
+
+def angle_monitor(side, method, output_dir=None, patients=None):
+    """analyze/draw callbacks scoring each stream's forearm angle with its own detector.
+
+    patients maps a source to the patient whose stored baseline scores that stream.
+    """
+    from online_detectors import create_detector
+
+    patients = patients or {}
+    store = None
+    if patients:
+        from baseline_models import ModelStore
+        store = ModelStore()
+
+    def analyze(stream, landmarks, frame_shape, frame_id):
+        state = stream.state
+        if 'detector' not in state:
+            patient = patients.get(stream.source)
+            baseline = store.load(patient, side, method) if patient is not None else None
+            if baseline is not None:
+                print(f"{stream.name}: scoring against the stored baseline of patient {patient}")
+            elif patient is not None:
+                print(f"{stream.name}: no stored {method} baseline for patient {patient}, fitting online")
+            state['detector'] = baseline or create_detector(method)
+            if output_dir:
+                state['file'] = open(os.path.join(output_dir, f'{stream.name}.csv'), 'w', newline='')
+                state['writer'] = csv.writer(state['file'])
+                state['writer'].writerow(['frame', 'angle', 'anomaly'])
+
+        h, w = frame_shape[:2]
+        angle, shoulder_px, elbow_px, wrist_px = arm_angle(landmarks, side, w, h)
+        anomaly = state['detector'].update(angle)
+        if 'writer' in state:
+            state['writer'].writerow([frame_id, f'{angle:.3f}', int(anomaly)])
+        return side, angle, shoulder_px, elbow_px, wrist_px, anomaly
+
+    def draw(image, overlay):
+        draw_arm(image, *overlay)
+
+    def close(streams):
+        for stream in streams:
+            if 'detector' in stream.state:
+                stream.state['detector'].close()
+            if 'file' in stream.state:
+                stream.state['file'].close()
+
+    return analyze, draw, close
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from analyze_video import create_pose
+    from online_detectors import DETECTOR_METHODS
+
+    parser = argparse.ArgumentParser(description="Monitor several video streams on a shared pool of Pose estimators")
+    parser.add_argument('sources', nargs='+', help="webcam indices and/or video files")
+    parser.add_argument('--pool', type=int, default=None,
+                        help="number of Pose instances (default: one per stream, at most half the cores)")
+    parser.add_argument('--loop', action='store_true', help="restart video files at the end, like a camera")
+    parser.add_argument('--side', default='right', choices=['right', 'left'])
+    parser.add_argument('--method', default='stddev', choices=DETECTOR_METHODS)
+    parser.add_argument('--stream', action='append', default=[], metavar='SOURCE=PATIENT',
+                        help="score SOURCE against PATIENT's stored baseline (repeat per stream)")
+    parser.add_argument('--model-complexity', type=int, default=1, choices=[0, 1, 2])
+    parser.add_argument('--output-dir', help="write <stream>.csv with the per-frame angles and anomaly flags")
+    parser.add_argument('--no-display', action='store_true')
+    parser.add_argument('--duration', type=float, default=None, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    sources = [parse_source(source) for source in args.sources]
+    patients = {}
+    for mapping in args.stream:
+        source, separator, patient = mapping.rpartition('=')
+        if not separator or parse_source(source) not in sources:
+            parser.error(f"--stream {mapping}: expected SOURCE=PATIENT with SOURCE one of the sources")
+        patients[parse_source(source)] = patient
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    analyze, draw, close = angle_monitor(args.side, args.method, args.output_dir, patients)
+    pipeline = MultiStreamPipeline(
+        sources, analyze, draw,
+        make_pose=lambda static: create_pose(args.model_complexity, static_image_mode=static),
+        pool_size=args.pool, loop=args.loop, display=not args.no_display, duration=args.duration
+    )
+    try:
+        pipeline.run()
+    finally:
+        close(pipeline.streams)
@@ -0,0 +1,182 @@
+"""Incremental anomaly detectors for the live arm-angle loop.
+
+Each detector takes one angle per frame through update() and returns whether it
+is an anomaly. Per-frame cost does not grow with the session length:
+
+- stddev: running mean/variance (Welford) over the whole session
+- isofor: IsolationForest fit on a sliding window, refit every K frames
+- knn:    distance to the k-th nearest angle in a sliding window
+- kmeans: distance to the nearest KMeans centroid, refit every K frames
+
+Model refits run on a background thread; frames keep being scored with the
+previous model until the new one is ready.
+"""
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+DETECTOR_METHODS = ('stddev', 'isofor', 'knn', 'kmeans')
+
+
+class OnlineDetector(ABC):
+    """Base class: sliding window of recent angles plus periodic background refits."""
+
+    def __init__(self, warmup=30, window=300, refit_every=30, background=True):
+        self.warmup = warmup  # Start detecting anomalies after this many frames
+        self.refit_every = refit_every
+        self.window = deque(maxlen=window)
+        self.count = 0
+        self.model = None
+        self._executor = ThreadPoolExecutor(max_workers=1) if background else None
+        self._pending = None
+
+    @abstractmethod
+    def fit(self, values):
+        """Build model state from a window of angles (runs off the main loop)."""
+
+    @abstractmethod
+    def score(self, value):
+        """Return True if value is anomalous under the current model."""
+
+    def _refit(self):
+        values = np.array(self.window, dtype=float)
+        if self._executor is None:
+            self.model = self.fit(values)
+            return
+        # Skip this refit if the previous one is still running
+        if self._pending is None or self._pending.done():
+            self._pending = self._executor.submit(self.fit, values)
+
+    def update(self, value):
+        self.window.append(value)
+        self.count += 1
+
+        # Pick up a finished background refit
+        if self._pending is not None and self._pending.done():
+            self.model = self._pending.result()
+            self._pending = None
+
+        if self.count <= self.warmup:
+            return False
+        if self.model is None or (self.count - self.warmup) % self.refit_every == 0:
+            self._refit()
+        if self.model is None:
+            return False
+        return bool(self.score(value))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+class StdDevDetector(OnlineDetector):
+    """Flags angles more than n_std standard deviations from the session mean.
+
+    Same rule as np.mean/np.std over the full history, kept with Welford's running
+    update so no refit is needed.
+    """
+
+    def __init__(self, n_std=2.0, warmup=30):
+        super().__init__(warmup=warmup, window=1, background=False)
+        self.n_std = n_std
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.count <= self.warmup:
+            return False
+        return self.score(value)
+
+    def fit(self, values):
+        """Reset the running statistics to those of values."""
+        values = np.asarray(values, dtype=float)
+        self.count = len(values)
+        self.mean = float(values.mean()) if self.count else 0.0
+        self.m2 = float(((values - self.mean) ** 2).sum())
+
+    def score(self, value):
+        std = np.sqrt(self.m2 / self.count)
+        return bool(abs(value - self.mean) > self.n_std * std)
+
+
+class IsoForDetector(OnlineDetector):
+    """IsolationForest refit on the sliding window every refit_every frames."""
+
+    def __init__(self, contamination=0.02, **kwargs):
+        super().__init__(**kwargs)
+        self.contamination = contamination
+
+    def fit(self, values):
+        from sklearn.ensemble import IsolationForest
+        model = IsolationForest(n_estimators=100, contamination=self.contamination, random_state=42)
+        return model.fit(values.reshape(-1, 1))
+
+    def score(self, value):
+        return self.model.predict([[value]])[0] == -1  # -1 means anomaly
+
+
+class KNNDetector(OnlineDetector):
+    """Flags angles whose k-th nearest neighbour in the window is unusually far away.
+
+    The threshold is the given percentile of the window's own k-NN distances,
+    recomputed at each refit.
+    """
+
+    def __init__(self, n_neighbors=2, percentile=95, **kwargs):
+        super().__init__(**kwargs)
+        self.n_neighbors = n_neighbors
+        self.percentile = percentile
+
+    def fit(self, values):
+        k = min(self.n_neighbors, len(values) - 1)
+        distances = np.abs(values[:, None] - values[None, :])
+        kth = np.partition(distances, k, axis=1)[:, k]  # column 0 is the point itself
+        return np.percentile(kth, self.percentile)
+
+    def score(self, value):
+        values = np.array(self.window, dtype=float)
+        k = min(self.n_neighbors, len(values) - 1)
+        # The current angle is in the window, so skip its zero self-distance
+        kth = np.partition(np.abs(values - value), k)[k]
+        return kth > self.model
+
+
+class KMeansDetector(OnlineDetector):
+    """Flags angles far from every KMeans centroid of the window."""
+
+    def __init__(self, n_clusters=2, percentile=95, **kwargs):
+        super().__init__(**kwargs)
+        self.n_clusters = n_clusters
+        self.percentile = percentile
+
+    def fit(self, values):
+        from sklearn.cluster import KMeans
+        model = KMeans(n_clusters=self.n_clusters, random_state=42, n_init=10).fit(values.reshape(-1, 1))
+        centroids = model.cluster_centers_.ravel()
+        distances = np.min(np.abs(values[:, None] - centroids[None, :]), axis=1)
+        return centroids, np.percentile(distances, self.percentile)
+
+    def score(self, value):
+        centroids, threshold = self.model
+        return np.min(np.abs(centroids - value)) > threshold
+
+
+def create_detector(method, **kwargs):
+    """Build the incremental detector for one of DETECTOR_METHODS (case-insensitive)."""
+    detectors = {
+        'stddev': StdDevDetector,
+        'isofor': IsoForDetector,
+        'knn': KNNDetector,
+        'kmeans': KMeansDetector,
+    }
+    method = method.lower()
+    if method not in detectors:
+        raise ValueError(f"Unknown anomaly detection method: {method}. Choose from {', '.join(DETECTOR_METHODS)}")
+    return detectors[method](**kwargs)
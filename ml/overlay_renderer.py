@@ -0,0 +1,276 @@
+"""Render a video with its stored pose series drawn on top.
+
+Accepts any stored landmark set:
+
+- .pose files from analyze_video (all 33 landmarks with visibility)
+- the legacy analyze_video JSON ('Timestamp', 'Shoulder_X', ... 'Wrist_Z')
+- both_arms_pose.npy / both_arms_pose.csv from References/extract_pose.py
+
+The whole series is mapped to per-frame pixel coordinates in one vectorized step
+(series with timestamps are interpolated to every video frame), so the draw loop
+only indexes arrays. Frames are decoded into a ring of preallocated buffers on
+one thread and encoded on another, so decoding, drawing and encoding overlap.
+
+Usage: python overlay_renderer.py <video> <pose_file> <output.mp4> [--max-gap SECONDS]
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from pose_landmarks import POSE_LANDMARKS
+
+# Joint order written by References/extract_pose.py
+BOTH_ARMS_NPY_NAMES = ['RIGHT_SHOULDER', 'RIGHT_ELBOW', 'RIGHT_WRIST', 'LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST']
+
+# Skeleton edges by landmark name without the side prefix, drawn for '', 'LEFT_' and 'RIGHT_'
+SIDE_CONNECTIONS = [('SHOULDER', 'ELBOW'), ('ELBOW', 'WRIST'), ('SHOULDER', 'HIP'), ('HIP', 'KNEE'),
+                    ('KNEE', 'ANKLE')]
+CROSS_CONNECTIONS = [('LEFT_SHOULDER', 'RIGHT_SHOULDER'), ('LEFT_HIP', 'RIGHT_HIP')]
+
+# BGR colors, matching the original both-arms overlay
+JOINT_COLORS = {'SHOULDER': (0, 255, 0), 'ELBOW': (0, 0, 255), 'WRIST': (255, 0, 0)}
+CONNECTION_COLORS = {('SHOULDER', 'ELBOW'): (0, 255, 255), ('ELBOW', 'WRIST'): (255, 0, 255)}
+DEFAULT_JOINT_COLOR = (255, 255, 255)
+DEFAULT_CONNECTION_COLOR = (200, 200, 200)
+
+MIN_VISIBILITY = 0.5
+BUFFERS = 8
+
+
+def _series_from_columns(columns):
+    """Group '<name>_X/_Y[/_V]' columns (any case) into a pose series dict."""
+    timestamps = None
+    names, xs, ys, vs = [], [], [], []
+    for key in columns:
+        if key.lower() == 'timestamp':
+            timestamps = np.asarray(columns[key], dtype=float)
+            continue
+        base, _, axis = key.rpartition('_')
+        if axis not in ('X', 'x'):
+            continue
+        y_key = f"{base}_{'Y' if axis == 'X' else 'y'}"
+        v_key = f"{base}_{'V' if axis == 'X' else 'v'}"
+        if y_key not in columns:
+            continue
+        names.append(base.upper())
+        xs.append(columns[key])
+        ys.append(columns[y_key])
+        vs.append(columns.get(v_key))
+
+    points = np.stack([np.stack(xs, axis=1), np.stack(ys, axis=1)], axis=-1).astype(float)
+    visibility = None
+    if all(v is not None for v in vs):
+        visibility = np.stack(vs, axis=1).astype(float)
+    return {'names': names, 'points': points, 'visibility': visibility, 'timestamps': timestamps}
+
+
+def load_pose_series(path):
+    """Load a stored pose series as names, (T, L, 2) normalized points, optional visibility and timestamps.
+
+    Series without timestamps (the .npy and .csv from extract_pose.py) hold one
+    sample per video frame.
+    """
+    if path.endswith('.pose'):
+        from pose_format import read_pose_file
+        _, columns = read_pose_file(path)
+        return _series_from_columns(columns)
+    if path.endswith('.json'):
+        with open(path) as f:
+            return _series_from_columns(json.load(f))
+    if path.endswith('.csv'):
+        with open(path) as f:
+            header = f.readline().strip().split(',')
+        data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+        return _series_from_columns({name: data[:, i] for i, name in enumerate(header)})
+    if path.endswith('.npy'):
+        data = np.load(path)
+        if data.shape[1] == len(BOTH_ARMS_NPY_NAMES):
+            names = BOTH_ARMS_NPY_NAMES
+        elif data.shape[1] == len(POSE_LANDMARKS):
+            names = POSE_LANDMARKS
+        else:
+            names = [f'P{i}' for i in range(data.shape[1])]
+        visibility = data[:, :, 3].astype(float) if data.shape[2] > 3 else None
+        return {'names': list(names), 'points': data[:, :, :2].astype(float), 'visibility': visibility,
+                'timestamps': None}
+    raise ValueError(f"Unsupported pose file: {path}")
+
+
+def skeleton(names):
+    """Drawable (index pairs, colors) for the connections whose landmarks are all present."""
+    index = {name: i for i, name in enumerate(names)}
+    pairs, colors = [], []
+    for prefix in ('', 'LEFT_', 'RIGHT_'):
+        for a, b in SIDE_CONNECTIONS:
+            if prefix + a in index and prefix + b in index:
+                pairs.append((index[prefix + a], index[prefix + b]))
+                colors.append(CONNECTION_COLORS.get((a, b), DEFAULT_CONNECTION_COLOR))
+    for a, b in CROSS_CONNECTIONS:
+        if a in index and b in index:
+            pairs.append((index[a], index[b]))
+            colors.append(DEFAULT_CONNECTION_COLOR)
+    return np.array(pairs, dtype=int).reshape(-1, 2), colors
+
+
+def joint_colors(names):
+    return [JOINT_COLORS.get(name.rpartition('_')[2], DEFAULT_JOINT_COLOR) for name in names]
+
+
+def frame_pixels(series, frame_count, fps, width, height, max_gap=0.5):
+    """Pixel coordinates of every landmark on every video frame, in one vectorized pass.
+
+    Returns (pixels (F, L, 2) int32, drawn (F, L) bool). Timestamped series are
+    linearly interpolated to the frame times; frames further than max_gap seconds
+    from a detection on either side are left undrawn.
+    """
+    points = series['points']
+    n_samples, n_landmarks = points.shape[:2]
+    visible = np.ones((n_samples, n_landmarks), dtype=bool)
+    if series['visibility'] is not None:
+        visible = series['visibility'] >= MIN_VISIBILITY
+    visible &= np.isfinite(points).all(axis=-1)
+
+    timestamps = series['timestamps']
+    if timestamps is None or n_samples == 0:
+        # One sample per frame
+        count = min(frame_count, n_samples)
+        frame_points = np.zeros((frame_count, n_landmarks, 2))
+        frame_points[:count] = points[:count]
+        drawn = np.zeros((frame_count, n_landmarks), dtype=bool)
+        drawn[:count] = visible[:count]
+    else:
+        frame_times = np.arange(frame_count) / fps
+        after = np.searchsorted(timestamps, frame_times)
+        lo = np.clip(after - 1, 0, n_samples - 1)
+        hi = np.clip(after, 0, n_samples - 1)
+        span = timestamps[hi] - timestamps[lo]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(span > 0, (frame_times - timestamps[lo]) / span, 0.0)
+        frame_points = points[lo] + (points[hi] - points[lo]) * weight[:, None, None]
+
+        # Half a frame of slack at both ends of the series
+        in_range = (frame_times >= timestamps[0] - 0.5 / fps) & (frame_times <= timestamps[-1] + 0.5 / fps)
+        drawn = (visible[lo] & visible[hi]) & (in_range & (span <= max_gap))[:, None]
+
+    pixels = np.rint(np.nan_to_num(frame_points) * [width, height]).astype(np.int32)
+    return pixels, drawn
+
+
+def _reader(cap, buffers, free, filled, frame_count, stop):
+    try:
+        for frame_idx in range(frame_count):
+            slot = free.get()
+            if stop.is_set():
+                break
+            ret, frame = cap.read(buffers[slot])
+            if not ret:
+                free.put(slot)
+                break
+            if frame is not buffers[slot]:
+                # Backends that cannot decode in place return a new array
+                buffers[slot] = frame
+            filled.put((frame_idx, slot))
+    finally:
+        filled.put(None)
+
+
+def _writer(out, buffers, free, drawn_queue):
+    while True:
+        slot = drawn_queue.get()
+        if slot is None:
+            break
+        out.write(buffers[slot])
+        free.put(slot)
+
+
+def render_overlay(video_path, pose_path, output_path, max_gap=0.5, fourcc='mp4v'):
+    """Write output_path: video_path with the pose series from pose_path drawn on every frame."""
+    start_time = time.time()
+    series = load_pose_series(pose_path)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    pixels, drawn = frame_pixels(series, frame_count, fps, width, height, max_gap)
+    pairs, pair_colors = skeleton(series['names'])
+    colors = joint_colors(series['names'])
+    # Group connections by color so each group is a single polylines call
+    color_groups = {}
+    for i, color in enumerate(pair_colors):
+        color_groups.setdefault(color, []).append(i)
+    color_groups = [(color, np.array(indices)) for color, indices in color_groups.items()]
+
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(BUFFERS)]
+    free = queue.Queue()
+    for slot in range(BUFFERS):
+        free.put(slot)
+    filled = queue.Queue()
+    drawn_queue = queue.Queue()
+    stop = threading.Event()
+
+    reader = threading.Thread(target=_reader, args=(cap, buffers, free, filled, frame_count, stop), daemon=True)
+    writer = threading.Thread(target=_writer, args=(out, buffers, free, drawn_queue), daemon=True)
+    reader.start()
+    writer.start()
+
+    frames = 0
+    try:
+        while True:
+            item = filled.get()
+            if item is None:
+                break
+            frame_idx, slot = item
+            frame = buffers[slot]
+            frame_pixels_i, frame_drawn = pixels[frame_idx], drawn[frame_idx]
+
+            for color, indices in color_groups:
+                group = pairs[indices]
+                keep = frame_drawn[group[:, 0]] & frame_drawn[group[:, 1]]
+                if keep.any():
+                    cv2.polylines(frame, list(frame_pixels_i[group[keep]]), False, color, 2)
+            for i in np.flatnonzero(frame_drawn):
+                cv2.circle(frame, tuple(frame_pixels_i[i]), 5, colors[i], -1)
+
+            drawn_queue.put(slot)
+            frames += 1
+    finally:
+        drawn_queue.put(None)
+        writer.join()
+        # Wake the reader in case it is waiting for a buffer after an error
+        stop.set()
+        free.put(0)
+        reader.join()
+        cap.release()
+        out.release()
+
+    elapsed = time.time() - start_time
+    print(f"Overlay of {frames} frames written to {output_path} in {elapsed:.1f}s "
+          f"({frames / elapsed if elapsed > 0 else 0:.1f} frames/s)")
+    return output_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Draw a stored pose series on its video")
+    parser.add_argument('video_path')
+    parser.add_argument('pose_path', help=".pose, analyze_video JSON, or both_arms_pose .npy/.csv")
+    parser.add_argument('output_path')
+    parser.add_argument('--max-gap', type=float, default=0.5,
+                        help="seconds without a detection after which nothing is drawn")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pose_path):
+        parser.error(f"pose file not found: {args.pose_path}")
+    render_overlay(args.video_path, args.pose_path, args.output_path, max_gap=args.max_gap)
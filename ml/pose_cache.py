@@ -0,0 +1,116 @@
+"""Content-addressed cache for pose extraction and feature results.
+
+Entries are keyed by a hash of the input bytes (the uploaded video, or a pose
+file for derived features) plus the parameters that affect the result, so a
+baseline video re-submitted against a new follow-up is served from disk.
+
+Each entry is a directory of files under the cache root. Entries are written to
+a temporary directory and renamed into place, so concurrent jobs never see a
+half-written entry. Reading an entry touches its mtime; when the cache grows past
+its size cap the least recently used entries are removed. Several processes can
+share the cache (batch_analyze.py), so an entry may be evicted by another process
+between get() and reading its files; callers treat that as a miss.
+
+The root defaults to tmp/pose_cache in the project and can be moved with the
+SWING_CACHE_DIR environment variable; SWING_CACHE_MAX_MB sets the size cap.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tmp', 'pose_cache')
+DEFAULT_MAX_MB = 2048
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes, read in chunks so large videos are not loaded whole."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(path, **params):
+    """Key for the result of processing path with the given parameters."""
+    digest = hashlib.sha256(hash_file(path).encode('ascii'))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PoseCache:
+    def __init__(self, root=None, max_bytes=None):
+        self.root = os.path.abspath(root or os.environ.get('SWING_CACHE_DIR', DEFAULT_CACHE_DIR))
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('SWING_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key, names):
+        """Return {name: path} for a complete entry, or None on a miss."""
+        entry_dir = self._entry_dir(key)
+        paths = {name: os.path.join(entry_dir, name) for name in names}
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None
+        # Mark as recently used for LRU eviction
+        try:
+            os.utime(entry_dir)
+        except OSError:
+            pass
+        return paths
+
+    def put(self, key, files):
+        """Store {name: source_path} as one entry, then evict down to the size cap."""
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.root)
+        try:
+            for name, source in files.items():
+                shutil.copyfile(source, os.path.join(tmp_dir, name))
+            try:
+                os.rename(tmp_dir, self._entry_dir(key))
+            except OSError:
+                # Another job stored the same entry first
+                pass
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits under max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, name)
+            if name.startswith('.tmp-') or not os.path.isdir(entry_dir):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+                entries.append((os.stat(entry_dir).st_mtime, size, entry_dir))
+            except FileNotFoundError:
+                # Evicted by another process meanwhile
+                continue
+            total += size
+
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+
+def copy_cached(paths, destinations):
+    """Copy cached files {name: path} to {name: destination}.
+
+    Returns False if the entry was evicted by another process before it could be
+    copied, which callers handle as a cache miss.
+    """
+    try:
+        for name, destination in destinations.items():
+            shutil.copyfile(paths[name], destination)
+    except FileNotFoundError:
+        return False
+    return True
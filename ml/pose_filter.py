@@ -0,0 +1,164 @@
+"""Landmark smoothing filters for pose series.
+
+calculate_smoothness() differentiates positions three times, which amplifies
+Mediapipe's frame-to-frame jitter far more than the motion itself. Filtering the
+series first keeps jerk stable even with the light model (model_complexity=0)
+and sparse sampling.
+
+Both filters run over the whole (T, landmarks, 3) array at once: the time loop
+is sequential, but every step updates all landmarks and axes in one NumPy
+operation. Visibility scores weight each measurement, so occluded landmarks
+lean on the motion model instead of pulling the track around.
+
+- kalman: constant-velocity Kalman filter with a Rauch-Tung-Striebel backward
+  pass. Offline (uses future samples), the default for recorded videos.
+- one_euro: One Euro filter. Causal, for live feedback where only past frames
+  are available.
+"""
+import numpy as np
+
+SMOOTHING_METHODS = ('kalman', 'one_euro')
+
+# Mediapipe jitter in normalized image units, and how fast the arm's acceleration may change
+MEASUREMENT_NOISE = 0.005
+PROCESS_NOISE = 0.1
+# Visibility below this counts as a missing measurement
+MIN_WEIGHT = 1e-3
+
+
+def _weights(visibility, shape):
+    if visibility is None:
+        return np.ones(shape)
+    weights = np.clip(np.asarray(visibility, dtype=float), MIN_WEIGHT, 1.0)
+    return np.broadcast_to(weights[..., None], shape) if weights.ndim < len(shape) else weights
+
+
+def _time_steps(timestamps, n_samples):
+    timestamps = np.asarray(timestamps, dtype=float)
+    steps = np.diff(timestamps, prepend=timestamps[0] if n_samples else 0.0)
+    # Repeated timestamps would divide by zero in the One Euro filter
+    positive = steps[steps > 0]
+    return np.where(steps > 0, steps, positive.min() if len(positive) else 1.0)
+
+
+def kalman_smooth(positions, timestamps, visibility=None, measurement_noise=MEASUREMENT_NOISE,
+                  process_noise=PROCESS_NOISE):
+    """Constant-velocity Kalman filter plus RTS smoother over a (T, ...) position array.
+
+    Every trailing element (landmark and axis) is an independent track with a
+    position/velocity state. measurement_noise is the standard deviation of one
+    fully visible observation; visibility v scales it by 1/v. process_noise is the
+    spectral density of the white-noise acceleration: higher follows faster motion
+    more closely, lower smooths more. NaN observations are skipped.
+    """
+    z = np.asarray(positions, dtype=float)
+    n_samples = len(z)
+    if n_samples < 2:
+        return z.copy()
+    steps = _time_steps(timestamps, n_samples)
+    r = (measurement_noise / _weights(visibility, z.shape)) ** 2
+    missing = np.isnan(z)
+    q = process_noise
+
+    # Filtered and one-step predicted states, kept for the backward pass
+    filtered_p = np.empty_like(z)
+    filtered_v = np.empty_like(z)
+    filtered_cov = np.empty((n_samples, 3) + z.shape[1:])
+    predicted_cov = np.empty_like(filtered_cov)
+    predicted_p = np.empty_like(z)
+    predicted_v = np.empty_like(z)
+
+    p = np.where(missing[0], np.nanmean(z, axis=0), z[0])
+    p = np.nan_to_num(p)
+    v = np.zeros_like(p)
+    p00, p01, p11 = r[0].copy(), np.zeros_like(p), np.ones_like(p)
+
+    for k in range(n_samples):
+        if k > 0:
+            dt = steps[k]
+            # Predict
+            p = p + dt * v
+            p00, p01, p11 = (p00 + 2 * dt * p01 + dt * dt * p11 + q * dt ** 3 / 3,
+                             p01 + dt * p11 + q * dt * dt / 2,
+                             p11 + q * dt)
+        predicted_p[k], predicted_v[k] = p, v
+        predicted_cov[k] = p00, p01, p11
+
+        # Update, with zero gain for missing observations
+        s = p00 + r[k]
+        k0 = np.where(missing[k], 0.0, p00 / s)
+        k1 = np.where(missing[k], 0.0, p01 / s)
+        innovation = np.where(missing[k], 0.0, z[k] - p)
+        p = p + k0 * innovation
+        v = v + k1 * innovation
+        p00, p01, p11 = (1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01
+
+        filtered_p[k], filtered_v[k] = p, v
+        filtered_cov[k] = p00, p01, p11
+
+    # Rauch-Tung-Striebel backward pass on the means
+    smoothed_p = filtered_p.copy()
+    smoothed_v = filtered_v.copy()
+    for k in range(n_samples - 2, -1, -1):
+        dt = steps[k + 1]
+        f00, f01, f11 = filtered_cov[k]
+        n00, n01, n11 = predicted_cov[k + 1]
+        det = n00 * n11 - n01 * n01
+        # C = P_filtered F^T inv(P_predicted)
+        a00, a01, a10, a11 = f00 + dt * f01, f01, f01 + dt * f11, f11
+        c00 = (a00 * n11 - a01 * n01) / det
+        c01 = (a01 * n00 - a00 * n01) / det
+        c10 = (a10 * n11 - a11 * n01) / det
+        c11 = (a11 * n00 - a10 * n01) / det
+        dp = smoothed_p[k + 1] - predicted_p[k + 1]
+        dv = smoothed_v[k + 1] - predicted_v[k + 1]
+        smoothed_p[k] = filtered_p[k] + c00 * dp + c01 * dv
+        smoothed_v[k] = filtered_v[k] + c10 * dp + c11 * dv
+
+    return smoothed_p
+
+
+def one_euro_filter(positions, timestamps, visibility=None, min_cutoff=1.0, beta=5.0, d_cutoff=1.0):
+    """One Euro filter over a (T, ...) position array (causal).
+
+    min_cutoff (Hz) sets the smoothing of slow motion, beta how quickly the cutoff
+    rises with speed to keep fast swings from lagging. A landmark with visibility v
+    moves only a fraction v of the usual step towards its new observation.
+    """
+    x = np.asarray(positions, dtype=float)
+    n_samples = len(x)
+    if n_samples < 2:
+        return x.copy()
+    steps = _time_steps(timestamps, n_samples)
+    weights = _weights(visibility, x.shape)
+
+    def alpha(cutoff, dt):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    filtered = np.empty_like(x)
+    estimate = np.nan_to_num(x[0])
+    derivative = np.zeros_like(estimate)
+    filtered[0] = estimate
+    for k in range(1, n_samples):
+        dt = steps[k]
+        observation = np.where(np.isnan(x[k]), estimate, x[k])
+        raw_derivative = (observation - estimate) / dt
+        derivative = derivative + alpha(d_cutoff, dt) * weights[k] * (raw_derivative - derivative)
+        cutoff = min_cutoff + beta * np.abs(derivative)
+        estimate = estimate + alpha(cutoff, dt) * weights[k] * (observation - estimate)
+        filtered[k] = estimate
+    return filtered
+
+
+def smooth_landmarks(timestamps, landmarks, method='kalman', **kwargs):
+    """Smooth a (T, landmarks, 4) x/y/z/visibility array; visibility itself is kept as is."""
+    if method not in SMOOTHING_METHODS:
+        raise ValueError(f"Unknown smoothing method {method!r}, choose from {', '.join(SMOOTHING_METHODS)}")
+    landmarks = np.asarray(landmarks)
+    if len(landmarks) == 0:
+        return landmarks
+    smooth = kalman_smooth if method == 'kalman' else one_euro_filter
+    smoothed = landmarks.copy()
+    smoothed[..., :3] = smooth(landmarks[..., :3], timestamps, visibility=landmarks[..., 3], **kwargs)
+    return smoothed
@@ -0,0 +1,156 @@
+"""Compact columnar binary pose format (.pose).
+
+Layout, all little-endian:
+
+    8 bytes   magic b'SWPOSE\\x00\\x01'
+    4 bytes   uint32 length of the JSON header
+    N bytes   JSON header: columns, n_samples, data_offset, dtype plus metadata
+              such as fps, landmark set and sampling
+    padding   up to data_offset (64-byte aligned)
+    data      float32 columns, one contiguous block of n_samples values per column
+
+Columns are stored back to back so a reader can memory-map the file and use a
+single column without touching the others. The legacy JSON written by
+analyze_video.py keeps the same column names ('Timestamp', 'Shoulder_X', ...).
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+from pose_landmarks import arm_columns
+
+MAGIC = b'SWPOSE\x00\x01'
+DTYPE = '<f4'
+ALIGNMENT = 64
+
+
+def _pose_header(names, n_samples, metadata):
+    """Encoded JSON header plus the size of the prefix it ends and the data offset."""
+    header = dict(metadata, columns=names, n_samples=n_samples, dtype=DTYPE, data_offset=0)
+    # data_offset is part of the header it follows, so settle it before writing
+    while True:
+        header_bytes = json.dumps(header).encode('utf-8')
+        prefix = len(MAGIC) + 4 + len(header_bytes)
+        data_offset = -(-prefix // ALIGNMENT) * ALIGNMENT
+        if data_offset == header['data_offset']:
+            return header_bytes, prefix, data_offset
+        header['data_offset'] = data_offset
+
+
+def _write_header(f, header_bytes, prefix, data_offset):
+    f.write(MAGIC)
+    f.write(struct.pack('<I', len(header_bytes)))
+    f.write(header_bytes)
+    f.write(b'\x00' * (data_offset - prefix))
+
+
+def write_pose_file(path, columns, **metadata):
+    """Write a dict of equal-length 1-D columns plus JSON-serializable metadata."""
+    names = list(columns)
+    arrays = [np.asarray(columns[name], dtype=DTYPE) for name in names]
+    n_samples = len(arrays[0]) if arrays else 0
+    if any(len(array) != n_samples for array in arrays):
+        raise ValueError("All pose columns must have the same length")
+
+    with open(path, 'wb') as f:
+        _write_header(f, *_pose_header(names, n_samples, metadata))
+        for array in arrays:
+            f.write(array.tobytes())
+
+
+class PoseStreamWriter:
+    """Write a .pose file one sample (row) at a time with bounded memory.
+
+    The columnar layout needs the sample count up front, so rows are spooled to
+    '<path>.rows' as they arrive and close() copies them into columns one column at
+    a time. Whatever was appended is written, also when the stream stops early.
+    """
+
+    def __init__(self, path, names, **metadata):
+        self.path = path
+        self.names = list(names)
+        self.metadata = metadata
+        self.n_samples = 0
+        self.spool_path = path + '.rows'
+        self.spool = open(self.spool_path, 'wb')
+
+    def append(self, row):
+        """Add one sample: a 1-D sequence of values in column order."""
+        row = np.asarray(row, dtype=DTYPE)
+        if row.shape != (len(self.names),):
+            raise ValueError(f"Expected {len(self.names)} values per row, got shape {row.shape}")
+        self.spool.write(row.tobytes())
+        self.n_samples += 1
+
+    def close(self):
+        if self.spool is None:
+            return
+        self.spool.close()
+        self.spool = None
+        try:
+            with open(self.path, 'wb') as f:
+                _write_header(f, *_pose_header(self.names, self.n_samples, self.metadata))
+                if self.n_samples:
+                    rows = np.memmap(self.spool_path, dtype=DTYPE, mode='r',
+                                     shape=(self.n_samples, len(self.names)))
+                    for i in range(len(self.names)):
+                        f.write(np.ascontiguousarray(rows[:, i]).tobytes())
+                    del rows
+        finally:
+            os.remove(self.spool_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_pose_header(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a pose file: {path}")
+        (header_length,) = struct.unpack('<I', f.read(4))
+        return json.loads(f.read(header_length).decode('utf-8'))
+
+
+def read_pose_file(path, mmap=True):
+    """Return (header, columns) where columns maps names to float32 arrays.
+
+    With mmap=True the arrays are read-only views into a memory-mapped file, so only
+    the columns that are actually used get paged in.
+    """
+    header = read_pose_header(path)
+    n_columns = len(header['columns'])
+    n_samples = header['n_samples']
+    shape = (n_columns, n_samples)
+
+    if n_columns == 0 or n_samples == 0:
+        data = np.zeros(shape, dtype=header['dtype'])
+    elif mmap:
+        data = np.memmap(path, dtype=header['dtype'], mode='r', offset=header['data_offset'], shape=shape)
+    else:
+        with open(path, 'rb') as f:
+            f.seek(header['data_offset'])
+            data = np.fromfile(f, dtype=header['dtype'], count=n_columns * n_samples).reshape(shape)
+
+    columns = {name: data[i] for i, name in enumerate(header['columns'])}
+    return header, columns
+
+
+def load_pose_data(path, side='right'):
+    """Load arm pose columns from either a .pose file or the legacy analyze_video JSON.
+
+    .pose files holding every landmark (landmark_set 'all') are reduced to the
+    'Shoulder_X' ... 'Wrist_Z' view of the requested arm; legacy JSON is always the
+    arm it was extracted for.
+    """
+    if path.endswith('.pose'):
+        header, columns = read_pose_file(path)
+        if header.get('landmark_set') == 'all':
+            return arm_columns(columns, side)
+        return columns
+    with open(path, 'r') as f:
+        return json.load(f)
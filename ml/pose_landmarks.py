@@ -0,0 +1,94 @@
+"""Full-body landmark arrays and the per-arm views derived from them.
+
+analyze_video() keeps every Mediapipe pose landmark as a float32 (T, 33, 4) array
+of x, y, z and visibility. The legacy 'Shoulder_X' ... 'Wrist_Z' pose dict used by
+analyze_improvement.py is a view of one arm taken from that array, so looking at
+the other side (or the hips) never needs another decode and inference pass.
+"""
+import numpy as np
+
+# Mediapipe PoseLandmark order
+POSE_LANDMARKS = [
+    'NOSE',
+    'LEFT_EYE_INNER', 'LEFT_EYE', 'LEFT_EYE_OUTER',
+    'RIGHT_EYE_INNER', 'RIGHT_EYE', 'RIGHT_EYE_OUTER',
+    'LEFT_EAR', 'RIGHT_EAR',
+    'MOUTH_LEFT', 'MOUTH_RIGHT',
+    'LEFT_SHOULDER', 'RIGHT_SHOULDER',
+    'LEFT_ELBOW', 'RIGHT_ELBOW',
+    'LEFT_WRIST', 'RIGHT_WRIST',
+    'LEFT_PINKY', 'RIGHT_PINKY',
+    'LEFT_INDEX', 'RIGHT_INDEX',
+    'LEFT_THUMB', 'RIGHT_THUMB',
+    'LEFT_HIP', 'RIGHT_HIP',
+    'LEFT_KNEE', 'RIGHT_KNEE',
+    'LEFT_ANKLE', 'RIGHT_ANKLE',
+    'LEFT_HEEL', 'RIGHT_HEEL',
+    'LEFT_FOOT_INDEX', 'RIGHT_FOOT_INDEX',
+]
+LANDMARK_INDEX = {name: i for i, name in enumerate(POSE_LANDMARKS)}
+
+# Components stored per landmark
+COMPONENTS = ('X', 'Y', 'Z', 'V')
+
+ARM_JOINTS = ('Shoulder', 'Elbow', 'Wrist')
+
+
+def landmarks_to_array(landmarks):
+    """Mediapipe landmark list -> float32 (33, 4) array of x, y, z, visibility."""
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float32)
+
+
+def arm_view(timestamps, landmarks, side='right'):
+    """Legacy pose dict ('Timestamp', 'Shoulder_X', ... 'Wrist_Z') for one arm."""
+    if side not in ('right', 'left'):
+        raise ValueError(f"side must be 'right' or 'left', got {side!r}")
+    view = {'Timestamp': np.asarray(timestamps, dtype=float)}
+    for joint in ARM_JOINTS:
+        index = LANDMARK_INDEX[f'{side.upper()}_{joint.upper()}']
+        for i, axis in enumerate('XYZ'):
+            view[f'{joint}_{axis}'] = landmarks[:, index, i]
+    return view
+
+
+def arm_columns(columns, side='right'):
+    """Legacy pose dict for one arm, picked straight from .pose landmark columns.
+
+    Only the ten columns used are touched, so memory-mapped files stay mostly unread.
+    """
+    if side not in ('right', 'left'):
+        raise ValueError(f"side must be 'right' or 'left', got {side!r}")
+    view = {'Timestamp': columns['Timestamp']}
+    for joint in ARM_JOINTS:
+        for axis in 'XYZ':
+            view[f'{joint}_{axis}'] = columns[f'{side.upper()}_{joint.upper()}_{axis}']
+    return view
+
+
+def landmark_columns(timestamps, landmarks):
+    """Flatten (T, 33, 4) landmarks into '<LANDMARK>_<X|Y|Z|V>' columns for a .pose file."""
+    columns = {'Timestamp': np.asarray(timestamps, dtype=float)}
+    for index, name in enumerate(POSE_LANDMARKS):
+        for i, component in enumerate(COMPONENTS):
+            columns[f'{name}_{component}'] = landmarks[:, index, i]
+    return columns
+
+
+def landmark_column_names():
+    """Column names written by landmark_columns(), in file order."""
+    return ['Timestamp'] + [f'{name}_{component}' for name in POSE_LANDMARKS for component in COMPONENTS]
+
+
+def landmark_row(timestamp, landmarks):
+    """One (33, 4) landmark sample as a row matching landmark_column_names(), for streaming writers."""
+    return np.concatenate(([timestamp], np.asarray(landmarks).ravel()))
+
+
+def columns_to_landmarks(columns):
+    """Inverse of landmark_columns(): returns (timestamps, (T, 33, 4) float32 landmarks)."""
+    timestamps = np.asarray(columns['Timestamp'], dtype=float)
+    landmarks = np.empty((len(timestamps), len(POSE_LANDMARKS), len(COMPONENTS)), dtype=np.float32)
+    for index, name in enumerate(POSE_LANDMARKS):
+        for i, component in enumerate(COMPONENTS):
+            landmarks[:, index, i] = columns[f'{name}_{component}']
+    return timestamps, landmarks
@@ -0,0 +1,78 @@
+"""Person region-of-interest cropping before pose inference.
+
+Phone footage is often 4K while the patient fills a fixed part of a tripod shot.
+PersonROI crops each frame to the box around the most recent landmarks (plus a
+margin), downsizes the crop so its longest side is inference_size pixels, and
+maps the detected landmarks back to normalized coordinates of the full frame.
+When tracking is lost the whole frame is used, still downsized.
+
+The crop is only moved when landmarks drift close to its edge, so on a steady
+shot Mediapipe sees a stable window and its own tracking stays smooth.
+"""
+import cv2
+import numpy as np
+
+
+class PersonROI:
+    def __init__(self, inference_size=512, margin=0.25, min_visibility=0.5):
+        self.inference_size = inference_size
+        self.margin = margin  # Padding around the landmark box, as a fraction of its size
+        self.min_visibility = min_visibility
+        self.box = None  # (x0, y0, x1, y1) in full-frame pixels, None means full frame
+
+    def crop(self, frame):
+        """Return (image, box) where image is the downsized crop to run inference on."""
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = self.box if self.box is not None else (0, 0, width, height)
+        region = frame[y0:y1, x0:x1]
+
+        scale = self.inference_size / max(x1 - x0, y1 - y0)
+        if scale < 1:
+            size = (max(1, round((x1 - x0) * scale)), max(1, round((y1 - y0) * scale)))
+            region = cv2.resize(region, size, interpolation=cv2.INTER_AREA)
+        return region, (x0, y0, x1, y1)
+
+    def to_frame(self, landmarks, box, frame_shape):
+        """Map (33, 4) landmarks normalized to the crop back to full-frame normalized coordinates."""
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = box
+        mapped = landmarks.copy()
+        mapped[:, 0] = (landmarks[:, 0] * (x1 - x0) + x0) / width
+        mapped[:, 1] = (landmarks[:, 1] * (y1 - y0) + y0) / height
+        # Mediapipe z uses roughly the same scale as x
+        mapped[:, 2] = landmarks[:, 2] * (x1 - x0) / width
+        return mapped
+
+    def update(self, landmarks, frame_shape):
+        """Track the person using full-frame normalized landmarks from the last frame."""
+        height, width = frame_shape[:2]
+        visible = landmarks[landmarks[:, 3] >= self.min_visibility]
+        if len(visible) < 4:
+            self.lost()
+            return
+
+        xs = np.clip(visible[:, 0], 0, 1) * width
+        ys = np.clip(visible[:, 1], 0, 1) * height
+        lx0, lx1, ly0, ly1 = xs.min(), xs.max(), ys.min(), ys.max()
+
+        # Keep the current crop while the person stays clear of its edges
+        if self.box is not None:
+            x0, y0, x1, y1 = self.box
+            band_x = (x1 - x0) * self.margin / 4
+            band_y = (y1 - y0) * self.margin / 4
+            if lx0 > x0 + band_x and lx1 < x1 - band_x and ly0 > y0 + band_y and ly1 < y1 - band_y:
+                return
+
+        pad_x = (lx1 - lx0) * self.margin
+        pad_y = (ly1 - ly0) * self.margin
+        box = (
+            int(max(0, lx0 - pad_x)),
+            int(max(0, ly0 - pad_y)),
+            int(min(width, np.ceil(lx1 + pad_x))),
+            int(min(height, np.ceil(ly1 + pad_y))),
+        )
+        self.box = box if box[2] - box[0] > 1 and box[3] - box[1] > 1 else None
+
+    def lost(self):
+        """Fall back to the full frame until the person is found again."""
+        self.box = None
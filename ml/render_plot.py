@@ -0,0 +1,103 @@
+"""On-demand rendering of the analysis plot from a stored pose series.
+
+analyze_video() can run data-only and skip plotting; the four-panel PNG is then
+rendered later from the .pose (or legacy JSON) file when someone asks for it.
+Rendering uses matplotlib's Agg canvas directly (no pyplot, no display), so it
+works headless and from several threads at once. Rendered PNGs are cached by the
+pose file's content, so asking for the same plot twice renders it once.
+
+Usage: python render_plot.py <pose_file> <output.png> [--side right|left] [--no-cache]
+"""
+import numpy as np
+
+from pose_cache import PoseCache, cache_key, copy_cached
+from pose_format import load_pose_data
+
+# Bump when the figure layout changes so stale cached PNGs are not reused
+PLOT_VERSION = 1
+
+
+def compute_derivatives(position, timestamps):
+    """Velocity and acceleration of one coordinate over time."""
+    if len(position) < 2 or len(timestamps) < 2:
+        raise ValueError("Insufficient data points for derivative computation.")
+    velocity = np.gradient(position, timestamps)
+    acceleration = np.gradient(velocity, timestamps)
+    return velocity, acceleration
+
+
+def save_analysis_plot(pose_data, output_path):
+    """Save the four-panel position/velocity/acceleration/trajectory plot."""
+    from matplotlib.figure import Figure
+
+    pose_data = {key: np.asarray(value, dtype=float) for key, value in pose_data.items()}
+    timestamps = pose_data['Timestamp']
+
+    # Calculate derivatives only for essential coordinates (Y-axis for vertical movement)
+    derivatives = {}
+    for joint in ['Shoulder', 'Elbow', 'Wrist']:
+        v, a = compute_derivatives(pose_data[f'{joint}_Y'], timestamps)
+        derivatives[f'{joint}_Y_Velocity'] = v
+        derivatives[f'{joint}_Y_Acceleration'] = a
+
+    # Create a simplified analysis plot with only essential data
+    fig = Figure(figsize=(8, 8))  # Reduced from 10x10
+
+    panels = [
+        ('Vertical Position', 'Position', lambda joint: pose_data[f'{joint}_Y']),
+        ('Vertical Velocity', 'Velocity', lambda joint: derivatives[f'{joint}_Y_Velocity']),
+        ('Vertical Acceleration', 'Acceleration', lambda joint: derivatives[f'{joint}_Y_Acceleration']),
+    ]
+    for i, (title, ylabel, series) in enumerate(panels, start=1):
+        ax = fig.add_subplot(2, 2, i)
+        for joint in ['Shoulder', 'Elbow', 'Wrist']:
+            ax.plot(timestamps[::2], series(joint)[::2], label=joint, linewidth=1)
+        ax.set_title(title)
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel(ylabel)
+        ax.legend()
+        ax.grid(True, alpha=0.3)  # Reduced grid opacity
+
+    # Plot 3D trajectory with reduced points
+    ax = fig.add_subplot(2, 2, 4, projection='3d')
+    for joint in ['Shoulder', 'Elbow', 'Wrist']:
+        ax.plot(pose_data[f'{joint}_X'][::4], pose_data[f'{joint}_Y'][::4], pose_data[f'{joint}_Z'][::4],
+                label=joint, linewidth=1)
+    ax.set_title('3D Trajectory')
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.set_zlabel('Z')
+    ax.legend()
+
+    # Save the plot with reduced DPI and simplified style
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=80, bbox_inches='tight')  # Reduced DPI from 100 to 80
+
+
+def render_pose_plot(pose_path, output_path, side='right', cache=True):
+    """Render the analysis plot for a stored pose file, reusing a cached PNG when possible."""
+    if cache:
+        pose_cache = PoseCache()
+        key = cache_key(pose_path, kind='plot', version=PLOT_VERSION, side=side)
+        cached = pose_cache.get(key, ['plot.png'])
+        if cached and copy_cached(cached, {'plot.png': output_path}):
+            return output_path
+
+    save_analysis_plot(load_pose_data(pose_path, side), output_path)
+
+    if cache:
+        pose_cache.put(key, {'plot.png': output_path})
+    return output_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render the analysis plot for a stored pose file")
+    parser.add_argument('pose_path', help=".pose file or pose JSON from analyze_video.py")
+    parser.add_argument('output_path', help="PNG to write")
+    parser.add_argument('--side', default='right', choices=['right', 'left'], help="arm to plot from .pose files")
+    parser.add_argument('--no-cache', action='store_true', help="always render, ignoring cached PNGs")
+    args = parser.parse_args()
+
+    render_pose_plot(args.pose_path, args.output_path, side=args.side, cache=not args.no_cache)
@@ -0,0 +1,182 @@
+"""Resampling confidence intervals and p-values for the improvement scores.
+
+The range-of-motion and smoothness scores are ratios of before/after summaries
+(calculate_improvement_score), so their uncertainty comes from the frames each
+summary was computed on. Frames of a swing are strongly autocorrelated, so both
+procedures work on non-overlapping blocks of consecutive frames:
+
+- confidence intervals: block bootstrap, resampling blocks of each video with
+  replacement and recomputing the scores
+- p-values: block permutation test of "before and after frames are
+  interchangeable", two-sided on the distance of the score from 1.0
+
+Each block is reduced once to its per-axis max/min and jerk sum, so a resample
+is a gather over a few hundred block summaries. All resamples are drawn as one
+array from a seeded generator and evaluated in batched NumPy operations, so the
+results are reproducible and cheap enough to run on every request.
+"""
+import numpy as np
+
+N_RESAMPLES = 2000
+CONFIDENCE = 0.95
+SEED = 0
+# Resamples evaluated per batch, bounds peak memory to a few tens of MB
+BATCH_SIZE = 500
+
+
+def default_block_length(n_samples):
+    """Cube-root rule of thumb for block bootstrap of a stationary series."""
+    return max(1, int(round(n_samples ** (1 / 3))))
+
+
+def block_summaries(vectors, jerk_magnitude, block_length):
+    """Reduce (T, S, 3) segment vectors and (T, S) jerk magnitudes to per-block summaries.
+
+    Returns a dict of 'max'/'min' (K, S, 3), 'jerk_sum' (K, S) and 'count' (K,); the
+    last block may be shorter.
+    """
+    n_samples = len(vectors)
+    starts = np.arange(0, n_samples, block_length)
+    return {
+        'max': np.maximum.reduceat(vectors, starts, axis=0),
+        'min': np.minimum.reduceat(vectors, starts, axis=0),
+        'jerk_sum': np.add.reduceat(jerk_magnitude, starts, axis=0),
+        'count': np.diff(np.append(starts, n_samples)).astype(float),
+    }
+
+
+def improvement_scores(before_value, after_value):
+    """Vectorized calculate_improvement_score(): 1 + relative change, 1.0 for a zero baseline."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(before_value == 0, 1.0, 1.0 + (after_value - before_value) / before_value)
+
+
+def _features(block_max, block_min, jerk_sum, count):
+    """Per-segment (..., S) range of motion and smoothness from reduced block summaries."""
+    ranges = block_max - block_min
+    range_of_motion = (ranges[..., 0] + ranges[..., 1] + ranges[..., 2]) / 3
+    smoothness = -jerk_sum / count[..., None]
+    return range_of_motion, smoothness
+
+
+def _scores(before, after):
+    """Scores of one or many (before, after) feature pairs, as a dict of arrays.
+
+    Overall criterion scores average the segments first, like analyze_improvement().
+    """
+    scores = {}
+    for criterion in ('range_of_motion', 'smoothness'):
+        b, a = before[criterion], after[criterion]
+        segment_scores = improvement_scores(b, a)
+        scores[criterion] = improvement_scores(b.mean(axis=-1), a.mean(axis=-1))
+        scores[f'{criterion}.upper_arm'] = segment_scores[..., 0]
+        scores[f'{criterion}.forearm'] = segment_scores[..., 1]
+    scores['overall'] = (scores['range_of_motion'] + scores['smoothness']) / 2
+    return scores
+
+
+def _reduce(blocks, index):
+    """Features of each resample, where index is (R, k) block indices into blocks."""
+    return dict(zip(('range_of_motion', 'smoothness'), _features(
+        blocks['max'][index].max(axis=1),
+        blocks['min'][index].min(axis=1),
+        blocks['jerk_sum'][index].sum(axis=1),
+        blocks['count'][index].sum(axis=1),
+    )))
+
+
+def _reduce_masked(blocks, mask):
+    """Features of each resample, where mask is (R, K) selecting blocks of the pooled summaries."""
+    selected = mask[:, :, None, None]
+    return dict(zip(('range_of_motion', 'smoothness'), _features(
+        np.where(selected, blocks['max'][None], -np.inf).max(axis=1),
+        np.where(selected, blocks['min'][None], np.inf).min(axis=1),
+        mask.astype(float) @ blocks['jerk_sum'],
+        mask.astype(float) @ blocks['count'],
+    )))
+
+
+def _batches(total):
+    for start in range(0, total, BATCH_SIZE):
+        yield min(BATCH_SIZE, total - start)
+
+
+def bootstrap_scores(before_blocks, after_blocks, n_resamples, rng):
+    """Scores for n_resamples block bootstrap draws of both videos."""
+    k_before, k_after = len(before_blocks['count']), len(after_blocks['count'])
+    draws = []
+    for size in _batches(n_resamples):
+        before = _reduce(before_blocks, rng.integers(0, k_before, (size, k_before)))
+        after = _reduce(after_blocks, rng.integers(0, k_after, (size, k_after)))
+        draws.append(_scores(before, after))
+    return {name: np.concatenate([draw[name] for draw in draws]) for name in draws[0]}
+
+
+def permutation_scores(before_blocks, after_blocks, n_resamples, rng):
+    """Scores with before/after block labels randomly reassigned, keeping the block counts."""
+    k_before = len(before_blocks['count'])
+    pooled = {name: np.concatenate([before_blocks[name], after_blocks[name]]) for name in before_blocks}
+    k_total = len(pooled['count'])
+    draws = []
+    for size in _batches(n_resamples):
+        # Ranks of uniform draws are a random permutation; the first k_before positions go to "before"
+        mask = np.argsort(rng.random((size, k_total)), axis=1) < k_before
+        draws.append(_scores(_reduce_masked(pooled, mask), _reduce_masked(pooled, ~mask)))
+    return {name: np.concatenate([draw[name] for draw in draws]) for name in draws[0]}
+
+
+def resample_improvement(before_features, after_features, n_resamples=N_RESAMPLES, confidence=CONFIDENCE,
+                         seed=SEED, block_length=None):
+    """Confidence intervals and p-values for the improvement scores of analyze_improvement().
+
+    Takes extract_features() results (their 'vectors' and 'jerk_magnitude' raw
+    arrays) and returns, for 'overall', 'range_of_motion', 'smoothness' and their
+    per-segment scores:
+        score              point estimate on all frames
+        ci_low, ci_high    percentile bootstrap interval at the given confidence
+        p_value            block permutation test against "no change" (two-sided)
+        significant        p_value < 1 - confidence
+    'overall' also has improved_probability, the bootstrap share of overall scores
+    above 1.0 (how often "improved: true" holds when the frames are resampled).
+    """
+    before_raw, after_raw = before_features['raw'], after_features['raw']
+    if block_length is None:
+        block_length = default_block_length(min(len(before_raw['vectors']), len(after_raw['vectors'])))
+    before_blocks = block_summaries(before_raw['vectors'], before_raw['jerk_magnitude'], block_length)
+    after_blocks = block_summaries(after_raw['vectors'], after_raw['jerk_magnitude'], block_length)
+
+    whole = np.arange(len(before_blocks['count']))[None], np.arange(len(after_blocks['count']))[None]
+    observed = _scores(_reduce(before_blocks, whole[0]), _reduce(after_blocks, whole[1]))
+
+    rng = np.random.default_rng(seed)
+    bootstrap = bootstrap_scores(before_blocks, after_blocks, n_resamples, rng)
+    permuted = permutation_scores(before_blocks, after_blocks, n_resamples, rng)
+
+    alpha = 1 - confidence
+    results = {}
+    for name, value in observed.items():
+        score = float(value[0])
+        ci_low, ci_high = np.quantile(bootstrap[name], [alpha / 2, 1 - alpha / 2])
+        extreme = np.count_nonzero(np.abs(permuted[name] - 1.0) >= abs(score - 1.0) - 1e-12)
+        p_value = (extreme + 1) / (n_resamples + 1)
+        results[name] = {
+            'score': score,
+            'ci_low': float(ci_low),
+            'ci_high': float(ci_high),
+            'p_value': float(p_value),
+            'significant': bool(p_value < alpha),
+        }
+    results['overall']['improved_probability'] = float(np.mean(bootstrap['overall'] > 1.0))
+
+    # Nest per-segment entries under their criterion, like the Wilcoxon statistics
+    for criterion in ('range_of_motion', 'smoothness'):
+        for segment in ('upper_arm', 'forearm'):
+            results[criterion][segment] = results.pop(f'{criterion}.{segment}')
+
+    results['method'] = {
+        'n_resamples': n_resamples,
+        'confidence': confidence,
+        'seed': seed,
+        'block_length': block_length,
+    }
+    return results
@@ -0,0 +1,289 @@
+"""Incremental SQLite index over stored improvement analyses.
+
+Every upload leaves web/public/analysis/<id>/improvement_analysis.json (plus a
+meta.json with the patient id for newer uploads). Answering "how has this
+patient trended" used to mean opening every one of those files; this module
+keeps one row per analysis directory in a SQLite table with the scores,
+criteria, per-segment details, p-values, confidence intervals and the
+before/after summaries as columns, indexed by patient and date.
+
+update_index() only parses directories that are new or whose files changed
+(by size and mtime), and drops rows whose directory is gone, so keeping the
+index current costs a stat per directory. The full JSON is kept in the
+document column for anything not broken out (json_extract works on it).
+
+The database defaults to tmp/results_index.sqlite in the project
+(SWING_RESULTS_DB to move it). Works on any directory of analyses, e.g. the
+pairs/ directory of batch_analyze.py: rows are keyed by (root, analysis_id),
+where root is the resolved path of the scanned directory, so several roots
+share one database without colliding, and updating one root never touches
+the rows of another.
+
+Usage:
+    python results_index.py update [--root web/public/analysis]
+    python results_index.py history <patient_id>
+    python results_index.py cohort [--since 2025-01-01] [--until 2025-12-31]
+"""
+import json
+import os
+import sqlite3
+import time
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_ANALYSIS_ROOT = os.path.join(PROJECT_ROOT, 'web', 'public', 'analysis')
+DEFAULT_DB_PATH = os.path.join(PROJECT_ROOT, 'tmp', 'results_index.sqlite')
+
+RESULT_FILE = 'improvement_analysis.json'
+META_FILE = 'meta.json'
+
+# Column name -> path into improvement_analysis.json
+COLUMNS = {
+    'overall_score': ('overall_score',),
+    'improved': ('improved',),
+    'rom_improved': ('criteria', 'range_of_motion'),
+    'smoothness_improved': ('criteria', 'smoothness'),
+    'rom_score': ('details', 'range_of_motion', 'score'),
+    'rom_upper_arm': ('details', 'range_of_motion', 'details', 'upper_arm'),
+    'rom_forearm': ('details', 'range_of_motion', 'details', 'forearm'),
+    'smoothness_score': ('details', 'smoothness', 'score'),
+    'smoothness_upper_arm': ('details', 'smoothness', 'details', 'upper_arm'),
+    'smoothness_forearm': ('details', 'smoothness', 'details', 'forearm'),
+    'rom_upper_arm_p': ('statistics', 'range_of_motion', 'upper_arm', 'p_value'),
+    'rom_forearm_p': ('statistics', 'range_of_motion', 'forearm', 'p_value'),
+    'smoothness_upper_arm_p': ('statistics', 'smoothness', 'upper_arm', 'p_value'),
+    'smoothness_forearm_p': ('statistics', 'smoothness', 'forearm', 'p_value'),
+    'overall_ci_low': ('confidence', 'overall', 'ci_low'),
+    'overall_ci_high': ('confidence', 'overall', 'ci_high'),
+    'improved_probability': ('confidence', 'overall', 'improved_probability'),
+    'before_range_upper_arm': ('before_summary', 'ranges', 'UpperArm'),
+    'before_range_forearm': ('before_summary', 'ranges', 'Forearm'),
+    'before_smoothness_upper_arm': ('before_summary', 'smoothness', 'UpperArm'),
+    'before_smoothness_forearm': ('before_summary', 'smoothness', 'Forearm'),
+    'after_range_upper_arm': ('after_summary', 'ranges', 'UpperArm'),
+    'after_range_forearm': ('after_summary', 'ranges', 'Forearm'),
+    'after_smoothness_upper_arm': ('after_summary', 'smoothness', 'UpperArm'),
+    'after_smoothness_forearm': ('after_summary', 'smoothness', 'Forearm'),
+}
+
+# Bump when the table layout changes; the index is rebuilt from the analysis directories
+SCHEMA_VERSION = 2
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS analyses (
+    root TEXT NOT NULL,
+    analysis_id TEXT NOT NULL,
+    created_at REAL,
+    patient_id TEXT,
+    treatment TEXT,
+    signature TEXT NOT NULL,
+    {', '.join(f'{name} REAL' for name in COLUMNS)},
+    document TEXT,
+    PRIMARY KEY (root, analysis_id)
+);
+CREATE INDEX IF NOT EXISTS analyses_patient ON analyses (patient_id, created_at);
+CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created_at);
+"""
+
+
+def connect(db_path=None):
+    db_path = os.path.abspath(db_path or os.environ.get('SWING_RESULTS_DB', DEFAULT_DB_PATH))
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = sqlite3.Row
+    # Readers (the web app) keep working while an update is being written
+    connection.execute('PRAGMA journal_mode=WAL')
+    if connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+        # Older layout; rows come back on the next update of each root
+        connection.execute('DROP TABLE IF EXISTS analyses')
+        connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _lookup(document, path):
+    for key in path:
+        if not isinstance(document, dict) or key not in document:
+            return None
+        document = document[key]
+    if isinstance(document, bool):
+        return float(document)
+    return document if isinstance(document, (int, float)) else None
+
+
+def _signature(directory):
+    """Size and mtime of the files a row is built from, or None if there is no result."""
+    parts = []
+    for name in (RESULT_FILE, META_FILE):
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            if name == RESULT_FILE:
+                return None
+            continue
+        parts.append(f'{name}:{stat.st_size}:{stat.st_mtime_ns}')
+    return '|'.join(parts)
+
+
+def _created_at(analysis_id, directory):
+    # Upload directories are named by their creation time in milliseconds
+    if analysis_id.isdigit() and len(analysis_id) >= 12:
+        return int(analysis_id) / 1000
+    return os.stat(directory).st_mtime
+
+
+def _row(root, analysis_id, directory, signature):
+    with open(os.path.join(directory, RESULT_FILE)) as f:
+        document = json.load(f)
+    meta = {}
+    meta_path = os.path.join(directory, META_FILE)
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    patient_id = meta.get('patient_id')
+    row = {
+        'root': root,
+        'analysis_id': analysis_id,
+        'created_at': meta.get('created_at', _created_at(analysis_id, directory)),
+        'patient_id': None if patient_id is None else str(patient_id),
+        'treatment': meta.get('treatment'),
+        'signature': signature,
+        'document': json.dumps(document, separators=(',', ':')),
+    }
+    for name, path in COLUMNS.items():
+        row[name] = _lookup(document, path)
+    return row
+
+
+def update_index(root=None, db_path=None, connection=None):
+    """Bring the index up to date with the analysis directories under root.
+
+    Returns counts of added, updated, removed, unchanged and unreadable directories.
+    """
+    root = os.path.realpath(root or DEFAULT_ANALYSIS_ROOT)
+    own_connection = connection is None
+    connection = connection or connect(db_path)
+    start_time = time.time()
+    counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0, 'failed': 0}
+    try:
+        known = dict(connection.execute('SELECT analysis_id, signature FROM analyses WHERE root = ?', (root,)))
+        seen = set()
+        rows = []
+        for entry in os.scandir(root) if os.path.isdir(root) else []:
+            if not entry.is_dir():
+                continue
+            signature = _signature(entry.path)
+            if signature is None:
+                continue
+            seen.add(entry.name)
+            if known.get(entry.name) == signature:
+                counts['unchanged'] += 1
+                continue
+            try:
+                rows.append(_row(root, entry.name, entry.path, signature))
+            except (OSError, ValueError) as e:
+                # Half-written or corrupt result; picked up again once it changes
+                print(f"Skipping {entry.path}: {e}")
+                counts['failed'] += 1
+                continue
+            counts['updated' if entry.name in known else 'added'] += 1
+
+        removed = [analysis_id for analysis_id in known if analysis_id not in seen]
+        counts['removed'] = len(removed)
+        with connection:
+            if rows:
+                names = list(rows[0])
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO analyses ({', '.join(names)}) "
+                    f"VALUES ({', '.join(':' + name for name in names)})",
+                    rows
+                )
+            connection.executemany('DELETE FROM analyses WHERE root = ? AND analysis_id = ?',
+                                   [(root, i) for i in removed])
+    finally:
+        if own_connection:
+            connection.close()
+
+    print(f"Indexed {root} in {time.time() - start_time:.3f}s: " + ", ".join(f"{v} {k}" for k, v in counts.items()))
+    return counts
+
+
+def patient_history(patient_id, db_path=None, connection=None):
+    """A patient's analyses, oldest first, as dicts of the indexed columns."""
+    own_connection = connection is None
+    connection = connection or connect(db_path)
+    try:
+        rows = connection.execute(
+            f"SELECT root, analysis_id, created_at, treatment, {', '.join(COLUMNS)} FROM analyses "
+            "WHERE patient_id = ? ORDER BY created_at", (str(patient_id),)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        if own_connection:
+            connection.close()
+
+
+def cohort_summary(since=None, until=None, by_patient=False, db_path=None, connection=None):
+    """Count, improvement rate and mean scores over analyses created in [since, until) (epoch seconds)."""
+    own_connection = connection is None
+    connection = connection or connect(db_path)
+    conditions, params = [], []
+    if since is not None:
+        conditions.append('created_at >= ?')
+        params.append(since)
+    if until is not None:
+        conditions.append('created_at < ?')
+        params.append(until)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    group = 'GROUP BY patient_id ORDER BY patient_id' if by_patient else ''
+    try:
+        rows = connection.execute(
+            f"SELECT {'patient_id, ' if by_patient else ''}COUNT(*) AS analyses, "
+            "AVG(improved) AS improved_rate, AVG(overall_score) AS mean_overall_score, "
+            "AVG(rom_score) AS mean_rom_score, AVG(smoothness_score) AS mean_smoothness_score, "
+            "MIN(created_at) AS first_at, MAX(created_at) AS last_at "
+            f"FROM analyses {where} {group}", params
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        if own_connection:
+            connection.close()
+
+
+def _date(value):
+    return time.mktime(time.strptime(value, '%Y-%m-%d')) if value else None
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f'{value:.3f}'
+    return '' if value is None else str(value)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index and query stored improvement analyses")
+    parser.add_argument('--db', default=None, help="SQLite file (default: tmp/results_index.sqlite)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    update_command = commands.add_parser('update', help="index new and changed analysis directories")
+    update_command.add_argument('--root', default=DEFAULT_ANALYSIS_ROOT, help="directory of analysis directories")
+    history_command = commands.add_parser('history', help="one patient's analyses over time")
+    history_command.add_argument('patient_id')
+    cohort_command = commands.add_parser('cohort', help="summary over all patients")
+    cohort_command.add_argument('--since', help="YYYY-MM-DD")
+    cohort_command.add_argument('--until', help="YYYY-MM-DD (exclusive)")
+    cohort_command.add_argument('--by-patient', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        update_index(args.root, args.db)
+    elif args.command == 'history':
+        fields = ['analysis_id', 'created_at', 'overall_score', 'improved', 'rom_score', 'smoothness_score',
+                  'overall_ci_low', 'overall_ci_high']
+        print('  '.join(f'{field:>16s}' for field in fields))
+        for row in patient_history(args.patient_id, args.db):
+            row['created_at'] = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['created_at']))
+            print('  '.join(f'{_format(row[field]):>16s}' for field in fields))
+    else:
+        for row in cohort_summary(_date(args.since), _date(args.until), args.by_patient, args.db):
+            print(', '.join(f'{key}={_format(value)}' for key, value in row.items()))
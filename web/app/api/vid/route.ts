@@ -5,6 +5,7 @@ import { spawn } from 'child_process';
 import path from 'path';
 import fs from 'fs';
 import { writeFile } from 'fs/promises';
+import analysisWorker from '@/lib/analysisWorker';
 export async function GET(request: Request){
   try{
     const url = new URL(request.url)
@@ -127,6 +128,12 @@ export async function POST(request: Request) {
     const afterOutput = path.join(outputDir, 'after_analysis.png');
     const beforeJson = path.join(outputDir, 'before_analysis.json');
     const afterJson = path.join(outputDir, 'after_analysis.json');
+    // Compact binary copies of the pose data, memory-mapped by analyze_improvement.py
+    const beforePoseFile = path.join(outputDir, 'before_analysis.pose');
+    const afterPoseFile = path.join(outputDir, 'after_analysis.pose');
+    // Downsampled position/velocity/acceleration series stored in graph_data instead of the full pose dump
+    const beforeGraph = path.join(outputDir, 'before_analysis.graph.json');
+    const afterGraph = path.join(outputDir, 'after_analysis.graph.json');
 
     // Get the path to the Python scripts
     const analyzeScriptPath = path.join(projectRoot, 'ml', 'analyze_video.py');
@@ -144,16 +151,25 @@ export async function POST(request: Request) {
     // Get Python executable path
     const pythonPath = process.env.PYTHON_PATH || 'python';
     console.log('Using Python:', pythonPath);
+    // The scripts' debug output goes to stderr, which is logged as errors below; set POSE_DEBUG=1 to see it
+    const pythonEnv = { ...process.env, POSE_DEBUG: process.env.POSE_DEBUG ?? '0' };
+
+    // Use the persistent warm worker instead of spawning python per script
+    const useWorker = process.env.PYTHON_WORKER === 'true';
 
     // Function to run video analysis
     const runVideoAnalysis = (videoPath: string, outputPath: string) => {
+      if (useWorker) {
+        return analysisWorker.run('analyze_video', { video_path: videoPath, output_path: outputPath });
+      }
       return new Promise((resolve, reject) => {
         const pythonProcess = spawn(pythonPath, [
           analyzeScriptPath,
           videoPath,
           outputPath
         ], {
-          cwd: projectRoot
+          cwd: projectRoot,
+          env: pythonEnv
         });
 
         pythonProcess.stdout.on('data', (data) => {
@@ -184,14 +200,21 @@ export async function POST(request: Request) {
 
     // Run the improvement analysis
     const improvementOutput = path.join(outputDir, 'improvement_analysis.json');
-    await new Promise((resolve, reject) => {
+    if (useWorker) {
+      await analysisWorker.run('analyze_improvement', {
+        before_path: beforePoseFile,
+        after_path: afterPoseFile,
+        output_path: improvementOutput
+      });
+    } else await new Promise((resolve, reject) => {
       const pythonProcess = spawn(pythonPath, [
         improveScriptPath,
-        beforeJson,
-        afterJson,
+        beforePoseFile,
+        afterPoseFile,
         improvementOutput
       ], {
-        cwd: projectRoot
+        cwd: projectRoot,
+        env: pythonEnv
       });
 
       pythonProcess.stdout.on('data', (data) => {
@@ -236,12 +259,14 @@ export async function POST(request: Request) {
     fs.copyFileSync(beforeOutput, publicBeforeOutput);
     fs.copyFileSync(afterOutput, publicAfterOutput);
     fs.copyFileSync(improvementOutput, publicImprovementOutput);
+    //patient and treatment for the results index (ml/results_index.py)
+    fs.writeFileSync(path.join(analysisDir, 'meta.json'), JSON.stringify({ patient_id: pID, treatment: 'Botox' }));
     console.log('Copied analysis results to:', { publicBeforeOutput, publicAfterOutput, publicImprovementOutput });
     
     // prisma writes
     try {
-      const beforePose = JSON.parse(fs.readFileSync(beforeJson, 'utf-8'));
-      const afterPose = JSON.parse(fs.readFileSync(afterJson, 'utf-8'));
+      const beforePose = JSON.parse(fs.readFileSync(beforeGraph, 'utf-8'));
+      const afterPose = JSON.parse(fs.readFileSync(afterGraph, 'utf-8'));
       const improvement = JSON.parse(fs.readFileSync(improvementOutput, 'utf-8'));
       
       const beforeImageBuffer = fs.readFileSync(beforeOutput)
@@ -325,7 +350,16 @@ export async function POST(request: Request) {
     fs.unlinkSync(afterOutput);
     fs.unlinkSync(beforeJson);
     fs.unlinkSync(afterJson);
+    fs.unlinkSync(beforePoseFile);
+    fs.unlinkSync(afterPoseFile);
+    fs.unlinkSync(beforeGraph);
+    fs.unlinkSync(afterGraph);
     fs.unlinkSync(improvementOutput);
+    // Per-stage timing sidecars written next to each output
+    for (const output of [beforeOutput, afterOutput, improvementOutput]) {
+      const metricsFile = output.replace(/\.[^.]+$/, '.metrics.json');
+      if (fs.existsSync(metricsFile)) fs.unlinkSync(metricsFile);
+    }
     fs.rmdirSync(outputDir);
 
     // Return URLs to the analysis results
@@ -0,0 +1,82 @@
+//persistent python analysis worker singleton
+//keeps one ml/analysis_worker.py process alive so uploads skip python startup and mediapipe graph setup
+
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import path from 'path';
+import readline from 'readline';
+
+type WorkerReply = { id: number; ok: boolean; error?: string; elapsed?: number };
+type PendingJob = { resolve: (reply: WorkerReply) => void; reject: (err: Error) => void };
+
+class AnalysisWorker {
+  private proc: ChildProcessWithoutNullStreams | null = null;
+  private pending = new Map<number, PendingJob>();
+  private nextId = 1;
+
+  //start the worker on first use, or again if it died
+  private ensureStarted() {
+    if (this.proc) return this.proc;
+
+    const projectRoot = path.resolve(process.cwd(), '..');
+    const pythonPath = process.env.PYTHON_PATH || 'python';
+    const proc = spawn(pythonPath, [path.join(projectRoot, 'ml', 'analysis_worker.py')], {
+      cwd: projectRoot,
+      // Debug output is off unless POSE_DEBUG=1 is set for the server
+      env: { ...process.env, POSE_DEBUG: process.env.POSE_DEBUG ?? '0' }
+    });
+
+    //one json reply per line on stdout
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+      let reply: WorkerReply;
+      try {
+        reply = JSON.parse(line);
+      } catch {
+        console.log(`Analysis worker: ${line}`);
+        return;
+      }
+      const job = this.pending.get(reply.id);
+      if (!job) return;
+      this.pending.delete(reply.id);
+      job.resolve(reply);
+    });
+
+    //analysis logs go to stderr
+    proc.stderr.on('data', (data) => {
+      console.log(`Analysis worker: ${data}`);
+    });
+
+    proc.on('close', (code) => {
+      this.proc = null;
+      //fail everything still in flight so requests don't hang
+      for (const job of this.pending.values()) {
+        job.reject(new Error(`Analysis worker exited with code ${code}`));
+      }
+      this.pending.clear();
+    });
+
+    this.proc = proc;
+    return proc;
+  }
+
+  //send a job and resolve when the worker reports it finished
+  run(op: string, args: Record<string, string>) {
+    const proc = this.ensureStarted();
+    const id = this.nextId++;
+    return new Promise<WorkerReply>((resolve, reject) => {
+      this.pending.set(id, {
+        resolve: (reply) => reply.ok ? resolve(reply) : reject(new Error(reply.error ?? `Analysis job ${op} failed`)),
+        reject
+      });
+      proc.stdin.write(JSON.stringify({ id, op, ...args }) + '\n');
+    });
+  }
+}
+
+//global object for persistance across hot reloads
+const globalForWorker = globalThis as unknown as { analysisWorker: AnalysisWorker | undefined };
+
+export const analysisWorker = globalForWorker.analysisWorker ?? new AnalysisWorker();
+
+globalForWorker.analysisWorker = analysisWorker;
+
+export default analysisWorker;